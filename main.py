@@ -2,39 +2,126 @@
 
 if __name__ == "__main__":
 
-    from pathfinder import PathFinder
+    from pathfinder import PathFinder, import_visualizer
     import argparse
 
     parser = argparse.ArgumentParser(description="Amazon Path Finder")
     
     parser.add_argument("--grid-width", type=int, help="Grid width", default=5)
     parser.add_argument("--grid-height", type=int, help="Grid height", default=5)
+    parser.add_argument("--grid-file", help="Binary grid file or text map to load the grid from, instead of --grid-width and --grid-height. eg. --grid-file map.grid", default=None)
+    parser.add_argument("--save-grid", help="Binary grid file to save the grid to, once obstacles are placed. eg. --save-grid map.grid", default=None)
+    parser.add_argument("--packed", action='store_true', help="Include flag to save the grid with one bit per cell instead of one byte", default=False)
     parser.add_argument("--start", nargs='+', type=int, help="Starting coordinates. eg. --start (0,0)", default=(0,0))
     parser.add_argument("--end", nargs='+', type=int, help="Delivery coordinates. eg. --end (1,2)", default=(0,0))
+    parser.add_argument("--stop", nargs='+', type=int, action='append', help="Coordinate of a stop to plan a delivery trip through from the start, in the best order, instead of going to --end. eg. --stop (1,1)", default=[])
+    parser.add_argument("--return-to-start", action='store_true', help="Include flag to end a trip through --stop points back at the start", default=False)
     parser.add_argument("--obstacle", nargs='+', type=int, action='append', help="Coordinate of an obstacle. eg. --obstacle (1,1)", default=[])
     parser.add_argument("--random-obstacles", type=int, help="Number of obstacles", default=0)
+    parser.add_argument("--obstacle-density", type=float, help="Share of the grid to fill with random obstacles, from 0 to 1. eg. --obstacle-density 0.3", default=0)
+    parser.add_argument("--seed", type=int, help="Seed for random obstacles", default=None)
     parser.add_argument("--obstacles-unremovable", action='store_true', help="Include flag to restrict path without suggestions to remove obstacles", default=False)
     parser.add_argument("--visualize", action='store_true', help="Include flag to visualize the pathfinder", default=False)
+    parser.add_argument("--headless", action='store_true', help="Include flag to visualize offscreen without opening a window", default=False)
+    parser.add_argument("--record-frames", help="Directory to save each visualized frame to as a PNG image. eg. --record-frames frames", default=None)
+    parser.add_argument("--max-fps", type=int, help="Most screen updates a second when visualizing", default=60)
+    parser.add_argument("--max-removals", type=int, help="Most obstacles the path may suggest removing, finding the fewest steps within that budget", default=None)
+    parser.add_argument("--terrain", nargs='+', type=int, action='append', help="Coordinate of a slow space, the cost of moving onto it and optionally of moving onto it diagonally, for the dial engine. eg. --terrain 2 3 5 7", default=[])
+    parser.add_argument("--removal-cost", type=int, help="Cost the dial engine counts for each obstacle removed, instead of removing the fewest", default=None)
+    parser.add_argument("--engine", choices=PathFinder.ENGINES, help="Search engine used to find the shortest path", default="dijkstra")
+    parser.add_argument("--batch", help="JSON lines file of scenarios to solve, or - for standard input. eg. --batch scenarios.jsonl")
+    parser.add_argument("--batch-output", help="JSON lines file to write batch results to, or - for standard output", default="-")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --batch and --serve, defaults to the number of CPUs", default=None)
+    parser.add_argument("--chunk-size", type=int, help="Number of scenarios sent to a worker at a time for --batch", default=64)
+    parser.add_argument("--unordered", action='store_true', help="Include flag to write batch results as they finish instead of in input order", default=False)
+    parser.add_argument("--serve", action='store_true', help="Include flag to answer route and obstacle update requests as line-delimited JSON over a socket, keeping the grids in memory", default=False)
+    parser.add_argument("--socket", help="Unix socket for --serve to listen on, instead of --host and --port. eg. --socket /tmp/pathfinder.sock", default=None)
+    parser.add_argument("--host", help="Host for --serve to listen on", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="TCP port for --serve to listen on", default=8765)
+    parser.add_argument("--grid", action='append', help="Named grid file for --serve to hold as well as the default grid. eg. --grid warehouse=warehouse.grid", default=[])
     args = parser.parse_args()
+    for terrain in args.terrain:
+        if len(terrain) not in (3, 4):
+            parser.error(f"--terrain takes a row, column, cost and optional diagonal cost, not {' '.join(map(str, terrain))}")
 
-    amazon_pathfinder = PathFinder(visualize=args.visualize)
-    amazon_pathfinder.create_grid(args.grid_width, args.grid_height)
+    if args.batch:
+        from pathfinder_batch import run_batch
+        run_batch(args.batch, args.batch_output, workers=args.workers,
+                  chunk_size=args.chunk_size, ordered=not args.unordered)
+        parser.exit()
+
+    if args.serve:
+        import asyncio
+        from pathfinder_service import PathFinderService
+
+        pathfinders = {"default": PathFinder()}
+        if args.grid_file:
+            pathfinders["default"].load_grid(args.grid_file)
+        else:
+            pathfinders["default"].create_grid(args.grid_width, args.grid_height)
+        pathfinders["default"].add_obstacles([tuple(obstacle) for obstacle in args.obstacle])
+        pathfinders["default"].add_random_obstacles(args.random_obstacles, seed=args.seed)
+        pathfinders["default"].fill_obstacles(args.obstacle_density, seed=args.seed)
+        for named_grid in args.grid:
+            name, grid_path = named_grid.split("=", 1)
+            pathfinders[name] = PathFinder()
+            pathfinders[name].load_grid(grid_path)
+
+        service = PathFinderService(pathfinders, workers=args.workers)
+        try:
+            asyncio.run(service.serve_forever(socket_path=args.socket, host=args.host, port=args.port))
+        except KeyboardInterrupt:
+            pass
+        parser.exit()
+
+    visualizer = None
+    if args.visualize or args.headless or args.record_frames:
+        try:
+            PathFinderVisualizer = import_visualizer()
+        except ImportError as error:
+            parser.error(str(error))
+        visualizer = PathFinderVisualizer(
+            headless=args.headless, record_dir=args.record_frames, max_fps=args.max_fps)
+
+    amazon_pathfinder = PathFinder(verbose=True, visualizer=visualizer)
+    if args.grid_file:
+        amazon_pathfinder.load_grid(args.grid_file)
+    else:
+        amazon_pathfinder.create_grid(args.grid_width, args.grid_height)
     amazon_pathfinder.set_starting_point(tuple(args.start))
     amazon_pathfinder.set_delivery_point(tuple(args.end))
     
     try:
         amazon_pathfinder.add_obstacles([tuple(obstacle) for obstacle in args.obstacle])
-        amazon_pathfinder.add_random_obstacles(args.random_obstacles)
+        amazon_pathfinder.add_random_obstacles(args.random_obstacles, seed=args.seed)
+        amazon_pathfinder.fill_obstacles(args.obstacle_density, seed=args.seed)
+        for row, column, *costs in args.terrain:
+            amazon_pathfinder.set_terrain_costs([(row, column)], *costs)
+        amazon_pathfinder.removal_cost = args.removal_cost
+        if args.save_grid:
+            amazon_pathfinder.save_grid(args.save_grid, packed=args.packed)
 
-        print(f"\nCreated grid of size {args.grid_height}x{args.grid_width}")
+        grid = amazon_pathfinder.grid
+        print(f"\nCreated grid of size {grid.height}x{grid.width}")
         print(f"Starting point: {tuple(args.start)}")
         print(f"Delivery point: {tuple(args.end)}")
-        print(f"Obstacles are placed at: {amazon_pathfinder.obstacles}")
+        if args.grid_file:
+            print(f"Obstacles loaded: {len(amazon_pathfinder.obstacles)}")
+        else:
+            print(f"Obstacles are placed at: {amazon_pathfinder.obstacles}")
 
-        amazon_pathfinder.shortest_path(allow_obstacle_elimination=not(args.obstacles_unremovable))
+        if args.stop:
+            amazon_pathfinder.plan_route(
+                tuple(args.start), [tuple(stop) for stop in args.stop],
+                return_to=tuple(args.start) if args.return_to_start else None,
+                allow_obstacle_elimination=not(args.obstacles_unremovable))
+        else:
+            amazon_pathfinder.shortest_path(allow_obstacle_elimination=not(args.obstacles_unremovable), engine=args.engine, max_removals=args.max_removals)
     except AssertionError:
         pass
 
-    if args.visualize:
+    if visualizer and args.headless:
+        visualizer.flush(force=True)
+    elif visualizer:
         while True:
-            amazon_pathfinder.pathfinder_visualizer.check_exit_clicked()
\ No newline at end of file
+            visualizer.check_exit_clicked()
\ No newline at end of file
@@ -3,11 +3,81 @@
 # The pathfinder will find the shortest path between two points on the grid.
 # The pathfinder will return the path as a list of coordinates.
 
-from math import sqrt
-import random
-from collections import namedtuple
+from array import array
+from collections import deque, namedtuple
+from heapq import heapify, heappop, heappush
 import time
-from pathfinder_visualizer import PathFinderVisualizer
+from pathfinder_grid import GRID_FILE_MAGIC, Grid
+
+
+# Row and column offsets of the eight adjacent spaces, in the order they are visited
+ADJACENT_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Cost given to spaces a search has not reached
+UNREACHED = 2 ** 62
+
+# Translates cells to the characters of a free space bit string, 1 where a space is free
+FREE_BITS = bytes.maketrans(b"\x00\x01", b"10")
+
+PathStep = namedtuple(
+    "step",
+    ["row",
+     "column",
+     "parent_row",
+     "parent_column",
+     "obstacles_eliminated",
+     "steps"
+     ]
+)
+
+
+def import_visualizer():
+    """
+    It imports and returns the PathFinderVisualizer class. The import is left until a
+    visualizer is needed, so that pygame is not loaded by pathfinders that never draw.
+
+    :return: The PathFinderVisualizer class
+    """
+    try:
+        from pathfinder_visualizer import PathFinderVisualizer
+    except ImportError as error:
+        raise ImportError(
+            f"Visualizing needs pygame, which could not be imported ({error}). "
+            "Install it with pip install pygame, or run without visualizing."
+        ) from error
+    return PathFinderVisualizer
+
+
+class PathResult(tuple):
+    """
+    PathResult is the path summary returned by shortest_path: a tuple of the steps taken,
+    the obstacles eliminated and the path steps, or an empty tuple when there is no path.
+
+    It also carries the statistics of the search that found it in stats: the engine used,
+    the nodes expanded and generated, the peak size of the open set and the time taken by
+    each phase (setup, search and reconstruction). When shortest_path was asked to profile
+    the search, profile holds the pstats.Stats of the run.
+    """
+
+    def __new__(cls, summary: tuple = (), stats: dict = None, profile=None):
+        result = super().__new__(cls, summary)
+        result.stats = {} if stats is None else stats
+        result.profile = profile
+        return result
+
+    @property
+    def found(self) -> bool:
+        """
+        It returns whether a path was found
+        """
+        return bool(self)
+
+    @property
+    def spaces(self) -> list[tuple]:
+        """
+        It returns the (row, column) spaces of the path in order
+        """
+        return [(path_step.row, path_step.column) for path_step in self[2]] if self else []
 
 
 class PathFinder:
@@ -19,20 +89,48 @@ class PathFinder:
     The pathfinder will return the path as a list of coordinates.
 
     The grid is represented by an array of 0s. Any obstacle on the grid is represented by a 1.
+    The cells are held in a compact Grid buffer, which still supports grid[row][column].
 
     """
 
-    def __init__(self, visualize=False) -> None:
-        self.visualize = visualize
+    ENGINES = ("dijkstra", "astar", "jps", "bidirectional", "exhaustive", "dial")
+
+    # The most a move onto a space may cost in the terrain
+    MAX_TERRAIN_COST = 255
+
+    # plan_route orders up to this many stops exactly, and more with local search
+    HELD_KARP_STOPS = 10
+
+    def __init__(self, visualize=False, verbose=False, visualizer=None) -> None:
+        self.visualize = visualize or visualizer is not None
+        self.verbose = verbose
         if self.visualize:
-            self.pathfinder_visualizer = PathFinderVisualizer()
-        self.grid = []
+            # A visualizer can be passed in, for example a headless one recording frames
+            self.pathfinder_visualizer = visualizer or self._create_visualizer()
+        self.grid = Grid(0, 0)
         self.all_paths = []
         self.obstacles = []
         self.starting_point = (0, 0)
         self.delivery_point = (0, 0)
-
-    def create_grid_with_obstacles(self, grid_width: int, grid_height: int, obstacles: list[tuple]) -> list[list[int]]:
+        self.landmarks = {}
+        self.landmarks_stale = False
+        self.search_stats = {}
+        self.grid_listeners = []
+        self._on_expand = None
+        self._search_window = None
+        self._component_labels = None
+        self._component_parents = []
+        self._component_seeds = []
+        self._distance_cache = {}
+        # The cost of moving onto each space straight and diagonally for the dial engine,
+        # None while every move costs 1
+        self.terrain = None
+        self.diagonal_terrain = None
+        # The cost the dial engine counts for removing an obstacle, or None to remove the
+        # fewest obstacles whatever the cost
+        self.removal_cost = None
+
+    def create_grid_with_obstacles(self, grid_width: int, grid_height: int, obstacles: list[tuple]) -> Grid:
         """
         This function creates a grid of the specified width and height, and then adds obstacles to the
         grid
@@ -43,13 +141,13 @@ class PathFinder:
         :type grid_height: int
         :param obstacles: list[tuple]
         :type obstacles: list[tuple]
-        :return: A list of lists of integers.
+        :return: The grid of cells.
         """
         grid = self.create_grid(grid_width, grid_height)
         self.add_obstacles(obstacles)
         return grid
 
-    def create_grid(self, width: int, height: int) -> list[list[int]]:
+    def create_grid(self, width: int, height: int, terrain_cost: int = 1, diagonal_cost: int = None) -> Grid:
         """
         It creates a grid of zeros with the given width and height
 
@@ -57,90 +155,385 @@ class PathFinder:
         :type width: int
         :param height: int
         :type height: int
-        :return: A list of lists of integers.
+        :param terrain_cost: The cost of moving onto any space, for the dial engine
+        :type terrain_cost: int
+        :param diagonal_cost: The cost of moving diagonally onto any space, defaults to terrain_cost
+        :type diagonal_cost: int
+        :return: The grid of cells.
+        """
+        self._replace_grid(Grid(width, height), obstacles=[])
+        if terrain_cost != 1 or diagonal_cost not in (None, 1):
+            self.set_terrain_costs(None, terrain_cost, diagonal_cost)
+        return self.grid
+
+    def load_grid(self, path: str) -> Grid:
+        """
+        It replaces the grid with one read from a file, either a binary grid file written by
+        save_grid or a text map with one character per cell, as read by Grid.from_text.
+
+        Binary grid files of one byte per cell are memory mapped rather than read, so even
+        very large grids open at once. The obstacles list is only built from the cells when
+        it is first used.
+
+        :param path: The grid file or text map to read
+        :type path: str
+        :return: The grid of cells.
+        """
+        with open(path, "rb") as grid_file:
+            is_grid_file = grid_file.read(len(GRID_FILE_MAGIC)) == GRID_FILE_MAGIC
+
+        if is_grid_file:
+            grid = Grid.load(path)
+        else:
+            with open(path) as text_file:
+                grid = Grid.from_text(text_file.read())
+
+        self._replace_grid(grid, obstacles=None)
+        return self.grid
+
+    def save_grid(self, path: str, packed: bool = False) -> None:
+        """
+        It writes the grid to a binary grid file that load_grid can open
+
+        :param path: The file to write
+        :type path: str
+        :param packed: Whether to store one bit per cell instead of one byte. Packed files
+        are an eighth of the size but are unpacked rather than memory mapped when loaded
+        :type packed: bool
+        """
+        self.grid.save(path, packed=packed)
+
+    @property
+    def obstacles(self) -> list[tuple]:
+        """
+        The (row, column) points of the obstacles on the grid, in the order they were added.
+        For grids loaded from a file it is built from the cells the first time it is used.
+        """
+        if self._obstacles is None:
+            width = self.grid.width
+            self._obstacles = [
+                divmod(index, width) for index, cell in enumerate(self.grid.cells) if cell
+            ]
+        return self._obstacles
+
+    @obstacles.setter
+    def obstacles(self, obstacles: list[tuple]) -> None:
+        self._obstacles = obstacles
+
+    def _replace_grid(self, grid: Grid, obstacles: list[tuple]) -> None:
+        """
+        It starts over on a new grid, dropping everything precomputed from the old one
+
+        :param grid: The new grid
+        :type grid: Grid
+        :param obstacles: The obstacles on the new grid, or None to find them when needed
+        :type obstacles: list[tuple]
         """
-        grid = []
-        for row in range(height):
-            grid.append([])
-            for column in range(width):
-                grid[row].append(0)
         self.grid = grid
+        self.obstacles = obstacles
+        self.landmarks = {}
+        self.landmarks_stale = False
+        self._component_labels = None
+        self._distance_cache = {}
+        self.terrain = None
+        self.diagonal_terrain = None
 
         if self.visualize:
             self.pathfinder_visualizer.draw_grid(
-                grid_width=width, grid_height=height
+                grid_width=grid.width, grid_height=grid.height
             )
+            if obstacles is None:
+                for row, column in self.obstacles:
+                    self.pathfinder_visualizer.show_obstacle_point(row, column)
 
         # Default the starting and delivery positions to both far corners of the grid
         self.starting_point = (0, 0)
         self.delivery_point = (len(self.grid)-1, len(self.grid[0])-1)
-        return self.grid
 
-    def add_obstacles(self, obstacles: list[tuple]) -> None:
+    def add_obstacles(self, obstacles, cost: int = None, diagonal_cost: int = None) -> None:
         """
-        This function takes in a list of tuples, and for each tuple in the list, it sets the value of
-        the grid at that tuple to 1
+        This function takes in (row, column) points, and for each point it sets the value of
+        the grid at that point to 1. The points are all checked before any is added, and
+        none are added if any is outside the grid, repeated, already an obstacle, or the
+        starting or delivery point.
 
-        :param obstacles: list[tuple]
+        With a cost the points are not obstacles but slow terrain, such as ramps or busy
+        aisles, that costs that much to move onto, as set_terrain_costs.
+
+        :param obstacles: The points to add, as a list or any iterable of pairs, or an array
+        of shape (n, 2) such as a NumPy array
         :type obstacles: list[tuple]
+        :param cost: The cost of moving onto the points, to make them terrain instead
+        :type cost: int
+        :param diagonal_cost: The cost of moving diagonally onto the terrain, defaults to cost
+        :type diagonal_cost: int
         """
-        existing_obstacles = list(
-            set(self.obstacles).intersection(set(obstacles))
-        )
+        if hasattr(obstacles, "tolist"):
+            obstacles = obstacles.tolist()
+        obstacles = [tuple(obstacle) for obstacle in obstacles]
+        if cost is not None:
+            self.set_terrain_costs(obstacles, cost, diagonal_cost)
+            return
+
+        height = self.grid.height
+        width = self.grid.width
+        outside_obstacles = [
+            obstacle for obstacle in obstacles
+            if not (0 <= obstacle[0] < height and 0 <= obstacle[1] < width)
+        ]
+        if outside_obstacles:
+            self._log("Obstacles Not Added: There are obstacles outside the grid at" + " ,".join(
+                str(obstacle) for obstacle in outside_obstacles)
+            )
+            return
 
-        if len(set(obstacles)) < len(obstacles):
-            print(
+        cells = self.grid.cells
+        indices = [self._cell_index(obstacle) for obstacle in obstacles]
+        existing_obstacles = [
+            obstacle for obstacle, index in zip(obstacles, indices)
+            if cells[index] == 1
+        ]
+
+        if len(set(indices)) < len(indices):
+            self._log(
                 "Obstacles Not Added: There are duplicate obstacles in the provided list")
         elif existing_obstacles:
-            print("Obstacles Not Added: There are obstacles already at" + " ,".join(
+            self._log("Obstacles Not Added: There are obstacles already at" + " ,".join(
                 str(obstacle) for obstacle in existing_obstacles)
             )
         elif not set([self.starting_point, self.delivery_point]).isdisjoint(set(obstacles)):
-            print(
+            self._log(
                 "Obstacles Not Added: An obstacle cannot be placed at the starting or delivery points")
         else:
+            self._place_obstacles(obstacles, indices)
+
+    def set_terrain_costs(self, points: list[tuple], cost: int, diagonal_cost: int = None) -> None:
+        """
+        It sets the cost of moving onto each point, which the dial engine finds the cheapest
+        path by. Spaces cost 1 to move onto until set, and the other engines count steps.
+
+        :param points: The (row, column) points to set, or None for every space
+        :type points: list[tuple]
+        :param cost: The cost of moving onto the points, from 1 to MAX_TERRAIN_COST
+        :type cost: int
+        :param diagonal_cost: The cost of moving diagonally onto the points, from 1 to
+        MAX_TERRAIN_COST, defaults to cost
+        :type diagonal_cost: int
+        """
+        if diagonal_cost is None:
+            diagonal_cost = cost
+        height = self.grid.height
+        width = self.grid.width
+        try:
+            assert 1 <= cost <= self.MAX_TERRAIN_COST and 1 <= diagonal_cost <= self.MAX_TERRAIN_COST
+        except AssertionError:
+            self._log(f"Terrain costs must be whole numbers from 1 to {self.MAX_TERRAIN_COST}")
+            raise
+        if points is None:
+            self.terrain = bytearray([cost]) * (width * height)
+            self.diagonal_terrain = bytearray([diagonal_cost]) * (width * height)
+            return
+
+        points = [tuple(point) for point in points]
+        try:
+            for row, column in points:
+                assert 0 <= row < height and 0 <= column < width
+        except AssertionError:
+            self._log("Terrain must be within the grid")
+            raise
+
+        if self.terrain is None:
+            self.terrain = bytearray(b"\x01") * (width * height)
+            self.diagonal_terrain = bytearray(b"\x01") * (width * height)
+        for row, column in points:
+            index = row * width + column
+            self.terrain[index] = cost
+            self.diagonal_terrain[index] = diagonal_cost
+
+    def add_obstacle_rectangles(self, rectangles: list[tuple]) -> None:
+        """
+        It fills rectangles of the grid with obstacles, such as racks or walls. Spaces in a
+        rectangle that are already obstacles stay as they are. No rectangle is added if any
+        is outside the grid or covers the starting or delivery point.
+
+        :param rectangles: The rectangles as pairs of their top left and bottom right
+        (row, column) corners, both included, e.g. [((2, 0), (2, 9))] for a wall along row 2
+        :type rectangles: list[tuple]
+        """
+        height = self.grid.height
+        width = self.grid.width
+        rectangles = [
+            (tuple(top_left), tuple(bottom_right)) for top_left, bottom_right in rectangles
+        ]
+
+        for (top, left), (bottom, right) in rectangles:
+            try:
+                assert 0 <= top <= bottom < height and 0 <= left <= right < width
+            except AssertionError:
+                self._log(f"Obstacles Not Added: The rectangle from {(top, left)} to {(bottom, right)} is not inside the grid")
+                return
+
+            for row, column in (self.starting_point, self.delivery_point):
+                if top <= row <= bottom and left <= column <= right:
+                    self._log(
+                        "Obstacles Not Added: An obstacle cannot be placed at the starting or delivery points")
+                    return
+
+        cells = self.grid.cells
+        added = bytearray(height * width)
+        indices = []
+        for (top, left), (bottom, right) in rectangles:
+            for row in range(top, bottom + 1):
+                row_start = row * width
+                indices.extend(
+                    index for index in range(row_start + left, row_start + right + 1)
+                    if not cells[index] and not added[index]
+                )
+                added[row_start + left:row_start + right + 1] = b"\x01" * (right - left + 1)
+
+        if indices:
+            self._place_obstacles([divmod(index, width) for index in indices], indices)
+
+    def remove_obstacles(self, obstacles: list[tuple]) -> None:
+        """
+        This function takes in a list of tuples, and for each tuple in the list, it clears the
+        obstacle from the grid at that tuple
+
+        :param obstacles: list[tuple]
+        :type obstacles: list[tuple]
+        """
+        obstacles = [tuple(obstacle) for obstacle in obstacles]
+        height = self.grid.height
+        width = self.grid.width
+        outside_obstacles = [
+            obstacle for obstacle in obstacles
+            if not (0 <= obstacle[0] < height and 0 <= obstacle[1] < width)
+        ]
+        if outside_obstacles:
+            self._log("Obstacles Not Removed: There are obstacles outside the grid at" + " ,".join(
+                str(obstacle) for obstacle in outside_obstacles)
+            )
+            return
+
+        cells = self.grid.cells
+        missing_obstacles = [
+            obstacle for obstacle in obstacles
+            if cells[self._cell_index(obstacle)] == 0
+        ]
+
+        if len(set(obstacles)) < len(obstacles):
+            self._log(
+                "Obstacles Not Removed: There are duplicate obstacles in the provided list")
+        elif missing_obstacles:
+            self._log("Obstacles Not Removed: There are no obstacles at" + " ,".join(
+                str(obstacle) for obstacle in missing_obstacles)
+            )
+        else:
+            removed_obstacles = set(obstacles)
             for obstacle in obstacles:
-                self.grid[obstacle[0]][obstacle[1]] = 1
-                self.obstacles.append(obstacle)
+                self.grid[obstacle[0]][obstacle[1]] = 0
                 if self.visualize:
-                    self.pathfinder_visualizer.show_obstacle_point(
-                        obstacle[0], obstacle[1]
+                    self.pathfinder_visualizer.show(
+                        obstacle[0], obstacle[1], (44, 62, 80)
                     )
+            self.obstacles = [
+                obstacle for obstacle in self.obstacles
+                if obstacle not in removed_obstacles
+            ]
+            self._grid_changed(obstacles)
 
-    def add_random_obstacles(self, num_obstacles: int) -> None:
+    def add_random_obstacles(self, num_obstacles: int, seed: int = None) -> None:
         """
         This function adds random obstacles to the grid.
         First check that the grid has enough space for the obstacles.
         The obstacles would not overlap existing ones.
         The obstacles would not be placed at the starting and delivery points.
 
+        While at least half the grid is free and at most half of the free spaces are
+        needed, spaces are drawn at random until enough free ones are found, so the work
+        grows with the obstacles placed rather than the size of the grid. Otherwise the
+        free spaces are listed once and sampled without replacement.
+
         :param num_obstacles: int - The number of obstacles to add to the grid
         :type num_obstacles: int
+        :param seed: Seed for the obstacle placement, defaults to the shared random module state
+        :type seed: int
         """
+        # Imported here as only random obstacles need it, which keeps importing pathfinder quick
+        import random
+        rng = random if seed is None else random.Random(seed)
 
-        free_spaces = []
-        for row, columns in enumerate(self.grid):
-            for column, _ in enumerate(columns):
-                if (self.grid[row][column] == 0 and
-                    (row, column) != self.starting_point and
-                        (row, column) != self.delivery_point):
-                    free_spaces.append((row, column))
+        cells = self.grid.cells
+        cell_count = self.grid.width * self.grid.height
+        reserved = {self._cell_index(self.starting_point), self._cell_index(self.delivery_point)}
+        free_count = cell_count - len(self.obstacles) - sum(
+            1 for index in reserved if not cells[index])
 
         try:
-            assert num_obstacles <= len(free_spaces)
+            assert num_obstacles <= free_count
         except AssertionError:
-            print("The grid does not have enough free space for the obstacles")
+            self._log("The grid does not have enough free space for the obstacles")
             raise
 
-        for i in range(num_obstacles):
-            random_obstacle = random.choice(free_spaces)
-            self.grid[random_obstacle[0]][random_obstacle[1]] = 1
-            self.obstacles.append(random_obstacle)
-            free_spaces.remove(random_obstacle)
-            if self.visualize:
-                self.pathfinder_visualizer.show_obstacle_point(
-                    random_obstacle[0], random_obstacle[1]
-                )
+        if 2 * free_count >= cell_count and 2 * num_obstacles <= free_count:
+            chosen = set()
+            indices = []
+            randrange = rng.randrange
+            while len(indices) < num_obstacles:
+                index = randrange(cell_count)
+                if cells[index] or index in reserved or index in chosen:
+                    continue
+                chosen.add(index)
+                indices.append(index)
+        else:
+            free_spaces = [
+                index for index in range(cell_count)
+                if not cells[index] and index not in reserved
+            ]
+            indices = rng.sample(free_spaces, num_obstacles)
+
+        if indices:
+            width = self.grid.width
+            self._place_obstacles([divmod(index, width) for index in indices], indices)
+
+    def fill_obstacles(self, density: float, seed: int = None) -> None:
+        """
+        It adds random obstacles until the given share of the grid is covered, counting the
+        obstacles already on it
+
+        :param density: The share of the grid's spaces to be obstacles, from 0 to 1
+        :type density: float
+        :param seed: Seed for the obstacle placement, defaults to the shared random module state
+        :type seed: int
+        """
+        try:
+            assert 0 <= density <= 1
+        except AssertionError:
+            self._log("The obstacle density must be between 0 and 1")
+            raise
+
+        num_obstacles = round(density * self.grid.width * self.grid.height) - len(self.obstacles)
+        if num_obstacles > 0:
+            self.add_random_obstacles(num_obstacles, seed=seed)
+
+    def _place_obstacles(self, obstacles: list[tuple], indices: list[int]) -> None:
+        """
+        It sets already checked free spaces to obstacles and tells everything that depends
+        on the grid
+
+        :param obstacles: The (row, column) points of the new obstacles
+        :type obstacles: list[tuple]
+        :param indices: The flat indices of the same points
+        :type indices: list[int]
+        """
+        cells = self.grid.cells
+        for index in indices:
+            cells[index] = 1
+        self.obstacles.extend(obstacles)
+        if self.visualize:
+            for row, column in obstacles:
+                self.pathfinder_visualizer.show_obstacle_point(row, column)
+        self._grid_changed(obstacles)
 
     def set_starting_point(self, starting_point: tuple) -> None:
         """
@@ -160,7 +553,7 @@ class PathFinder:
             try:
                 assert self.grid[starting_point[0]][starting_point[1]] == 0
             except AssertionError:
-                print("The starting point must not be on an obstacle on the grid")
+                self._log("The starting point must not be on an obstacle on the grid")
 
             self.starting_point = starting_point
             if self.visualize:
@@ -168,7 +561,7 @@ class PathFinder:
                     starting_point[0], starting_point[1]
                 )
         except AssertionError:
-            print("The starting point must be within the grid")
+            self._log("The starting point must be within the grid")
 
     def set_delivery_point(self, delivery_point: tuple) -> None:
         """
@@ -187,12 +580,12 @@ class PathFinder:
             try:
                 assert self.grid[delivery_point[0]][delivery_point[1]] == 0
             except AssertionError:
-                print("The delivery point must not be on an obstacle on the grid")
+                self._log("The delivery point must not be on an obstacle on the grid")
 
             try:
                 assert self.starting_point != delivery_point
             except AssertionError:
-                print("The delivery point cannot be the same starting location")
+                self._log("The delivery point cannot be the same starting location")
 
             self.delivery_point = delivery_point
             if self.visualize:
@@ -200,213 +593,1867 @@ class PathFinder:
                     delivery_point[0], delivery_point[1]
                 )
         except AssertionError:
-            print("The delivery point must be within the grid")
+            self._log("The delivery point must be within the grid")
 
-    def shortest_path(self, allow_obstacle_elimination: bool) -> list[list[tuple]]:
+    def shortest_path(self, allow_obstacle_elimination: bool, engine: str = "dijkstra", on_expand=None, profile: bool = False, max_removals: int = None) -> PathResult:
         """
-        The function finds all paths from the start to the end, sorts them by least obstacles
-        encountered, then by least steps taken, and returns the shortest path
+        The function finds the path from the start to the end with the least obstacles
+        encountered, then the least steps taken, and returns it
+
+        The default "dijkstra" engine settles each space once over the cost pair
+        (obstacles eliminated, steps taken). The "astar" engine does the same guided by the
+        least steps left to the delivery point, so it settles far fewer spaces. The "jps"
+        engine is A* with jump point pruning and only moves around obstacles. The
+        "bidirectional" engine grows dijkstra searches from both ends until they meet. The
+        "exhaustive" engine finds all paths and sorts them, which is only practical on
+        small grids and is kept for comparison. The "dial" engine takes the terrain costs
+        set with set_terrain_costs into account, finding the path with the least obstacles
+        eliminated then the least cost, or with removal_cost set, the least cost counting
+        each obstacle eliminated as that much.
+
+        With max_removals set, at most that many obstacles may be eliminated and the path
+        with the least steps within that budget is found instead, by a breadth first search
+        over (space, obstacles eliminated) states, so the engine must be left as "dijkstra".
+        removal_tradeoffs gives the other paths worth considering within the budget.
+
+        The statistics of the search are returned with the path and also kept in
+        search_stats until the next search.
 
         :param allow_obstacle_elimination: bool
         :type allow_obstacle_elimination: bool
-        :return: The shortest path
+        :param engine: The search engine to use, one of PathFinder.ENGINES
+        :type engine: str
+        :param on_expand: A function called with the (row, column) point of every space the
+        search expands, for tracing. It slows the search down, so leave it None otherwise
+        :param profile: Whether to run the search under cProfile and return its pstats.Stats
+        in the profile of the result
+        :type profile: bool
+        :param max_removals: The most obstacles the path may eliminate, used only when
+        allow_obstacle_elimination is True
+        :type max_removals: int
+        :return: The shortest path as a PathResult, empty when there is no path
         """
-        start_time = time.time()
-        self.find_all_paths(paths_with_obstacles=allow_obstacle_elimination)
-        end_time = time.time()
+        try:
+            assert engine in self.ENGINES
+        except AssertionError:
+            self._log(f"Unknown search engine {engine}, choose one of: {', '.join(self.ENGINES)}")
+            raise
 
-        elapsed_time = end_time - start_time
+        bounded = allow_obstacle_elimination and max_removals is not None
+        try:
+            assert not bounded or max_removals >= 0
+        except AssertionError:
+            self._log("The most obstacles to remove cannot be negative")
+            raise
+        try:
+            assert not bounded or engine == "dijkstra"
+        except AssertionError:
+            self._log(f"The most obstacles to remove has its own search, which the {engine} engine cannot be used with")
+            raise
 
-        print(
-            f"\nOf the many paths processed, found viable paths are: {len(self.all_paths)}")
-        print(f"The time taken to find all viable paths is: {elapsed_time}s")
+        self.search_stats = search_stats = {
+            "engine": "layered" if bounded else engine,
+            "nodes_expanded": 0,
+            "nodes_generated": 0,
+            "peak_open_set": 0,
+        }
+        profiler = None
+        if profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        start_time = time.perf_counter()
+        self._on_expand = on_expand
+        self._search_window = None
+        try:
+            if not allow_obstacle_elimination and not self._may_be_reachable(self.starting_point, self.delivery_point):
+                self._log("\nThe starting and delivery points are not connected by free spaces")
+                path_spaces = None
+            elif bounded:
+                search_stats["max_removals"] = max_removals
+                front = self._layered_search(max_removals, first_only=True)
+                path_spaces = front[0] if front else None
+            else:
+                search = getattr(self, f"_{engine}_search")
+                path_spaces = search(allow_obstacle_elimination)
+        finally:
+            self._on_expand = None
+        search_end_time = time.perf_counter()
+
+        selected_path = self._build_path_summary(path_spaces) if path_spaces else ()
+        end_time = time.perf_counter()
+
+        if profiler is not None:
+            import pstats
+            profiler.disable()
+            profile = pstats.Stats(profiler)
+        else:
+            profile = None
 
-        if len(self.all_paths) == 0:
-            print("\nNO PATH FOUND\n")
-            selected_path = ()
-            return selected_path
+        # Engines time their own main loop, anything before it is setup and anything after
+        # it is reconstruction. Without a search only the component check was run.
+        loop_start_time, loop_end_time = self._search_window or (start_time, search_end_time)
+        search_stats["setup_time"] = loop_start_time - start_time
+        search_stats["search_time"] = loop_end_time - loop_start_time
+        search_stats["reconstruction_time"] = end_time - loop_end_time
+        search_stats["total_time"] = end_time - start_time
 
-        # Sort by least obstacles encountered, then by least steps taken
-        sorted_paths = sorted(
-            self.all_paths, key=lambda path: (path[1], path[0]))
+        self._log(f"\nThe time taken to find the shortest path is: {search_stats['total_time']}s")
+        self._log("Search statistics: " + ", ".join(
+            f"{name}: {value}" for name, value in search_stats.items()))
 
-        selected_path = sorted_paths[0]
+        if not selected_path:
+            self._log("\nNO PATH FOUND\n")
+            return PathResult((), search_stats, profile)
 
         if not allow_obstacle_elimination:
             if selected_path[1] > 0:
-                print("\nUNABLE TO REACH DELIVERY POINT")
-                selected_path = ()
-                return selected_path
+                self._log("\nUNABLE TO REACH DELIVERY POINT")
+                return PathResult((), search_stats, profile)
 
         if selected_path[1]:
-            print("\nUNABLE TO REACH DELIVERY POINT")
-            print(
+            self._log("\nUNABLE TO REACH DELIVERY POINT")
+            self._log(
                 f"For the shortest potential path, remove obstacles at: {selected_path[2][-1].obstacles_eliminated}")
         else:
-            print("\nSHORTEST PATH FOUND")
-            print("The path is: " + str([(path_step.row, path_step.column)
+            self._log("\nSHORTEST PATH FOUND")
+            self._log("The path is: " + str([(path_step.row, path_step.column)
                                          for path_step in selected_path[2]]))
-            print(f"The path steps taken are: {selected_path[0]}")
-            print(f"The path obstacles encountered are: {selected_path[1]}\n")
+            self._log(f"The path steps taken are: {selected_path[0]}")
+            self._log(f"The path obstacles encountered are: {selected_path[1]}\n")
 
             if self.visualize:
                 self.pathfinder_visualizer.show_path(selected_path[2], selected_path=True)
-        return selected_path
+        return PathResult(selected_path, search_stats, profile)
 
-    def find_all_paths(self, paths_with_obstacles: bool):
+    def shortest_paths(self, starts: list[tuple], delivery_point: tuple, allow_obstacle_elimination: bool = True):
         """
-        It finds all possible paths from the starting point to the delivery point
-        :return: a list of tuples. Each tuple contains the following information:
-        """
-        step = namedtuple(
-            "step",
-            ["row",
-             "column",
-             "parent_row",
-             "parent_column",
-             "obstacles_eliminated",
-             "steps"
-             ]
-        )
-
-        start = step(
-            self.starting_point[0], self.starting_point[1], None, None, [], 0)
-        end = step(
-            self.delivery_point[0], self.delivery_point[1], None, None, [], 0)
-
-        visited_data = []
-        visited_path = []
-        path = []
+        The function finds the shortest path to one delivery point from each of many starting
+        points with a single search.
 
-        self.find_path(start, end, path, visited_data,
-                       visited_path, paths_with_obstacles)
+        It grows one search tree backwards from the delivery point, then reads the path for
+        each starting point off the tree in time proportional to its length.
 
-        return self.all_paths
+        :param starts: The starting points to find paths from
+        :type starts: list[tuple]
+        :param delivery_point: The delivery point shared by every path
+        :type delivery_point: tuple
+        :param allow_obstacle_elimination: Whether the paths may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: An iterable with the path summary for each starting point in order, or an
+        empty tuple for starting points that cannot reach the delivery point
+        """
+        try:
+            for point in [delivery_point, *starts]:
+                assert 0 <= point[0] < self.grid.height
+                assert 0 <= point[1] < self.grid.width
+        except AssertionError:
+            self._log("The starting and delivery points must be within the grid")
+            raise
 
-    def find_path(self, start: tuple, end: tuple, path: list[tuple], visited_data: list[tuple], visited_path: list[tuple], paths_with_obstacles: bool) -> list[tuple]:
+        start_time = time.time()
+        costs, parents = self._search_tree(
+            self._cell_index(delivery_point), allow_obstacle_elimination, reverse=True)
+        end_time = time.time()
+
+        self._log(f"\nThe time taken to search back from the delivery point is: {end_time - start_time}s")
+
+        def paths():
+            for start in starts:
+                start_index = self._cell_index(start)
+                if costs[start_index] == UNREACHED:
+                    yield ()
+                else:
+                    path_spaces = self._trace_parents(parents, start_index)
+                    path_spaces.reverse()
+                    yield self._build_path_summary(path_spaces)
+
+        return paths()
+
+    def iter_paths(self, k: int = None, allow_obstacle_elimination: bool = True):
+        """
+        It yields distinct paths from the starting point to the delivery point, best first,
+        ordered by the least obstacles encountered and then the least steps taken.
+
+        Paths are found lazily with Yen's algorithm: the first is the shortest path and each
+        later one is the best deviation from the paths already yielded, found with one spur
+        search per space of the previous path. Only the paths yielded and the queued
+        candidates are kept, so asking for a few alternatives stays cheap however many paths
+        the grid holds.
+
+        :param k: The most paths to yield, or None to keep going until there are no more
+        :type k: int
+        :param allow_obstacle_elimination: Whether the paths may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: A generator of path summaries in the same form as shortest_path
+        """
+        if k is not None and k <= 0:
+            return
+        if not allow_obstacle_elimination and not self._may_be_reachable(self.starting_point, self.delivery_point):
+            return
+
+        cell_count = self.grid.width * self.grid.height
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+        width = self.grid.width
+
+        first_path = self._spur_search(source, target, allow_obstacle_elimination, bytearray(cell_count), ())
+        if first_path is None:
+            return
+
+        found_paths = [first_path[1]]
+        yield self._build_path_summary([divmod(index, width) for index in first_path[1]])
+
+        candidates = []
+        queued = {tuple(first_path[1])}
+        while k is None or len(found_paths) < k:
+            previous_path = found_paths[-1]
+            excluded = bytearray(cell_count)
+            root_cost = 0
+            for spur_position, spur_index in enumerate(previous_path[:-1]):
+                root_path = previous_path[:spur_position + 1]
+                # Moves already taken from this root by a yielded path cannot be taken again
+                banned_moves = {
+                    path[spur_position + 1] for path in found_paths
+                    if path[:spur_position + 1] == root_path
+                }
+
+                spur_path = self._spur_search(
+                    spur_index, target, allow_obstacle_elimination, excluded, banned_moves)
+                if spur_path is not None:
+                    candidate = root_path[:-1] + spur_path[1]
+                    if tuple(candidate) not in queued:
+                        queued.add(tuple(candidate))
+                        heappush(candidates, (root_cost + spur_path[0], candidate))
+
+                # The root of the next spur path passes through this space, so spur paths
+                # must not come back to it
+                excluded[spur_index] = 1
+                next_index = previous_path[spur_position + 1]
+                root_cost += cell_count + 1 if self.grid.cells[next_index] else 1
+
+            if not candidates:
+                return
+            _, path = heappop(candidates)
+            found_paths.append(path)
+            yield self._build_path_summary([divmod(index, width) for index in path])
+
+    def removal_tradeoffs(self, max_removals: int) -> list[tuple]:
+        """
+        It finds the Pareto front of paths eliminating at most max_removals obstacles: for
+        each number of obstacles eliminated, the path with the least steps, kept only when
+        it takes fewer steps than every path eliminating fewer obstacles.
+
+        :param max_removals: The most obstacles a path may eliminate
+        :type max_removals: int
+        :return: A list of path summaries in the same form as shortest_path, from the one
+        eliminating the fewest obstacles and taking the most steps to the one taking the
+        fewest steps
+        """
+        try:
+            assert max_removals >= 0
+        except AssertionError:
+            self._log("The most obstacles to remove cannot be negative")
+            raise
+
+        self.search_stats = {}
+        front = self._layered_search(max_removals, first_only=False)
+        return [self._build_path_summary(path_spaces) for path_spaces in reversed(front)]
+
+    def plan_route(self, start: tuple, stops: list[tuple], return_to: tuple = None, allow_obstacle_elimination: bool = False, time_budget: float = 0.1) -> PathResult:
+        """
+        It plans a delivery trip from the start through every stop, in whichever order takes
+        the fewest steps, optionally returning to a point at the end.
+
+        The steps between every pair of points come from one search per point, which is
+        cached until obstacles change, so trips over the same stops only search once. Up to
+        HELD_KARP_STOPS stops are ordered exactly with the Held-Karp dynamic programme.
+        Longer trips start from the nearest stop each time and are improved with 2-opt
+        (reversing a run of stops) and or-opt (moving a run of up to three stops) until no
+        move helps or time_budget runs out. The legs of the chosen order are then joined
+        into a single path.
+
+        With obstacle elimination each leg removes the fewest obstacles first, as in
+        shortest_path, and legs are costed on their own, as if the obstacles removed by
+        earlier legs were still there. Legs that can go around obstacles need no removals,
+        so they are measured as without elimination, and only a point that some other point
+        cannot be reached from that way is searched from over the whole grid.
+
+        :param start: The point the trip starts from
+        :type start: tuple
+        :param stops: The points to visit, in any order
+        :type stops: list[tuple]
+        :param return_to: The point to end the trip at, defaults to ending at the last stop
+        :type return_to: tuple
+        :param allow_obstacle_elimination: Whether the legs may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :param time_budget: The most seconds spent improving the order of long trips
+        :type time_budget: float
+        :return: The whole trip as a PathResult, with the stops in the order visited under
+        "order" in its stats, empty when a stop cannot be reached
+        """
+        points = [tuple(start), *(tuple(stop) for stop in stops)]
+        if return_to is not None:
+            points.append(tuple(return_to))
+
+        try:
+            for point in points:
+                assert 0 <= point[0] < self.grid.height
+                assert 0 <= point[1] < self.grid.width
+        except AssertionError:
+            self._log("The start, stops and return point must be within the grid")
+            raise
+
+        stats = {"stops": len(stops)}
+        start_time = time.perf_counter()
+        costs = self._route_costs(points, allow_obstacle_elimination, stats)
+        matrix_time = time.perf_counter()
+
+        last = len(points) - 1 if return_to is not None else None
+        if len(stops) <= self.HELD_KARP_STOPS:
+            stats["ordering"] = "held_karp"
+            order = self._order_exactly(costs, len(stops), last)
+        else:
+            stats["ordering"] = "local_search"
+            order = self._order_locally(costs, len(stops), last, matrix_time + time_budget)
+        ordering_time = time.perf_counter()
+
+        route = [0, *order] if last is None else [0, *order, last]
+        route_cost = sum(costs[route[leg]][route[leg + 1]] for leg in range(len(route) - 1))
+        stats["order"] = [points[point] for point in order]
+        stats["matrix_time"] = matrix_time - start_time
+        stats["ordering_time"] = ordering_time - matrix_time
+
+        if route_cost >= UNREACHED:
+            self._log("\nUNABLE TO PLAN A ROUTE THROUGH EVERY STOP")
+            stats["total_time"] = time.perf_counter() - start_time
+            return PathResult((), stats)
+
+        path_spaces = [points[0]]
+        for leg in range(len(route) - 1):
+            path_spaces.extend(self._route_leg(points[route[leg]], points[route[leg + 1]], allow_obstacle_elimination)[1:])
+        summary = self._build_path_summary(path_spaces)
+        end_time = time.perf_counter()
+        stats["reconstruction_time"] = end_time - ordering_time
+        stats["total_time"] = end_time - start_time
+
+        self._log(f"\nThe route visits the stops in the order: {stats['order']}")
+        self._log(f"The route steps taken are: {summary[0]}")
+        self._log(f"\nThe time taken to plan the route is: {stats['total_time']}s")
+        return PathResult(summary, stats)
+
+    def build_landmarks(self, points: list[tuple] = None) -> None:
         """
-        This function finds all possible paths from the starting point to the delivery point.
-        The paths are represented as a list of tuples.
+        It stores the least steps from each landmark point to every space on the grid,
+        moving around obstacles.
+
+        The distance fields give exact landmark-to-anywhere distances through
+        landmark_distance, and a triangle inequality lower bound that the astar engine uses
+        alongside the least steps heuristic when obstacles cannot be eliminated. Adding
+        obstacles marks the fields stale until they are built again.
+
+        :param points: The landmark points, defaults to rebuilding the current landmarks
+        :type points: list[tuple]
         """
+        if points is None:
+            points = list(self.landmarks)
 
-        step = namedtuple(
-            "step",
-            ["row",
-             "column",
-             "parent_row",
-             "parent_column",
-             "obstacles_eliminated",
-             "steps"
-             ]
-        )
+        try:
+            for point in points:
+                assert 0 <= point[0] < self.grid.height
+                assert 0 <= point[1] < self.grid.width
+                assert self.grid[point[0]][point[1]] == 0
+        except AssertionError:
+            self._log("Landmarks must be within the grid and not on an obstacle")
+            raise
 
-        visited_data.append(start)
-        visited_path.append((start.row, start.column))
+        self.landmarks = {
+            tuple(point): self._step_distances(self._cell_index(point))
+            for point in points
+        }
+        self.landmarks_stale = False
 
-        path.append(start)
+    def landmark_distance(self, landmark: tuple, point: tuple) -> int:
+        """
+        It returns the least steps between a landmark and a point, moving around obstacles,
+        or None when the point cannot be reached from the landmark
+
+        :param landmark: A point passed to build_landmarks
+        :type landmark: tuple
+        :param point: Any point on the grid
+        :type point: tuple
+        :return: The least steps between the landmark and the point
+        """
+        try:
+            assert not self.landmarks_stale
+        except AssertionError:
+            self._log("The landmarks are stale since obstacles were added, build them again")
+            raise
 
-        if (start.row, start.column) == (end.row, end.column):
-            delivery_point_arrived = start
+        steps = self.landmarks[landmark][self._cell_index(point)]
+        return None if steps < 0 else steps
 
-            steps_covered_by_path = delivery_point_arrived.steps
-            obstacles_eliminated_by_path = len(
-                delivery_point_arrived.obstacles_eliminated)
+    def is_reachable(self, point_1: tuple, point_2: tuple) -> bool:
+        """
+        It returns whether one point can reach the other moving around obstacles, in
+        constant time once the connected components of free spaces are labelled.
 
-            path_summary = (
-                steps_covered_by_path,
-                obstacles_eliminated_by_path,
-                path.copy()
-            )
-            self.all_paths.append(path_summary)
+        The labels are built on first use. Afterwards added obstacles relabel only the
+        components they touch, and removed obstacles merge components with union-find.
 
-            if self.visualize:
-                self.pathfinder_visualizer.show_path(path.copy())
+        :param point_1: A point on the grid
+        :type point_1: tuple
+        :param point_2: A point on the grid
+        :type point_2: tuple
+        :return: True if both points are free and in the same component
+        """
+        component = self.component_of(point_1)
+        return component is not None and component == self.component_of(point_2)
 
+    def component_of(self, point: tuple) -> int:
+        """
+        It returns a label for the connected component of free spaces holding the point, or
+        None when the point holds an obstacle. Two points share a label exactly when each
+        can reach the other, until obstacles next change.
+
+        :param point: A point on the grid
+        :type point: tuple
+        :return: The component label
+        """
+        self._update_components()
+        label = self._component_labels[self._cell_index(point)]
+        return None if label < 0 else self._find_component(label)
+
+    def _may_be_reachable(self, starting_point: tuple, delivery_point: tuple) -> bool:
+        """
+        It rules out a path around obstacles when the points are in different components.
+        A starting point on an obstacle can still move off it, so it is not ruled out.
+        """
+        if self.grid[starting_point[0]][starting_point[1]] == 1:
+            return True
+        return self.is_reachable(starting_point, delivery_point)
+
+    def _update_components(self) -> None:
+        """
+        It labels every component when there are no labels yet, otherwise it relabels the
+        components around obstacles added since the last update
+        """
+        labels = self._component_labels
+        if labels is None:
+            labels = self._component_labels = array("i", [-1]) * len(self.grid.cells)
+            self._component_parents = []
+            seeds = range(len(labels))
         else:
+            seeds = self._component_seeds
+        self._component_seeds = []
+
+        # Flood fill from every seed not yet reached by an earlier seed of this update
+        first_label = len(self._component_parents)
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        for seed in seeds:
+            if cells[seed] or labels[seed] >= first_label:
+                continue
+            label = len(self._component_parents)
+            self._component_parents.append(label)
+            labels[seed] = label
+            frontier = [seed]
+            while frontier:
+                row, column = divmod(frontier.pop(), width)
+                for row_offset, col_offset in ADJACENT_OFFSETS:
+                    next_row = row + row_offset
+                    next_column = column + col_offset
+                    if 0 <= next_row < height and 0 <= next_column < width:
+                        next_index = next_row * width + next_column
+                        if labels[next_index] != label and not cells[next_index]:
+                            labels[next_index] = label
+                            frontier.append(next_index)
+
+    def _components_changed(self, changed_points: list[tuple]) -> None:
+        """
+        It records how the changed points affect the component labels, if there are any.
+
+        A new obstacle can split its component, so its free neighbours are kept as seeds to
+        relabel from. A cleared obstacle joins the components around it, which union-find
+        does directly once any pending relabelling is done.
+        """
+        labels = self._component_labels
+        if labels is None:
+            return
+
+        cells = self._flat_cells()
+        cleared = []
+        for point in changed_points:
+            index = self._cell_index(point)
+            if cells[index]:
+                labels[index] = -1
+                self._component_seeds.extend(self._free_neighbours(index))
+            else:
+                cleared.append(index)
+
+        if cleared:
+            self._update_components()
+            for index in cleared:
+                label = len(self._component_parents)
+                self._component_parents.append(label)
+                labels[index] = label
+                for next_index in self._free_neighbours(index):
+                    if labels[next_index] >= 0:
+                        self._component_parents[self._find_component(labels[next_index])] = label
+
+    def _find_component(self, label: int) -> int:
+        """
+        It returns the root label of a component, halving the path to it on the way
+        """
+        parents = self._component_parents
+        while parents[label] != label:
+            parents[label] = parents[parents[label]]
+            label = parents[label]
+        return label
 
-            next_closest_to_end_steps = None
-            next_with_obstacle_closest_to_end_steps = None
+    def _free_neighbours(self, index: int) -> list[int]:
+        """
+        It returns the flat indices of the free spaces adjacent to a space
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        row, column = divmod(index, width)
+        free_neighbours = []
+        for row_offset, col_offset in ADJACENT_OFFSETS:
+            next_row = row + row_offset
+            next_column = column + col_offset
+            if 0 <= next_row < height and 0 <= next_column < width:
+                next_index = next_row * width + next_column
+                if not cells[next_index]:
+                    free_neighbours.append(next_index)
+        return free_neighbours
+
+    def _exhaustive_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        It finds all paths with find_all_paths and returns the spaces of the one with the
+        least obstacles encountered, then the least steps taken, or None when there is none
 
-            for next_row, next_column in self._get_adjacent_spaces(start.row, start.column):
+        :param allow_obstacle_elimination: Whether the paths may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        search_start = time.perf_counter()
+        self.find_all_paths(paths_with_obstacles=allow_obstacle_elimination)
+        # The depth-first search holds no open set, every space it visits is expanded
+        expanded = self.search_stats["nodes_expanded"]
+        self._finish_search(search_start, expanded, expanded, 0)
+        self.search_stats["viable_paths"] = len(self.all_paths)
 
-                if not paths_with_obstacles:
-                    if self.grid[next_row][next_column] == 1:
+        self._log(
+            f"\nOf the many paths processed, found viable paths are: {len(self.all_paths)}")
+
+        if len(self.all_paths) == 0:
+            return None
+
+        # Least obstacles encountered, then least steps taken
+        selected_path = min(self.all_paths, key=lambda path: (path[1], path[0]))
+        return [divmod(index, self.grid.width) for index in selected_path[2]]
+
+    def _layered_search(self, max_removals: int, first_only: bool) -> list[list[tuple]]:
+        """
+        Breadth first search from the starting point over (space, obstacles eliminated)
+        states, where moving onto an obstacle uses up one of max_removals eliminations.
+
+        Every move takes one step, so states are reached in order of steps. A state is
+        dropped when its space was already reached with no more obstacles eliminated, as it
+        cannot lead anywhere sooner or more cheaply. Each space is then kept at most
+        max_removals + 1 times, each time with fewer obstacles eliminated, and every time
+        the delivery point is kept its path joins the Pareto front. The parents of the kept
+        states live in one flat array of (max_removals + 1) * cells entries, where
+        max_removals is at most the number of obstacles on the grid.
+
+        :param max_removals: The most obstacles a path may eliminate
+        :type max_removals: int
+        :param first_only: Whether to stop at the first path found, the one with the least steps
+        :type first_only: bool
+        :return: The (row, column) spaces of the paths on the front, with the least steps first
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        on_expand = self._on_expand
+
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+        # No path can eliminate more obstacles than there are
+        max_removals = min(max_removals, len(self.obstacles))
+
+        # States are numbered removals * cell_count + index
+        state_count = (max_removals + 1) * cell_count
+        parents = array("i" if state_count < 2 ** 31 else "q", [-1]) * state_count
+        least_removals = array("i", [max_removals + 1]) * cell_count
+
+        least_removals[source] = 0
+        frontier = [source]
+        front = []
+        expanded = generated = peak_open_set = 0
+        search_start = time.perf_counter()
+        # Each pass takes every state one more step away, so the paths found in a pass have
+        # the same steps and only the one eliminating the fewest obstacles is worth keeping
+        while frontier:
+            if len(frontier) > peak_open_set:
+                peak_open_set = len(frontier)
+            next_frontier = []
+            reached_target = None
+            for state in frontier:
+                removals, index = divmod(state, cell_count)
+                expanded += 1
+                if on_expand is not None:
+                    on_expand(divmod(index, width))
+
+                if index == target:
+                    if reached_target is None or state < reached_target:
+                        reached_target = state
+                    continue
+
+                row, column = divmod(index, width)
+                for row_offset, col_offset in ADJACENT_OFFSETS:
+                    next_row = row + row_offset
+                    next_column = column + col_offset
+                    if not (0 <= next_row < height and 0 <= next_column < width):
                         continue
 
-                steps_to_end = self._calculate_shortest_steps_between_points(
-                    (next_row, next_column), (end.row, end.column))
+                    next_index = next_row * width + next_column
+                    next_removals = removals + cells[next_index]
+                    if next_removals >= least_removals[next_index]:
+                        continue
 
-                if self.grid[next_row][next_column] == 1:
-                    if next_with_obstacle_closest_to_end_steps == None:
-                        next_with_obstacle_closest_to_end_steps = steps_to_end
-                    elif steps_to_end <= next_with_obstacle_closest_to_end_steps:
-                        next_with_obstacle_closest_to_end_steps = steps_to_end
-                    else:
-                        # Do not go with that adjacent point as it is not optimum
+                    least_removals[next_index] = next_removals
+                    next_state = next_removals * cell_count + next_index
+                    parents[next_state] = state
+                    next_frontier.append(next_state)
+                    generated += 1
+
+            if reached_target is not None:
+                front.append(reached_target)
+                if first_only or reached_target < cell_count:
+                    break
+            frontier = next_frontier
+
+        self._finish_search(search_start, expanded, generated, peak_open_set)
+
+        paths = []
+        for state in front:
+            path_spaces = []
+            while state != -1:
+                path_spaces.append(divmod(state % cell_count, width))
+                state = parents[state]
+            path_spaces.reverse()
+            paths.append(path_spaces)
+        return paths
+
+    def _route_costs(self, points: list[tuple], allow_obstacle_elimination: bool, stats: dict) -> list[list[int]]:
+        """
+        It returns the cost of moving between every pair of points for plan_route, packed as
+        obstacles * cell_count + steps and UNREACHED where there is no path, searching from
+        each point that the distance cache does not already cover
+
+        :param points: The points of the trip
+        :type points: list[tuple]
+        :param allow_obstacle_elimination: Whether the legs may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :param stats: The statistics of the route, given the number of searches made
+        :type stats: dict
+        :return: The cost from each point (rows) to each point (columns)
+        """
+        cells = self._flat_cells()
+        indices = [self._cell_index(point) for point in points]
+        searches = 0
+        costs = []
+        for source in indices:
+            tree = self._distance_cache.get((source, True)) if allow_obstacle_elimination else None
+            if tree is not None:
+                costs.append([tree[0][target] for target in indices])
+                continue
+
+            known = self._distance_cache.setdefault((source, False), {source: 0})
+            missing = [target for target in indices if target not in known]
+            if missing:
+                known.update(self._bitset_step_distances(source, missing))
+                searches += 1
+                if not cells[source]:
+                    # Moves between free spaces can be made either way, so the steps back
+                    # to this source are known too
+                    for target in missing:
+                        if not cells[target]:
+                            self._distance_cache.setdefault((target, False), {target: 0})[source] = known[target]
+
+            if allow_obstacle_elimination and any(known[target] == UNREACHED for target in indices):
+                # Some point can only be reached by removing obstacles, which takes the
+                # packed cost search over the whole grid
+                tree = self._distance_cache[(source, True)] = self._search_tree(source, True)
+                searches += 1
+                costs.append([tree[0][target] for target in indices])
+                continue
+            costs.append([known[target] for target in indices])
+
+        stats["searches"] = searches
+        return costs
+
+    def _route_leg(self, point: tuple, next_point: tuple, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        It returns the spaces of the shortest path between two points of a route, read off
+        the cached search tree when the leg was costed with obstacle elimination, or found
+        with A* around obstacles otherwise
+        """
+        source = self._cell_index(point)
+        target = self._cell_index(next_point)
+        tree = self._distance_cache.get((source, True)) if allow_obstacle_elimination else None
+        if tree is not None:
+            return self._trace_parents(tree[1], target)
+
+        _, indices = self._spur_search(source, target, False, bytearray(len(self.grid.cells)), ())
+        width = self.grid.width
+        return [divmod(index, width) for index in indices]
+
+    @staticmethod
+    def _order_exactly(costs: list[list[int]], stop_count: int, last: int) -> list[int]:
+        """
+        Held-Karp dynamic programme over the subsets of stops visited so far, for the order
+        of the stops 1 to stop_count that costs least from point 0, ending at point last if
+        it is given
+
+        :return: The stops in the order to visit them
+        """
+        if not stop_count:
+            return []
+
+        full = (1 << stop_count) - 1
+        # best[visited][stop] is the least cost of visiting the stops in the visited bit set
+        # from point 0, ending at the given stop, which came after the stop in previous
+        best = [[UNREACHED] * stop_count for _ in range(full + 1)]
+        previous = [[-1] * stop_count for _ in range(full + 1)]
+        for stop in range(stop_count):
+            best[1 << stop][stop] = costs[0][stop + 1]
+
+        for visited in range(1, full + 1):
+            visited_best = best[visited]
+            for stop in range(stop_count):
+                cost = visited_best[stop]
+                if cost >= UNREACHED:
+                    continue
+                stop_costs = costs[stop + 1]
+                for next_stop in range(stop_count):
+                    if visited >> next_stop & 1:
                         continue
+                    next_visited = visited | 1 << next_stop
+                    next_cost = cost + stop_costs[next_stop + 1]
+                    if next_cost < best[next_visited][next_stop]:
+                        best[next_visited][next_stop] = next_cost
+                        previous[next_visited][next_stop] = stop
+
+        final_costs = [
+            best[full][stop] + (costs[stop + 1][last] if last is not None else 0)
+            for stop in range(stop_count)
+        ]
+        if min(final_costs) >= UNREACHED:
+            # Some stop cannot be reached, so there is no order worth finding
+            return list(range(1, stop_count + 1))
+
+        stop = final_costs.index(min(final_costs))
+        order = []
+        visited = full
+        while stop != -1:
+            order.append(stop + 1)
+            visited, stop = visited & ~(1 << stop), previous[visited][stop]
+        order.reverse()
+        return order
+
+    @staticmethod
+    def _order_locally(costs: list[list[int]], stop_count: int, last: int, deadline: float) -> list[int]:
+        """
+        It orders the stops 1 to stop_count by going to the nearest unvisited stop each
+        time, then applies 2-opt and or-opt moves that lower the cost, until none does or
+        the perf_counter deadline passes
+
+        :return: The stops in the order to visit them
+        """
+        unvisited = set(range(1, stop_count + 1))
+        order = []
+        point = 0
+        while unvisited:
+            point = min(unvisited, key=costs[point].__getitem__)
+            unvisited.remove(point)
+            order.append(point)
+
+        def route_cost(order):
+            route = [0, *order] if last is None else [0, *order, last]
+            return sum(costs[route[leg]][route[leg + 1]] for leg in range(len(route) - 1))
+
+        # Costs may differ by direction with obstacle elimination, so every move is costed
+        # over the whole route rather than by the legs it changes
+        best_cost = route_cost(order)
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for first in range(stop_count - 1):
+                for end in range(first + 2, stop_count + 1):
+                    candidate = order[:first] + order[first:end][::-1] + order[end:]
+                    candidate_cost = route_cost(candidate)
+                    if candidate_cost < best_cost:
+                        order, best_cost, improved = candidate, candidate_cost, True
+
+            for length in (1, 2, 3):
+                for first in range(stop_count - length + 1):
+                    run = order[first:first + length]
+                    rest = order[:first] + order[first + length:]
+                    for position in range(len(rest) + 1):
+                        candidate = rest[:position] + run + rest[position:]
+                        candidate_cost = route_cost(candidate)
+                        if candidate_cost < best_cost:
+                            order, best_cost, improved = candidate, candidate_cost, True
+                            break
+                if time.perf_counter() >= deadline:
+                    break
+        return order
+
+    def _bitset_step_distances(self, source: int, targets: list[int]) -> dict:
+        """
+        Breadth first search from the source space around obstacles, stopping once every
+        target is reached, with each frontier held as the bits of one Python integer.
+
+        Bit row * (width + 1) + column stands for a space, with an always clear bit at the
+        end of every row so that moves off the side of the grid fall on it. Spreading the
+        frontier by one step is then a few shifts and ors over the whole grid at once. The
+        free spaces are kept as bits in the distance cache until obstacles change.
+
+        :param source: The flat index of the space to measure from
+        :type source: int
+        :param targets: The flat indices of the spaces to measure to
+        :type targets: list[int]
+        :return: The least steps to each target, UNREACHED where it cannot be reached
+        """
+        width = self.grid.width
+        stride = width + 1
+        free = self._distance_cache.get("free_bits")
+        if free is None:
+            free_bits = bytes(self._flat_cells()).translate(FREE_BITS)
+            free = self._distance_cache["free_bits"] = int(b"0".join(
+                free_bits[row_start:row_start + width]
+                for row_start in range(0, len(free_bits), width)
+            )[::-1] or b"0", 2)
+
+        def bit(index):
+            return index // width * stride + index % width
+
+        distances = dict.fromkeys(targets, UNREACHED)
+        remaining = {target: bit(target) for target in targets if target != source}
+        if source in distances:
+            distances[source] = 0
+
+        target_bits = 0
+        for target_bit in remaining.values():
+            target_bits |= 1 << target_bit
+
+        frontier = 1 << bit(source)
+        unreached = free & ~frontier
+        steps = 0
+        while frontier and remaining:
+            steps += 1
+            spread = frontier | frontier << 1 | frontier >> 1
+            frontier = (spread | spread << stride | spread >> stride) & unreached
+            unreached ^= frontier
+            if frontier & target_bits:
+                for target, target_bit in list(remaining.items()):
+                    if frontier >> target_bit & 1:
+                        distances[target] = steps
+                        del remaining[target]
+        return distances
+
+    def _dial_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        Dijkstra's search over the terrain costs with Dial's bucket queue.
+
+        Moves cost at most MAX_TERRAIN_COST, so every space waiting to be settled costs
+        within that much of the one being settled. The queue is a ring of that many buckets
+        plus one, the bucket for a cost being cost modulo the ring size, and pushing or
+        popping a space is a list append or pop. The current cost only moves forwards
+        through the buckets.
+
+        With removal_cost set an obstacle is just terrain costing that much. Moves costing
+        more than the ring holds, as removals usually do, wait in a binary heap of their own
+        until the ring reaches their cost, and while the ring is empty the search skips
+        straight to the cheapest of them. Otherwise eliminating an obstacle outweighs any
+        cost, so spaces are settled in layers by obstacles eliminated: each layer is searched
+        through the ring, and moves onto obstacles are held for the next layer, which starts
+        from them through the heap.
+
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        on_expand = self._on_expand
+        terrain = self.terrain or bytearray(b"\x01") * cell_count
+        diagonal_terrain = self.diagonal_terrain or terrain
+        removal_cost = self.removal_cost if allow_obstacle_elimination else None
+        try:
+            assert removal_cost is None or 1 <= removal_cost < UNREACHED // cell_count
+        except AssertionError:
+            self._log(f"The cost of removing an obstacle must be from 1 to {UNREACHED // cell_count - 1}")
+            raise
+        layered = allow_obstacle_elimination and removal_cost is None
+
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+
+        ring_size = max(max(terrain), max(diagonal_terrain)) + 1
+        buckets = [[] for _ in range(ring_size)]
+        costs = array("q", [UNREACHED]) * cell_count
+        layers = array("i", [cell_count]) * cell_count
+        parents = array("i", [-1]) * cell_count
+        settled = bytearray(cell_count)
+
+        costs[source] = 0
+        layers[source] = 0
+        layer = 0
+        # The (cost, index) moves onto obstacles made while searching the current layer
+        next_layer = []
+        # The (cost, index) spaces of the layer too costly for the ring yet, as a heap
+        overflow = [(0, source)]
+        expanded = generated = peak_open_set = 0
+        search_start = time.perf_counter()
+        while overflow:
+            cost = overflow[0][0]
+            queued = 0
+            while queued or overflow:
+                if not queued and overflow[0][0] > cost:
+                    # Nothing is in the ring, so skip straight to the cheapest space waiting
+                    cost = overflow[0][0]
+                bucket = buckets[cost % ring_size]
+                while overflow and overflow[0][0] == cost:
+                    bucket.append(heappop(overflow)[1])
+                    queued += 1
+                if queued + len(overflow) > peak_open_set:
+                    peak_open_set = queued + len(overflow)
+
+                while bucket:
+                    index = bucket.pop()
+                    queued -= 1
+                    if settled[index] or costs[index] != cost or layers[index] != layer:
+                        continue
+                    settled[index] = 1
+                    expanded += 1
+                    if on_expand is not None:
+                        on_expand(divmod(index, width))
+                    if index == target:
+                        for bucket in buckets:
+                            bucket.clear()
+                        self._finish_search(search_start, expanded, generated, peak_open_set)
+                        self.search_stats["path_cost"] = cost
+                        self.search_stats["layers"] = layer + 1
+                        return self._trace_parents(parents, target)
+
+                    row, column = divmod(index, width)
+                    for row_offset, col_offset in ADJACENT_OFFSETS:
+                        next_row = row + row_offset
+                        next_column = column + col_offset
+                        if not (0 <= next_row < height and 0 <= next_column < width):
+                            continue
+
+                        next_index = next_row * width + next_column
+                        if settled[next_index]:
+                            continue
+
+                        next_layer_number = layer
+                        if row_offset and col_offset:
+                            next_cost = cost + diagonal_terrain[next_index]
+                        else:
+                            next_cost = cost + terrain[next_index]
+                        if cells[next_index]:
+                            if not allow_obstacle_elimination:
+                                continue
+                            if layered:
+                                next_layer_number = layer + 1
+                            else:
+                                next_cost = cost + removal_cost
+
+                        if next_layer_number > layers[next_index] or (
+                                next_layer_number == layers[next_index] and next_cost >= costs[next_index]):
+                            continue
+                        costs[next_index] = next_cost
+                        layers[next_index] = next_layer_number
+                        parents[next_index] = index
+                        generated += 1
+                        if next_layer_number != layer:
+                            next_layer.append((next_cost, next_index))
+                        elif next_cost - cost < ring_size:
+                            buckets[next_cost % ring_size].append(next_index)
+                            queued += 1
+                        else:
+                            heappush(overflow, (next_cost, next_index))
+                cost += 1
+
+            layer += 1
+            overflow = [
+                (start_cost, index) for start_cost, index in next_layer
+                if not settled[index] and costs[index] == start_cost
+            ]
+            heapify(overflow)
+            next_layer = []
+
+        self._finish_search(search_start, expanded, generated, peak_open_set)
+        return None
+
+    def _spur_search(self, source: int, target: int, allow_obstacle_elimination: bool, excluded: bytearray, banned_moves) -> tuple:
+        """
+        A* search over the same packed cost as _astar_search that never enters excluded
+        spaces and never makes the banned moves out of the source, as iter_paths needs for
+        the spur paths of Yen's algorithm
+
+        :param source: The flat index of the space to search from
+        :type source: int
+        :param target: The flat index of the space to search to
+        :type target: int
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :param excluded: 1 for every space the path may not enter
+        :type excluded: bytearray
+        :param banned_moves: The flat indices the path may not move to from the source
+        :return: A tuple of the packed cost and the flat indices of the path, or None
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        target_row, target_column = divmod(target, width)
+
+        g_scores = {source: 0}
+        parents = {source: -1}
+        closed = bytearray(cell_count)
+
+        open_set = [(0, 0, source)]
+        while open_set:
+            _, negative_cost, index = heappop(open_set)
+            if closed[index]:
+                continue
+            closed[index] = 1
+            cost = -negative_cost
+            if index == target:
+                path = []
+                while index != -1:
+                    path.append(index)
+                    index = parents[index]
+                path.reverse()
+                return cost, path
+
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if not (0 <= next_row < height and 0 <= next_column < width):
+                    continue
+
+                next_index = next_row * width + next_column
+                if closed[next_index] or excluded[next_index]:
+                    continue
+                if index == source and next_index in banned_moves:
+                    continue
+
+                if cells[next_index]:
+                    if not allow_obstacle_elimination:
+                        continue
+                    next_cost = cost + cell_count + 1
+                else:
+                    next_cost = cost + 1
+
+                if next_cost < g_scores.get(next_index, UNREACHED):
+                    g_scores[next_index] = next_cost
+                    parents[next_index] = index
+                    steps_left = max(abs(target_row - next_row), abs(target_column - next_column))
+                    heappush(open_set, (next_cost + steps_left, -next_cost, next_index))
+
+        return None
+
+    def _dijkstra_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        It searches from the starting point until the delivery point is settled and returns
+        the spaces of the path, or None when the delivery point cannot be reached
+
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+
+        costs, parents = self._search_tree(
+            source, allow_obstacle_elimination, target=target)
+
+        if costs[target] == UNREACHED:
+            return None
+        return self._trace_parents(parents, target)
+
+    def _astar_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        A* search from the starting point to the delivery point over the same packed cost as
+        _search_tree, using the least steps between two points as the heuristic, tightened
+        by any landmarks built with build_landmarks.
+
+        Every move costs at least one step and the least steps between neighbouring spaces
+        differ by at most one, so the heuristic never overestimates and each space is
+        closed at most once. The open set is a binary heap and the g-scores, parents and
+        closed set are flat arrays indexed by row * width + column.
+
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        heuristic = self._heuristic(self.delivery_point, allow_obstacle_elimination)
+        on_expand = self._on_expand
+
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+
+        g_scores = array("q", [UNREACHED]) * cell_count
+        parents = array("i", [-1]) * cell_count
+        closed = bytearray(cell_count)
+
+        g_scores[source] = 0
+        expanded = generated = peak_open_set = 0
+        # Ties on the f-score go to the deeper space, the one with the larger g-score
+        open_set = [(heuristic(self.starting_point, source), 0, source)]
+        search_start = time.perf_counter()
+        while open_set:
+            _, negative_cost, index = heappop(open_set)
+            cost = -negative_cost
+            if closed[index]:
+                continue
+            closed[index] = 1
+            expanded += 1
+            if on_expand is not None:
+                on_expand(divmod(index, width))
+            if index == target:
+                self._finish_search(search_start, expanded, generated, peak_open_set)
+                return self._trace_parents(parents, target)
+
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if not (0 <= next_row < height and 0 <= next_column < width):
+                    continue
+
+                next_index = next_row * width + next_column
+                if closed[next_index]:
+                    continue
+
+                if cells[next_index]:
+                    if not allow_obstacle_elimination:
+                        continue
+                    next_cost = cost + cell_count + 1
                 else:
-                    if next_closest_to_end_steps == None:
-                        next_closest_to_end_steps = steps_to_end
-                    elif steps_to_end <= next_closest_to_end_steps:
-                        next_closest_to_end_steps = steps_to_end
+                    next_cost = cost + 1
+
+                if next_cost < g_scores[next_index]:
+                    steps_left = heuristic((next_row, next_column), next_index)
+                    if steps_left == UNREACHED:
+                        continue
+                    g_scores[next_index] = next_cost
+                    parents[next_index] = index
+                    heappush(open_set, (next_cost + steps_left, -next_cost, next_index))
+                    generated += 1
+                    if len(open_set) > peak_open_set:
+                        peak_open_set = len(open_set)
+
+        self._finish_search(search_start, expanded, generated, peak_open_set)
+        return None
+
+    def _bidirectional_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        Bidirectional dijkstra's search over the same packed cost as _search_tree, growing
+        one frontier forwards from the starting point and one backwards from the delivery
+        point, always expanding the frontier with the cheaper next space.
+
+        Whenever a space gets a cost from one side while it already has one from the other,
+        the sum is the cost of a path through it and the best is kept. Once the cheapest
+        spaces left on both frontiers add up to at least that best cost no other path can
+        beat it, so the search stops. The meeting space and the spaces expanded from each
+        side are reported in search_stats.
+
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        on_expand = self._on_expand
+
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+
+        # Index 0 holds the forward search from the source, index 1 the backward search
+        costs = (array("q", [UNREACHED]) * cell_count, array("q", [UNREACHED]) * cell_count)
+        parents = (array("i", [-1]) * cell_count, array("i", [-1]) * cell_count)
+        settled = (bytearray(cell_count), bytearray(cell_count))
+        open_sets = ([(0, source)], [(0, target)])
+        expanded = [0, 0]
+        generated = 0
+        peak_open_set = 2
+        costs[0][source] = 0
+        costs[1][target] = 0
+
+        best_cost = 0 if source == target else UNREACHED
+        meeting_index = source if source == target else -1
+
+        search_start = time.perf_counter()
+        while open_sets[0] and open_sets[1]:
+            if open_sets[0][0][0] + open_sets[1][0][0] >= best_cost:
+                break
+
+            side = 0 if open_sets[0][0][0] <= open_sets[1][0][0] else 1
+            cost, index = heappop(open_sets[side])
+            if settled[side][index]:
+                continue
+            settled[side][index] = 1
+            expanded[side] += 1
+            if on_expand is not None:
+                on_expand(divmod(index, width))
+
+            side_costs = costs[side]
+            other_costs = costs[1 - side]
+
+            if side:
+                if cells[index]:
+                    if not allow_obstacle_elimination:
+                        continue
+                    move_cost = cell_count + 1
+                else:
+                    move_cost = 1
+
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if not (0 <= next_row < height and 0 <= next_column < width):
+                    continue
+
+                next_index = next_row * width + next_column
+                if settled[side][next_index]:
+                    continue
+
+                if not side:
+                    if cells[next_index]:
+                        if not allow_obstacle_elimination:
+                            continue
+                        move_cost = cell_count + 1
                     else:
-                        # Do not go with that adjacent point as it is not optimum
+                        move_cost = 1
+
+                next_cost = cost + move_cost
+                if next_cost < side_costs[next_index]:
+                    side_costs[next_index] = next_cost
+                    parents[side][next_index] = index
+                    heappush(open_sets[side], (next_cost, next_index))
+                    generated += 1
+                    if len(open_sets[0]) + len(open_sets[1]) > peak_open_set:
+                        peak_open_set = len(open_sets[0]) + len(open_sets[1])
+
+                    if other_costs[next_index] != UNREACHED and next_cost + other_costs[next_index] < best_cost:
+                        best_cost = next_cost + other_costs[next_index]
+                        meeting_index = next_index
+
+        self._finish_search(search_start, expanded[0] + expanded[1], generated, peak_open_set)
+        self.search_stats.update({
+            "meeting_point": divmod(meeting_index, width) if meeting_index != -1 else None,
+            "forward_expanded": expanded[0],
+            "backward_expanded": expanded[1],
+        })
+
+        if meeting_index == -1:
+            return None
+
+        path_spaces = self._trace_parents(parents[0], meeting_index)
+        backward_spaces = self._trace_parents(parents[1], meeting_index)
+        backward_spaces.reverse()
+        return path_spaces + backward_spaces[1:]
+
+    def _jps_search(self, allow_obstacle_elimination: bool) -> list[tuple]:
+        """
+        Jump point search from the starting point to the delivery point around obstacles.
+
+        Every move costs one step in any of the eight directions, so many paths of equal
+        length are symmetric. From each jump point the search only follows its natural and
+        forced neighbours, and jumps in a straight or diagonal line until it reaches the
+        delivery point or a space with a forced neighbour. Only jump points enter the open
+        set, and the path between them is filled in space by space at the end.
+
+        :param allow_obstacle_elimination: Must be False, jump points are only defined around obstacles
+        :type allow_obstacle_elimination: bool
+        :return: The (row, column) spaces of the path in order, or None
+        """
+        try:
+            assert not allow_obstacle_elimination
+        except AssertionError:
+            self._log("The jps engine cannot eliminate obstacles, use it with allow_obstacle_elimination=False")
+            raise
+
+        height = self.grid.height
+        width = self.grid.width
+        heuristic = self._heuristic(self.delivery_point, allow_obstacle_elimination)
+        on_expand = self._on_expand
+
+        source = self._cell_index(self.starting_point)
+        target = self._cell_index(self.delivery_point)
+
+        g_scores = {source: 0}
+        parents = {source: -1}
+        closed = bytearray(width * height)
+
+        expanded = generated = peak_open_set = 0
+        open_set = [(heuristic(self.starting_point, source), 0, source)]
+        search_start = time.perf_counter()
+        while open_set:
+            _, negative_cost, index = heappop(open_set)
+            if closed[index]:
+                continue
+            closed[index] = 1
+            expanded += 1
+            if on_expand is not None:
+                on_expand(divmod(index, width))
+            if index == target:
+                self._finish_search(search_start, expanded, generated, peak_open_set)
+                return self._fill_jumps(self._trace_parents(parents, target))
+
+            cost = -negative_cost
+            row, column = divmod(index, width)
+            for row_direction, col_direction in self._jump_directions(row, column, parents[index]):
+                jump_point = self._jump(row, column, row_direction, col_direction)
+                if jump_point is None:
+                    continue
+
+                next_index = jump_point[0] * width + jump_point[1]
+                if closed[next_index]:
+                    continue
+
+                next_cost = cost + max(abs(jump_point[0] - row), abs(jump_point[1] - column))
+                if next_cost < g_scores.get(next_index, UNREACHED):
+                    steps_left = heuristic(jump_point, next_index)
+                    if steps_left == UNREACHED:
                         continue
+                    g_scores[next_index] = next_cost
+                    parents[next_index] = index
+                    heappush(open_set, (next_cost + steps_left, -next_cost, next_index))
+                    generated += 1
+                    if len(open_set) > peak_open_set:
+                        peak_open_set = len(open_set)
 
-                if self.grid[next_row][next_column] == 1:  # Next step is an obstacle
-                    next_step = step(
-                        row=next_row,
-                        column=next_column,
-                        parent_row=start.row,
-                        parent_column=start.column,
-                        obstacles_eliminated=list(
-                            set(start.obstacles_eliminated+[(next_row, next_column)])),
-                        steps=start.steps + 1
-                    )
+        self._finish_search(search_start, expanded, generated, peak_open_set)
+        return None
+
+    def _jump_directions(self, row: int, column: int, parent: int) -> list[tuple]:
+        """
+        It returns the directions worth jumping in from a jump point: all eight from the
+        starting point, otherwise the natural neighbours in the direction of travel plus any
+        neighbours forced by an obstacle beside the jump point
+
+        :param row: The row of the jump point
+        :type row: int
+        :param column: The column of the jump point
+        :type column: int
+        :param parent: The flat index of the jump point it was reached from, -1 at the start
+        :type parent: int
+        :return: A list of (row, column) directions
+        """
+        if parent == -1:
+            return ADJACENT_OFFSETS
+
+        parent_row, parent_column = divmod(parent, self.grid.width)
+        row_direction = (row > parent_row) - (row < parent_row)
+        col_direction = (column > parent_column) - (column < parent_column)
+
+        if row_direction and col_direction:
+            directions = [(row_direction, 0), (0, col_direction), (row_direction, col_direction)]
+            if self._blocked(row - row_direction, column):
+                directions.append((-row_direction, col_direction))
+            if self._blocked(row, column - col_direction):
+                directions.append((row_direction, -col_direction))
+        elif row_direction:
+            directions = [(row_direction, 0)]
+            for side in (-1, 1):
+                if self._blocked(row, column + side):
+                    directions.append((row_direction, side))
+        else:
+            directions = [(0, col_direction)]
+            for side in (-1, 1):
+                if self._blocked(row + side, column):
+                    directions.append((side, col_direction))
+        return directions
+
+    def _jump(self, row: int, column: int, row_direction: int, col_direction: int) -> tuple:
+        """
+        It moves from a space in a straight or diagonal line and returns the first jump
+        point found: the delivery point, a space with a forced neighbour, or on a diagonal a
+        space from which a straight jump finds one. It returns None when the line runs into
+        an obstacle or the edge of the grid first.
+
+        :param row: The row to jump from
+        :type row: int
+        :param column: The column to jump from
+        :type column: int
+        :param row_direction: -1, 0 or 1
+        :type row_direction: int
+        :param col_direction: -1, 0 or 1
+        :type col_direction: int
+        :return: The (row, column) jump point, or None
+        """
+        blocked = self._blocked
+        delivery_point = self.delivery_point
+        while True:
+            row += row_direction
+            column += col_direction
+            if blocked(row, column):
+                return None
+            if (row, column) == delivery_point:
+                return (row, column)
+
+            if row_direction and col_direction:
+                if ((blocked(row - row_direction, column) and not blocked(row - row_direction, column + col_direction)) or
+                        (blocked(row, column - col_direction) and not blocked(row + row_direction, column - col_direction))):
+                    return (row, column)
+                if (self._jump(row, column, row_direction, 0) is not None or
+                        self._jump(row, column, 0, col_direction) is not None):
+                    return (row, column)
+            elif row_direction:
+                for side in (-1, 1):
+                    if blocked(row, column + side) and not blocked(row + row_direction, column + side):
+                        return (row, column)
+            else:
+                for side in (-1, 1):
+                    if blocked(row + side, column) and not blocked(row + side, column + col_direction):
+                        return (row, column)
+
+    def _blocked(self, row: int, column: int) -> bool:
+        """
+        It returns whether the space is off the grid or holds an obstacle
+        """
+        if 0 <= row < self.grid.height and 0 <= column < self.grid.width:
+            return self.grid.cells[row * self.grid.width + column] == 1
+        return True
+
+    def _fill_jumps(self, jump_points: list[tuple]) -> list[tuple]:
+        """
+        It fills in the spaces along the straight and diagonal lines between jump points
+
+        :param jump_points: The (row, column) jump points of a path in order
+        :type jump_points: list[tuple]
+        :return: Every (row, column) space of the path in order
+        """
+        path_spaces = jump_points[:1]
+        for (next_row, next_column) in jump_points[1:]:
+            row, column = path_spaces[-1]
+            row_direction = (next_row > row) - (next_row < row)
+            col_direction = (next_column > column) - (next_column < column)
+            while (row, column) != (next_row, next_column):
+                row += row_direction
+                column += col_direction
+                path_spaces.append((row, column))
+        return path_spaces
+
+    def _heuristic(self, target: tuple, allow_obstacle_elimination: bool):
+        """
+        It returns the heuristic used to guide a search towards the target, called with a
+        (row, column) point and its flat index.
+
+        The least steps between two points is always used. When obstacles cannot be
+        eliminated, fresh landmark fields add the lower bound |d(L, target) - d(L, point)|
+        for each landmark L, and show that a point cannot reach the target when only one of
+        the two is reachable from a landmark. Such points get a heuristic of UNREACHED.
+
+        :param target: The point the search is heading to
+        :type target: tuple
+        :param allow_obstacle_elimination: Whether the search may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :return: A function of a point and its index giving a lower bound on the steps left
+        """
+        steps_between = self._calculate_shortest_steps_between_points
+
+        if allow_obstacle_elimination or self.landmarks_stale or not self.landmarks:
+            return lambda point, index: steps_between(point, target)
+
+        target_index = self._cell_index(target)
+        fields = [(field, field[target_index]) for field in self.landmarks.values()]
+
+        def heuristic(point, index):
+            least_steps = steps_between(point, target)
+            for field, target_steps in fields:
+                point_steps = field[index]
+                if point_steps < 0 or target_steps < 0:
+                    if (point_steps < 0) != (target_steps < 0):
+                        return UNREACHED
+                elif abs(target_steps - point_steps) > least_steps:
+                    least_steps = abs(target_steps - point_steps)
+            return least_steps
+
+        return heuristic
+
+    def _step_distances(self, source: int) -> array:
+        """
+        Breadth first search from the source space around obstacles.
+
+        Moves onto free spaces are symmetric, so the result is also the least steps from
+        every free space back to the source.
+
+        :param source: The flat index of the space to measure from
+        :type source: int
+        :return: The least steps to every space, -1 where it cannot be reached
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+
+        distances = array("i", [-1]) * (width * height)
+        distances[source] = 0
+        frontier = deque([source])
+        while frontier:
+            index = frontier.popleft()
+            next_steps = distances[index] + 1
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if 0 <= next_row < height and 0 <= next_column < width:
+                    next_index = next_row * width + next_column
+                    if distances[next_index] < 0 and not cells[next_index]:
+                        distances[next_index] = next_steps
+                        frontier.append(next_index)
+
+        return distances
+
+    def _search_tree(self, source: int, allow_obstacle_elimination: bool, target: int = None, reverse: bool = False) -> tuple[array, array]:
+        """
+        Dijkstra's search over the flattened grid, settling every space at most once.
+
+        The cost pair (obstacles eliminated, steps taken) is packed into a single integer
+        as obstacles * cell_count + steps. A simple path takes fewer than cell_count steps,
+        so packed costs order exactly like the pairs. Moving onto an obstacle costs
+        cell_count + 1, any other move costs 1.
+
+        With reverse set the costs are those of reaching the source from each space, so the
+        cost of a move is charged for the space being left rather than the one entered.
+
+        :param source: The flat index of the space the search grows from
+        :type source: int
+        :param allow_obstacle_elimination: Whether the search may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        :param target: The flat index at which to stop the search, or None to settle every reachable space
+        :type target: int
+        :param reverse: Whether to search towards the source instead of away from it
+        :type reverse: bool
+        :return: The packed cost and the parent index of every space, UNREACHED and -1 where unreached
+        """
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        on_expand = self._on_expand
+
+        costs = array("q", [UNREACHED]) * cell_count
+        parents = array("i", [-1]) * cell_count
+        settled = bytearray(cell_count)
+
+        costs[source] = 0
+        expanded = generated = peak_open_set = 0
+        open_set = [(0, source)]
+        search_start = time.perf_counter()
+        while open_set:
+            cost, index = heappop(open_set)
+            if settled[index]:
+                continue
+            settled[index] = 1
+            expanded += 1
+            if on_expand is not None:
+                on_expand(divmod(index, width))
+            if index == target:
+                break
+
+            if reverse:
+                if cells[index]:
+                    if not allow_obstacle_elimination:
+                        # Nothing can move onto this space, so nothing is reached through it
+                        continue
+                    move_cost = cell_count + 1
                 else:
-                    next_step = step(
-                        row=next_row,
-                        column=next_column,
-                        parent_row=start.row,
-                        parent_column=start.column,
-                        obstacles_eliminated=list(
-                            set(start.obstacles_eliminated)),
-                        steps=start.steps + 1
-                    )
+                    move_cost = 1
+
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if not (0 <= next_row < height and 0 <= next_column < width):
+                    continue
+
+                next_index = next_row * width + next_column
+                if settled[next_index]:
+                    continue
+
+                if not reverse:
+                    if cells[next_index]:
+                        if not allow_obstacle_elimination:
+                            continue
+                        move_cost = cell_count + 1
+                    else:
+                        move_cost = 1
 
-                if (next_row, next_column) not in visited_path:
-                    self.find_path(
-                        start=next_step,
-                        end=end,
-                        path=path,
-                        visited_data=visited_data,
-                        visited_path=visited_path,
-                        paths_with_obstacles=paths_with_obstacles
-                    )
-        # Remove current vertex from path[] and mark it as unvisited
-        path.pop()
-        visited_data.remove(start)
-        visited_path.remove((start.row, start.column))
+                next_cost = cost + move_cost
+                if next_cost < costs[next_index]:
+                    costs[next_index] = next_cost
+                    parents[next_index] = index
+                    heappush(open_set, (next_cost, next_index))
+                    generated += 1
+                    if len(open_set) > peak_open_set:
+                        peak_open_set = len(open_set)
+
+        self._finish_search(search_start, expanded, generated, peak_open_set)
+        return costs, parents
+
+    def _create_visualizer(self):
+        """
+        It imports the visualizer and opens its window
+        """
+        return import_visualizer()()
+
+    def _log(self, message: str) -> None:
+        """
+        It prints a message for the user when the pathfinder is verbose
+        """
+        if self.verbose:
+            print(message)
+
+    def _finish_search(self, search_start: float, expanded: int, generated: int, peak_open_set: int) -> None:
+        """
+        It records the counts of a search's main loop in search_stats, along with when the
+        loop started and ended so that shortest_path can split its time into phases
+
+        :param search_start: The time.perf_counter() at which the main loop started
+        :type search_start: float
+        :param expanded: The spaces taken off the open set and expanded
+        :type expanded: int
+        :param generated: The spaces pushed onto the open set
+        :type generated: int
+        :param peak_open_set: The most entries held by the open set at once
+        :type peak_open_set: int
+        """
+        self._search_window = (search_start, time.perf_counter())
+        self.search_stats["nodes_expanded"] = expanded
+        self.search_stats["nodes_generated"] = generated
+        self.search_stats["peak_open_set"] = peak_open_set
+
+    def _grid_changed(self, changed_points: list[tuple]) -> None:
+        """
+        It is called whenever obstacles change, so that anything precomputed from the grid
+        can be marked stale, and passes the changed points on to each of grid_listeners
+
+        :param changed_points: The points whose cells changed
+        :type changed_points: list[tuple]
+        """
+        if self.landmarks:
+            self.landmarks_stale = True
+        self._distance_cache = {}
+        self._components_changed(changed_points)
+        for listener in self.grid_listeners:
+            listener(changed_points)
+
+    def _trace_parents(self, parents: array, index: int) -> list[tuple]:
+        """
+        It follows the parent indices back from the given space to the root of the search
+        and returns the spaces visited from the root onwards
+
+        :param parents: The parent index of every space, -1 at the root
+        :type parents: array
+        :param index: The flat index of the space to trace back from
+        :type index: int
+        :return: A list of (row, column) tuples starting at the root of the search
+        """
+        width = self.grid.width
+        path_spaces = []
+        while index != -1:
+            path_spaces.append(divmod(index, width))
+            index = parents[index]
+        path_spaces.reverse()
+        return path_spaces
+
+    def _build_path_summary(self, path_spaces: list[tuple]) -> tuple:
+        """
+        It turns a list of spaces from the starting point to the delivery point into the
+        (steps taken, obstacles eliminated, path steps) summary used by shortest_path
+
+        :param path_spaces: The (row, column) spaces of the path in order
+        :type path_spaces: list[tuple]
+        :return: A tuple of the steps taken, the obstacles eliminated and the path steps
+        """
+        path = []
+        obstacles_eliminated = []
+        parent_row, parent_column = None, None
+        for steps_taken, (row, column) in enumerate(path_spaces):
+            if steps_taken and self.grid[row][column] == 1:
+                obstacles_eliminated = obstacles_eliminated + [(row, column)]
+            path.append(PathStep(row, column, parent_row, parent_column,
+                                 obstacles_eliminated, steps_taken))
+            parent_row, parent_column = row, column
+
+        return (len(path_spaces) - 1, len(obstacles_eliminated), path)
+
+    def _cell_index(self, point: tuple) -> int:
+        """
+        It returns the row-major index of a (row, column) point on the grid
+        """
+        return point[0] * self.grid.width + point[1]
+
+    def _flat_cells(self) -> bytearray:
+        """
+        It returns the row-major buffer of cell values behind the grid
+        """
+        return self.grid.cells
+
+    def find_all_paths(self, paths_with_obstacles: bool):
+        """
+        It finds all possible paths from the starting point to the delivery point.
+
+        The search is depth first over an explicit stack rather than recursion, so paths
+        of any length are followed without reaching Python's recursion limit. The path so
+        far is kept as flat indices in a single array, the spaces on it are marked in a
+        bytearray and only the count of obstacles on it is carried, so extending the path
+        allocates nothing. Path steps are only built for the path chosen.
+
+        From each space the adjacent spaces are tried in order, skipping any that is no
+        closer to the delivery point than an earlier adjacent space of the same kind, free
+        or obstacle.
+
+        :param paths_with_obstacles: Whether the paths may pass through obstacles
+        :type paths_with_obstacles: bool
+        :return: a list of tuples. Each tuple contains the steps taken, the obstacles
+        eliminated and an array of the flat indices of the path's spaces
+        """
+        self.all_paths = []
+        cells = self._flat_cells()
+        height = self.grid.height
+        width = self.grid.width
+        on_expand = self._on_expand
+
+        start = self._cell_index(self.starting_point)
+        end = self._cell_index(self.delivery_point)
+        end_row, end_column = divmod(end, width)
+
+        visited = bytearray(width * height)
+        path = array("i", [start])
+        # For each space on the path: the obstacles up to it, the next adjacent space to try
+        # from it, and the least steps to the delivery point from the free and obstacle
+        # adjacent spaces tried so far
+        obstacle_counts = [0]
+        next_directions = [0]
+        closest_free_steps = [UNREACHED]
+        closest_obstacle_steps = [UNREACHED]
+
+        visited[start] = 1
+        expanded = 1
+        if on_expand is not None:
+            on_expand(self.starting_point)
+        if start == end:
+            self._found_path(path, 0)
+            path.pop()
+
+        while path:
+            index = path[-1]
+            direction = next_directions[-1]
+            if direction == len(ADJACENT_OFFSETS):
+                # Every adjacent space was tried, so step back off this space
+                path.pop()
+                visited[index] = 0
+                obstacle_counts.pop()
+                next_directions.pop()
+                closest_free_steps.pop()
+                closest_obstacle_steps.pop()
+                continue
+            next_directions[-1] = direction + 1
+
+            row_offset, col_offset = ADJACENT_OFFSETS[direction]
+            next_row = index // width + row_offset
+            next_column = index % width + col_offset
+            if not (0 <= next_row < height and 0 <= next_column < width):
+                continue
+
+            next_index = next_row * width + next_column
+            steps_to_end = max(abs(end_row - next_row), abs(end_column - next_column))
+            if cells[next_index]:
+                if not paths_with_obstacles:
+                    continue
+                if steps_to_end > closest_obstacle_steps[-1]:
+                    # Do not go with that adjacent point as it is not optimum
+                    continue
+                closest_obstacle_steps[-1] = steps_to_end
+            else:
+                if steps_to_end > closest_free_steps[-1]:
+                    # Do not go with that adjacent point as it is not optimum
+                    continue
+                closest_free_steps[-1] = steps_to_end
+
+            if visited[next_index]:
+                continue
+
+            expanded += 1
+            if on_expand is not None:
+                on_expand((next_row, next_column))
+            obstacles = obstacle_counts[-1] + cells[next_index]
+            path.append(next_index)
+
+            if next_index == end:
+                self._found_path(path, obstacles)
+                path.pop()
+                continue
+
+            visited[next_index] = 1
+            obstacle_counts.append(obstacles)
+            next_directions.append(0)
+            closest_free_steps.append(UNREACHED)
+            closest_obstacle_steps.append(UNREACHED)
+
+        self.search_stats["nodes_expanded"] = expanded
+        return self.all_paths
+
+    def _found_path(self, path: array, obstacles: int) -> None:
+        """
+        It stores a path found by find_all_paths as its steps, obstacles and a compact copy
+        of its flat indices, showing it when visualizing
+        """
+        self.all_paths.append((len(path) - 1, obstacles, array("i", path)))
+
+        if self.visualize:
+            self.pathfinder_visualizer.show_path([divmod(space, self.grid.width) for space in path])
 
     def _get_adjacent_spaces(self, row: int, col: int) -> list[tuple]:
         """
-        It returns a generator that yields the coordinates of all adjacent spaces to the given space
+        It returns a generator that yields the coordinates of all adjacent spaces to the given
+        space, in the order of ADJACENT_OFFSETS
 
         :param row: int: The row of the square we're checking
         :type row: int
         :param col: int: The column of the space to get adjacent spaces for
         :type col: int
         """
-        # Adjacent obstacles are the four sides of the square and four corners
-        for row_offset in [-1, 0, 1]:
-            for col_offset in [-1, 0, 1]:
-                # Check if the adjacent square is on the grid
-                if (row + row_offset >= 0 and
-                    row + row_offset < len(self.grid) and
-                    col + col_offset >= 0 and
-                        col + col_offset < len(self.grid[0])):
-                    if (row + row_offset, col + col_offset) != (row, col):
-                        yield (row + row_offset, col + col_offset)
+        height = self.grid.height
+        width = self.grid.width
+        for row_offset, col_offset in ADJACENT_OFFSETS:
+            if 0 <= row + row_offset < height and 0 <= col + col_offset < width:
+                yield (row + row_offset, col + col_offset)
 
     def _calculate_shortest_steps_between_points(self, point_1: tuple, point_2: tuple) -> float:
         horizontal_steps = abs(point_2[0] - point_1[0])
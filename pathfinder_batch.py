@@ -0,0 +1,221 @@
+"""
+Batch solving of pathfinding scenarios streamed as JSON lines.
+
+Each input line is a JSON object describing one scenario, with the same settings as the
+main.py command line:
+
+    {"grid_width": 10, "grid_height": 10, "start": [0, 0], "end": [9, 9],
+     "obstacles": [[1, 1], [2, 2]], "random_obstacles": 5, "seed": 3,
+     "obstacles_unremovable": false, "engine": "dijkstra"}
+
+Each output line is a JSON object with the scenario's line number, any "id" it was given,
+the path, steps taken, obstacles to remove and solve time, or the error that stopped it.
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from pathfinder import PathFinder
+
+
+def solve_scenario(scenario: dict) -> dict:
+    """
+    It builds the grid described by a scenario, finds the shortest path and returns the
+    result as a dictionary ready to be written as JSON
+
+    :param scenario: The scenario settings, missing ones take the main.py defaults
+    :type scenario: dict
+    :return: A dictionary with the path, steps taken, obstacles to remove and solve time
+    """
+    start_time = time.perf_counter()
+    allow_obstacle_elimination = not scenario.get("obstacles_unremovable", False)
+
+    # The pathfinder only logs rejected settings, so each is checked to have been taken
+    pathfinder = PathFinder(verbose=False)
+    pathfinder.create_grid(scenario.get("grid_width", 5), scenario.get("grid_height", 5))
+    grid_size = f"{pathfinder.grid.height}x{pathfinder.grid.width} grid"
+    start = tuple(scenario.get("start", (0, 0)))
+    end = tuple(scenario.get("end", (0, 0)))
+    pathfinder.set_starting_point(start)
+    pathfinder.set_delivery_point(end)
+    if pathfinder.starting_point != start or pathfinder.delivery_point != end:
+        raise ValueError(f"The start {list(start)} and end {list(end)} must be within the {grid_size}")
+
+    obstacles = [tuple(obstacle) for obstacle in scenario.get("obstacles", [])]
+    pathfinder.add_obstacles(obstacles)
+    if len(pathfinder.obstacles) != len(obstacles):
+        raise ValueError(f"The obstacles must be different free spaces within the {grid_size}, "
+                         "away from the start and end")
+
+    rectangles = scenario.get("rectangles", [])
+    pathfinder.add_obstacle_rectangles(rectangles)
+    cells = pathfinder.grid.cells
+    width = pathfinder.grid.width
+    if not all(
+        0 <= top <= bottom < pathfinder.grid.height and 0 <= left <= right < width and all(
+            cells[row * width + left:row * width + right + 1].count(1) == right - left + 1
+            for row in range(top, bottom + 1))
+        for (top, left), (bottom, right) in rectangles
+    ):
+        raise ValueError(f"The rectangles must be within the {grid_size}, away from the start and end")
+    pathfinder.add_random_obstacles(scenario.get("random_obstacles", 0), seed=scenario.get("seed"))
+    pathfinder.fill_obstacles(scenario.get("obstacle_density", 0), seed=scenario.get("seed"))
+
+    selected_path = pathfinder.shortest_path(
+        allow_obstacle_elimination=allow_obstacle_elimination,
+        engine=scenario.get("engine", "dijkstra")
+    )
+
+    result = path_result(selected_path)
+    result["solve_time"] = time.perf_counter() - start_time
+    return result
+
+
+def path_result(selected_path) -> dict:
+    """
+    It turns a path found by shortest_path into a dictionary ready to be written as JSON
+
+    :param selected_path: The path summary, empty when there is no path
+    :return: A dictionary with whether a path was found, and if so the path, steps taken
+    and obstacles to remove
+    """
+    result = {"found": bool(selected_path)}
+    if selected_path:
+        result["path"] = [[path_step.row, path_step.column] for path_step in selected_path[2]]
+        result["steps"] = selected_path[0]
+        result["obstacles_to_remove"] = [
+            list(obstacle) for obstacle in selected_path[2][-1].obstacles_eliminated
+        ]
+    return result
+
+
+def solve_lines(numbered_lines: list[tuple]) -> list[str]:
+    """
+    It solves a chunk of scenario lines and returns one JSON result line for each. This is
+    the unit of work sent to each worker process.
+
+    :param numbered_lines: The (line number, JSON scenario line) pairs of the chunk
+    :type numbered_lines: list[tuple]
+    :return: The JSON result lines, in the same order
+    """
+    results = []
+    for line_number, line in numbered_lines:
+        result = {"line": line_number}
+        try:
+            scenario = json.loads(line)
+            if "id" in scenario:
+                result["id"] = scenario["id"]
+            result.update(solve_scenario(scenario))
+        except Exception as error:
+            result["error"] = f"{type(error).__name__}: {error}"
+        results.append(json.dumps(result))
+    return results
+
+
+def run_batch(input_path: str, output_path: str = "-", workers: int = None, chunk_size: int = 64, ordered: bool = True) -> int:
+    """
+    It streams scenarios from a JSON lines file, solves them across a pool of worker
+    processes and streams the results to a JSON lines file.
+
+    At most two chunks per worker are in flight and at most four per worker are read
+    ahead of the results being written, so memory stays bounded however large the input
+    file is. Blank lines are skipped.
+
+    :param input_path: The scenario file, or - for standard input
+    :type input_path: str
+    :param output_path: The result file, or - for standard output
+    :type output_path: str
+    :param workers: The number of worker processes, defaults to the number of CPUs. With 1
+    the scenarios are solved in this process
+    :type workers: int
+    :param chunk_size: The number of scenarios sent to a worker at a time
+    :type chunk_size: int
+    :param ordered: Whether results are written in input order rather than as they finish
+    :type ordered: bool
+    :return: The number of scenarios solved
+    """
+    workers = workers or os.cpu_count() or 1
+    input_file = sys.stdin if input_path == "-" else open(input_path)
+    output_file = sys.stdout if output_path == "-" else open(output_path, "w")
+
+    try:
+        chunks = _read_chunks(input_file, chunk_size)
+        if workers == 1:
+            return sum(_write_lines(output_file, solve_lines(chunk)) for chunk in chunks)
+        return _run_pool(chunks, output_file, workers, ordered)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+def _run_pool(chunks, output_file, workers: int, ordered: bool) -> int:
+    """
+    It keeps up to two chunks per worker in flight and writes each chunk's results once it
+    finishes, holding back finished chunks that are ahead of the next one when ordered
+    """
+    solved = 0
+    chunk_numbers = {}
+    finished = {}
+    next_chunk_number = 0
+    submitted = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in islice(chunks, 2 * workers):
+            future = executor.submit(solve_lines, chunk)
+            chunk_numbers[future] = submitted
+            pending.add(future)
+            submitted += 1
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if ordered:
+                    finished[chunk_numbers.pop(future)] = future.result()
+                    while next_chunk_number in finished:
+                        solved += _write_lines(output_file, finished.pop(next_chunk_number))
+                        next_chunk_number += 1
+                else:
+                    chunk_numbers.pop(future)
+                    solved += _write_lines(output_file, future.result())
+
+            # Finished chunks held back behind a slow one count against the read ahead
+            room = min(2 * workers - len(pending), 4 * workers - len(pending) - len(finished))
+            for chunk in islice(chunks, max(room, 0)):
+                next_future = executor.submit(solve_lines, chunk)
+                chunk_numbers[next_future] = submitted
+                pending.add(next_future)
+                submitted += 1
+
+    return solved
+
+
+def _read_chunks(input_file, chunk_size: int):
+    """
+    It yields chunks of (line number, line) pairs for the non-blank scenario lines
+    """
+    chunk = []
+    for line_number, line in enumerate(input_file, 1):
+        if not line.strip():
+            continue
+        chunk.append((line_number, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_lines(output_file, lines: list[str]) -> int:
+    """
+    It writes result lines to the output file and returns how many were written
+    """
+    for line in lines:
+        output_file.write(line + "\n")
+    output_file.flush()
+    return len(lines)
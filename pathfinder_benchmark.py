@@ -0,0 +1,238 @@
+"""
+Reproducible benchmarks for the PathFinder search engines.
+
+Run a sweep over grid size, obstacle density, obstacle elimination and engine, writing the
+results as JSON:
+
+    python pathfinder_benchmark.py run --output benchmark.json
+
+Compare a new run against a stored baseline, exiting with status 1 on regressions:
+
+    python pathfinder_benchmark.py compare baseline.json benchmark.json
+
+Each run also measures how long "import pathfinder" takes in a fresh interpreter with
+python -X importtime, since solver processes are short-lived, and flags it when it grows or
+goes over IMPORT_TIME_BUDGET.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from pathfinder import PathFinder
+
+GRID_SIZES = (32, 64, 128)
+OBSTACLE_DENSITIES = (0.1, 0.2, 0.3)
+ENGINES = ("dijkstra", "astar", "jps", "bidirectional")
+REPEATS = 7
+
+# Relative increases over the baseline that count as a regression
+TIME_TOLERANCE = 0.25
+NODES_TOLERANCE = 0.0
+MEMORY_TOLERANCE = 0.10
+
+# Seconds that importing pathfinder may take, including everything it imports
+IMPORT_TIME_BUDGET = 0.05
+
+
+def build_scenario(size: int, density: float, seed: int) -> PathFinder:
+    """
+    It creates a size x size grid from corner to corner with seeded random obstacles
+
+    :param size: The width and height of the grid
+    :type size: int
+    :param density: The fraction of spaces holding an obstacle
+    :type density: float
+    :param seed: The seed for the obstacle placement
+    :type seed: int
+    :return: A pathfinder ready to search
+    """
+    pathfinder = PathFinder(verbose=False)
+    pathfinder.create_grid(size, size)
+    pathfinder.add_random_obstacles(int(size * size * density), seed=seed)
+    return pathfinder
+
+
+def benchmark_case(size: int, density: float, allow_obstacle_elimination: bool, engine: str, repeats: int = REPEATS) -> dict:
+    """
+    It times one engine on seeded scenarios, one per repeat, then measures peak memory on the
+    first scenario in a separate run so that tracing does not skew the timings
+
+    :return: A dictionary of the case settings and its measurements
+    """
+    solve_times = []
+    nodes_expanded = []
+    paths_found = 0
+    for seed in range(repeats):
+        pathfinder = build_scenario(size, density, seed)
+        start_time = time.perf_counter()
+        selected_path = pathfinder.shortest_path(allow_obstacle_elimination, engine=engine)
+        solve_times.append(time.perf_counter() - start_time)
+        nodes_expanded.append(pathfinder.search_stats.get("nodes_expanded", 0))
+        paths_found += bool(selected_path)
+
+    pathfinder = build_scenario(size, density, 0)
+    tracemalloc.start()
+    pathfinder.shortest_path(allow_obstacle_elimination, engine=engine)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    solve_times.sort()
+    return {
+        "engine": engine,
+        "size": size,
+        "density": density,
+        "allow_obstacle_elimination": allow_obstacle_elimination,
+        "repeats": repeats,
+        "median_time": statistics.median(solve_times),
+        "p95_time": solve_times[min(len(solve_times) - 1, int(0.95 * len(solve_times)))],
+        "nodes_expanded": statistics.median(nodes_expanded),
+        "peak_memory_bytes": peak_memory,
+        "paths_found": paths_found,
+    }
+
+
+def run_suite(sizes=GRID_SIZES, densities=OBSTACLE_DENSITIES, engines=ENGINES, repeats: int = REPEATS) -> dict:
+    """
+    It benchmarks every combination of grid size, obstacle density, obstacle elimination and
+    engine. The jps engine only runs without obstacle elimination.
+
+    :return: A dictionary with details of the environment and a list of case results
+    """
+    results = []
+    for size in sizes:
+        for density in densities:
+            for allow_obstacle_elimination in (True, False):
+                for engine in engines:
+                    if engine == "jps" and allow_obstacle_elimination:
+                        continue
+                    results.append(benchmark_case(
+                        size, density, allow_obstacle_elimination, engine, repeats))
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "import_time": measure_import_time(repeats=repeats),
+        "results": results,
+    }
+
+
+def measure_import_time(module: str = "pathfinder", repeats: int = REPEATS) -> float:
+    """
+    It imports a module in fresh interpreters with python -X importtime and returns the
+    median of its cumulative import time, after one import to warm the bytecode cache
+
+    :param module: The module to import
+    :type module: str
+    :param repeats: The number of timed imports
+    :type repeats: int
+    :return: The import time in seconds
+    """
+    import_times = []
+    for repeat in range(repeats + 1):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        # Lines look like "import time:  self [us] | cumulative | imported package"
+        for line in completed.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == module and repeat:
+                import_times.append(int(fields[1]) / 1e6)
+    return statistics.median(import_times)
+
+
+def compare(baseline: dict, current: dict, time_tolerance: float = TIME_TOLERANCE, import_time_budget: float = IMPORT_TIME_BUDGET) -> list[str]:
+    """
+    It matches cases between two suite results and describes every measurement that grew
+    by more than its tolerance over the baseline, and the import time when it grew or is
+    over its budget
+
+    :param baseline: The stored suite result
+    :type baseline: dict
+    :param current: The new suite result
+    :type current: dict
+    :param time_tolerance: The relative increase in median, p95 or import time allowed
+    :type time_tolerance: float
+    :param import_time_budget: The most seconds importing pathfinder may take
+    :type import_time_budget: float
+    :return: A list of regression descriptions, empty when there are none
+    """
+    tolerances = {
+        "median_time": time_tolerance,
+        "p95_time": time_tolerance,
+        "nodes_expanded": NODES_TOLERANCE,
+        "peak_memory_bytes": MEMORY_TOLERANCE,
+    }
+    baseline_cases = {_case_key(case): case for case in baseline["results"]}
+
+    regressions = []
+    import_time = current.get("import_time")
+    if import_time is not None:
+        if "import_time" in baseline and import_time > baseline["import_time"] * (1 + time_tolerance):
+            regressions.append(f"import pathfinder: import_time {baseline['import_time']:.6g} -> {import_time:.6g}")
+        if import_time > import_time_budget:
+            regressions.append(f"import pathfinder: import_time {import_time:.6g} over the budget of {import_time_budget:.6g}")
+
+    for case in current["results"]:
+        baseline_case = baseline_cases.get(_case_key(case))
+        if baseline_case is None:
+            continue
+        for measurement, tolerance in tolerances.items():
+            if case[measurement] > baseline_case[measurement] * (1 + tolerance):
+                regressions.append(
+                    f"{_describe_case(case)}: {measurement} {baseline_case[measurement]:.6g} -> {case[measurement]:.6g}")
+    return regressions
+
+
+def _case_key(case: dict) -> tuple:
+    return (case["engine"], case["size"], case["density"], case["allow_obstacle_elimination"])
+
+
+def _describe_case(case: dict) -> str:
+    elimination = "with" if case["allow_obstacle_elimination"] else "without"
+    return f"{case['engine']} {case['size']}x{case['size']} density {case['density']} {elimination} elimination"
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Amazon Path Finder benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmark sweep")
+    run_parser.add_argument("--output", help="JSON file to write results to", default="benchmark.json")
+    run_parser.add_argument("--sizes", nargs='+', type=int, help="Grid sizes to sweep", default=GRID_SIZES)
+    run_parser.add_argument("--densities", nargs='+', type=float, help="Obstacle densities to sweep", default=OBSTACLE_DENSITIES)
+    run_parser.add_argument("--engines", nargs='+', choices=PathFinder.ENGINES, help="Engines to sweep", default=ENGINES)
+    run_parser.add_argument("--repeats", type=int, help="Seeded scenarios per case", default=REPEATS)
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions against a baseline")
+    compare_parser.add_argument("baseline", help="Stored baseline JSON file")
+    compare_parser.add_argument("current", help="New results JSON file")
+    compare_parser.add_argument("--time-tolerance", type=float, help="Relative time increase allowed", default=TIME_TOLERANCE)
+    compare_parser.add_argument("--import-time-budget", type=float, help="Seconds importing pathfinder may take", default=IMPORT_TIME_BUDGET)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        suite = run_suite(args.sizes, args.densities, args.engines, args.repeats)
+        with open(args.output, "w") as output_file:
+            json.dump(suite, output_file, indent=2)
+        for case in suite["results"]:
+            print(f"{_describe_case(case)}: median {case['median_time']:.6f}s, p95 {case['p95_time']:.6f}s, "
+                  f"{case['nodes_expanded']} nodes, {case['peak_memory_bytes']} bytes")
+        print(f"import pathfinder: {suite['import_time']:.6f}s")
+    else:
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            regressions = compare(json.load(baseline_file), json.load(current_file),
+                                  args.time_tolerance, args.import_time_budget)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions found")
+        sys.exit(1 if regressions else 0)
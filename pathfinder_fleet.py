@@ -0,0 +1,399 @@
+"""
+Cooperative multi-vehicle planning over a PathFinder grid.
+"""
+import time
+from heapq import heappop, heappush
+
+from pathfinder import ADJACENT_OFFSETS, PathFinder
+
+# A vehicle either stays where it is or moves to one of the eight adjacent spaces
+MOVES = ((0, 0),) + ADJACENT_OFFSETS
+
+# The latest reserved time given to spaces vehicles stay on for good
+PARKED = 2 ** 62
+
+
+class FleetPlanner:
+    """
+    FleetPlanner plans paths for many vehicles sharing a PathFinder grid so that no two are
+    ever on the same space at the same time, and no two swap spaces in one step.
+
+    Vehicles are planned one at a time in priority order with cooperative A*, a search over
+    (time, space) states where each step either waits or moves to an adjacent space around
+    obstacles. The states of every planned path are kept in a reservation table that later
+    vehicles must avoid. A vehicle that has arrived stays on its delivery point, so that
+    space is held from then on, and a vehicle may only stop on its delivery point if no
+    earlier vehicle passes through it afterwards. A vehicle no path is found for stays
+    where it started, so the vehicles are planned again with that space held for good,
+    until no more vehicles fail.
+
+    With a window set (windowed hierarchical cooperative A*) each vehicle only reserves its
+    next window steps and the planning is repeated from where every vehicle got to, so
+    vehicles that would block each other for good get a chance to make way. Each window
+    only looks ahead with the least steps ignoring obstacles, so it is much faster for large
+    fleets, but a vehicle can be held up behind long walls. A vehicle boxed in by the ones
+    planned before it is planned first and the window tried again, and if no order works
+    every vehicle waits where it is for that window. Vehicles that do not arrive stay on
+    the grid in the plan, holding the spaces they got to.
+
+    The reservation table is a dict keyed by the single integer time * cells + space, so
+    it holds one small entry per reserved state however large the grid is.
+    """
+
+    def __init__(self, pathfinder: PathFinder, window: int = None, max_steps: int = None) -> None:
+        """
+        It plans on the pathfinder's grid
+
+        :param pathfinder: The pathfinder holding the grid
+        :type pathfinder: PathFinder
+        :param window: The steps each vehicle reserves before all are planned again, or None
+        to plan every vehicle all the way to its delivery point at once
+        :type window: int
+        :param max_steps: The most steps a path may take, defaults to four times the
+        grid's width and height together
+        :type max_steps: int
+        """
+        try:
+            assert window is None or window >= 1
+        except AssertionError:
+            print("The planning window must be at least 1 step")
+            raise
+
+        self.pathfinder = pathfinder
+        self.grid = pathfinder.grid
+        self.window = window
+        self.max_steps = max_steps or 4 * (self.grid.width + self.grid.height)
+
+        # Reserved time * cells + space states, mapped to the vehicle holding them
+        self.reservations = {}
+        # Spaces vehicles stay on from some time onwards, mapped to (time, vehicle)
+        self._parked = {}
+        # The latest time each space is reserved at
+        self._last_reserved = {}
+
+        self.plan_stats = {}
+
+    def plan(self, vehicles: list[tuple]) -> list[list[tuple]]:
+        """
+        It plans a path for each vehicle, in priority order, that avoids every vehicle
+        before it, and records the planning measurements in plan_stats
+
+        :param vehicles: The (starting point, delivery point) of each vehicle, the first
+        having the highest priority
+        :type vehicles: list[tuple]
+        :return: The path of each vehicle as its (row, column) space at every time step from
+        0, ending on its delivery point. A vehicle no path is found for has just its starting
+        point, and with a window a vehicle that does not arrive within max_steps keeps the
+        spaces it was on, ending short of its delivery point. A vehicle stays on the last
+        space of its path afterwards
+        """
+        starts = [tuple(start) for start, _ in vehicles]
+        goals = [tuple(goal) for _, goal in vehicles]
+        try:
+            for point in starts + goals:
+                assert 0 <= point[0] < self.grid.height
+                assert 0 <= point[1] < self.grid.width
+                assert self.grid[point[0]][point[1]] == 0
+            assert len(set(starts)) == len(starts) and len(set(goals)) == len(goals)
+        except AssertionError:
+            print("Vehicles must start and end on different free spaces within the grid")
+            raise
+
+        self.reservations = {}
+        self._parked = {}
+        self._last_reserved = {}
+        self._expanded = 0
+
+        start_time = time.perf_counter()
+        if self.window is None:
+            paths = self._plan_whole_paths(starts, goals)
+        else:
+            paths = self._plan_windows(starts, goals)
+        planning_time = time.perf_counter() - start_time
+
+        found_paths = [path for path, goal in zip(paths, goals) if path and path[-1] == goal]
+        self.plan_stats = {
+            "vehicles": len(vehicles),
+            "planned": len(found_paths),
+            "failed": len(vehicles) - len(found_paths),
+            "makespan": max((len(path) - 1 for path in found_paths), default=0),
+            "sum_of_costs": sum(len(path) - 1 for path in found_paths),
+            "nodes_expanded": self._expanded,
+            "reservations": len(self.reservations),
+            "planning_time": planning_time,
+        }
+        return paths
+
+    @staticmethod
+    def find_conflicts(paths: list[list[tuple]]) -> list[tuple]:
+        """
+        It checks a set of paths, as returned by plan, for vehicles on the same space at the
+        same time (vertex conflicts) and vehicles swapping spaces in one step (swap
+        conflicts), counting vehicles as staying on the last space of their paths
+
+        :param paths: The space at every time step of each vehicle, empty ones are ignored
+        :type paths: list[list[tuple]]
+        :return: A list of (time, "vertex" or "swap", vehicle, other vehicle, space) tuples,
+        where a swap's time is when it starts and its space is where the first vehicle started
+        """
+        planned = [(vehicle, path) for vehicle, path in enumerate(paths) if path]
+        makespan = max((len(path) for _, path in planned), default=0)
+
+        conflicts = []
+        for time_step in range(makespan):
+            occupied = {}
+            moves = {}
+            for vehicle, path in planned:
+                space = path[min(time_step, len(path) - 1)]
+                if space in occupied:
+                    conflicts.append((time_step, "vertex", occupied[space], vehicle, space))
+                else:
+                    occupied[space] = vehicle
+
+                if time_step + 1 < len(path) and path[time_step + 1] != space:
+                    next_space = path[time_step + 1]
+                    other_vehicle = moves.get((next_space, space))
+                    if other_vehicle is not None:
+                        conflicts.append((time_step, "swap", other_vehicle, vehicle, next_space))
+                    moves[space, next_space] = vehicle
+        return conflicts
+
+    def _plan_whole_paths(self, starts: list[tuple], goals: list[tuple]) -> list[list[tuple]]:
+        """
+        Cooperative A*: each vehicle is planned to its delivery point in turn and every
+        state of its path reserved, then it stays parked there. When a vehicle fails, the
+        planning starts over with it parked on its starting point from the start
+        """
+        reachable = [self.pathfinder.is_reachable(start, goal) for start, goal in zip(starts, goals)]
+        failed = set()
+        while True:
+            self.reservations = {}
+            self._parked = {}
+            self._last_reserved = {}
+            for vehicle in failed:
+                self._park(vehicle, self.grid.index(*starts[vehicle]), 0)
+
+            paths = []
+            for vehicle, (start, goal) in enumerate(zip(starts, goals)):
+                if vehicle in failed:
+                    paths.append([start])
+                    continue
+
+                path = None
+                # A delivery point where a vehicle stays for good can never be reached
+                goal_index = self.grid.index(*goal)
+                if reachable[vehicle] and goal_index not in self._parked:
+                    path = self._search(start, goal, 0, self.max_steps)
+                if not path:
+                    failed.add(vehicle)
+                    break
+                self._reserve(vehicle, path, 0)
+                self._park(vehicle, goal_index, len(path) - 1)
+                paths.append(path)
+            else:
+                return paths
+
+    def _plan_windows(self, starts: list[tuple], goals: list[tuple]) -> list[list[tuple]]:
+        """
+        Windowed cooperative A*: every vehicle still under way reserves its next window
+        steps, all of them follow those steps, and the planning starts over from there until
+        every vehicle has arrived or max_steps have passed
+        """
+        paths = [[start] for start in starts]
+        reachable = [self.pathfinder.is_reachable(start, goal) for start, goal in zip(starts, goals)]
+        # Vehicles still under way, in the order they are planned in
+        under_way = [vehicle for vehicle in range(len(starts)) if reachable[vehicle]]
+
+        start_time = 0
+        while under_way and start_time < self.max_steps:
+            end_time = start_time + self.window
+            # Vehicles that have arrived, or cannot get anywhere, hold their space for the window
+            moving = set(under_way)
+            for vehicle, path in enumerate(paths):
+                if vehicle not in moving:
+                    self._reserve(vehicle, [path[-1]] * (self.window + 1), start_time)
+
+            window_paths = None
+            for _ in range(len(under_way)):
+                window_paths = self._plan_window(under_way, paths, goals, start_time)
+                if isinstance(window_paths, dict):
+                    break
+                # Boxed in by the vehicles planned before it, so it goes first from now on
+                under_way.remove(window_paths)
+                under_way.insert(0, window_paths)
+                window_paths = None
+            if window_paths is None:
+                # No vehicle is on another's space, so all of them waiting can never conflict
+                window_paths = {vehicle: [paths[vehicle][-1]] * (self.window + 1) for vehicle in under_way}
+                for vehicle, window_path in window_paths.items():
+                    self._reserve(vehicle, window_path, start_time)
+
+            for vehicle in under_way:
+                paths[vehicle].extend(window_paths[vehicle][1:])
+            under_way = [vehicle for vehicle in under_way if paths[vehicle][-1] != goals[vehicle]]
+            start_time = end_time
+
+        for path in paths:
+            # Waiting at the end of the last window is not part of the path
+            while len(path) > 1 and path[-2] == path[-1]:
+                path.pop()
+        return paths
+
+    def _plan_window(self, under_way: list[int], paths: list[list[tuple]], goals: list[tuple], start_time: int):
+        """
+        It plans and reserves the next window steps of each vehicle under way in order,
+        from the end of its path
+
+        :return: The window path of each vehicle by vehicle, or the first vehicle that
+        could neither move nor wait, with the window's reservations undone
+        """
+        undo = []
+        window_paths = {}
+        for vehicle in under_way:
+            window_path = self._search(paths[vehicle][-1], goals[vehicle], start_time, self.window)
+            if window_path is None:
+                for key, previous_vehicle, index, previous_time in reversed(undo):
+                    if previous_vehicle is None:
+                        del self.reservations[key]
+                    else:
+                        self.reservations[key] = previous_vehicle
+                    if previous_time is None:
+                        del self._last_reserved[index]
+                    else:
+                        self._last_reserved[index] = previous_time
+                return vehicle
+            window_path = window_path + [window_path[-1]] * (self.window + 1 - len(window_path))
+            self._reserve(vehicle, window_path, start_time, undo)
+            window_paths[vehicle] = window_path
+        return window_paths
+
+    def _search(self, start: tuple, goal: tuple, start_time: int, depth: int) -> list[tuple]:
+        """
+        A* over (time, space) states from the start at start_time, avoiding reserved
+        states, parked vehicles and swaps with reserved moves. Every step costs one whether
+        it waits or moves, and the heuristic is the least steps ignoring obstacles, or the
+        time until the goal is no longer reserved if that is longer.
+
+        The search ends on the goal once no other vehicle passes through it later. With a
+        window it otherwise ends at the first state depth steps ahead, being the one with the
+        least steps taken plus steps left; without one it fails beyond depth steps.
+
+        :return: The spaces of the path at each time step from start_time, or None
+        """
+        cells = self.grid.cells
+        height = self.grid.height
+        width = self.grid.width
+        cell_count = width * height
+        reservations = self.reservations
+        parked = self._parked
+        last_reserved = self._last_reserved
+        windowed = self.window is not None
+
+        source = self.grid.index(*start)
+        target = self.grid.index(*goal)
+        target_row, target_column = goal
+        # The vehicle cannot stop on the goal until the last vehicle through it has passed
+        goal_free_at = last_reserved.get(target, -1) + 1
+
+        source_state = start_time * cell_count + source
+        parents = {source_state: -1}
+        # The earliest time each space was reached at. Moving onto a space later is no better
+        # than having waited there, unless it is reserved from then on
+        first_reached = {source: start_time}
+        closed = set()
+        # Ties go to the state with the most steps taken, then the one nearest the goal
+        distance = max(abs(start[0] - target_row), abs(start[1] - target_column))
+        open_set = [(max(distance, goal_free_at - start_time), 0, distance, source_state)]
+        end_state = None
+        expanded = 0
+        while open_set:
+            _, negative_steps, _, state = heappop(open_set)
+            if state in closed:
+                continue
+            closed.add(state)
+            expanded += 1
+
+            steps = -negative_steps
+            time_step, index = divmod(state, cell_count)
+            if index == target and last_reserved.get(index, -1) <= time_step:
+                end_state = state
+                break
+            if steps == depth:
+                if windowed:
+                    end_state = state
+                    break
+                continue
+
+            row, column = divmod(index, width)
+            next_time = time_step + 1
+            for row_offset, col_offset in MOVES:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if not (0 <= next_row < height and 0 <= next_column < width):
+                    continue
+
+                next_index = next_row * width + next_column
+                if cells[next_index]:
+                    continue
+                next_state = next_time * cell_count + next_index
+                if next_state in parents:
+                    continue
+
+                latest = last_reserved.get(next_index, -1)
+                reached = first_reached.get(next_index)
+                if next_index != index and reached is not None and reached <= next_time and latest < reached:
+                    continue
+
+                if latest >= time_step:
+                    if next_state in reservations:
+                        continue
+                    parked_since = parked.get(next_index)
+                    if parked_since is not None and parked_since[0] <= next_time:
+                        continue
+                    if next_index != index:
+                        # Moving into a space whose holder is moving into ours would swap them
+                        other_vehicle = reservations.get(time_step * cell_count + next_index)
+                        if other_vehicle is not None and reservations.get(next_time * cell_count + index) == other_vehicle:
+                            continue
+
+                # Every path to a state takes the same steps, so the first parent found will do
+                parents[next_state] = state
+                if reached is None or next_time < reached:
+                    first_reached[next_index] = next_time
+                distance = max(abs(next_row - target_row), abs(next_column - target_column))
+                heappush(open_set, (steps + 1 + max(distance, goal_free_at - next_time), -(steps + 1), distance, next_state))
+
+        self._expanded += expanded
+        if end_state is None:
+            return None
+
+        path = []
+        state = end_state
+        while state != -1:
+            path.append(divmod(state % cell_count, width))
+            state = parents[state]
+        path.reverse()
+        return path
+
+    def _reserve(self, vehicle: int, path: list[tuple], start_time: int, undo: list = None) -> None:
+        """
+        It reserves the space of the path at each time step from start_time for the vehicle,
+        recording what each reservation replaced in undo if given
+        """
+        width = self.grid.width
+        cell_count = width * self.grid.height
+        for time_step, (row, column) in enumerate(path, start_time):
+            index = row * width + column
+            key = time_step * cell_count + index
+            if undo is not None:
+                undo.append((key, self.reservations.get(key), index, self._last_reserved.get(index)))
+            self.reservations[key] = vehicle
+            if self._last_reserved.get(index, -1) < time_step:
+                self._last_reserved[index] = time_step
+
+    def _park(self, vehicle: int, index: int, time_step: int) -> None:
+        """
+        It holds the space for the vehicle from the time step onwards
+        """
+        self._parked[index] = (time_step, vehicle)
+        self._last_reserved[index] = PARKED
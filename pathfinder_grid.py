@@ -0,0 +1,187 @@
+"""
+Compact grid storage for the PathFinder class.
+
+Grids can be saved to and loaded from a binary grid file: a 20 byte header of the magic
+bytes b"PFGRID1\n", then the width and height as little-endian 32 bit integers and the
+encoding as one byte followed by three zero bytes. With the CELLS encoding the header is
+followed by one byte per cell, row-major, which is memory mapped when loaded rather than
+read. With the BITMAP encoding it is followed by one bit per cell, most significant bit
+first, which takes an eighth of the space but is unpacked when loaded.
+"""
+import mmap
+import struct
+
+GRID_FILE_MAGIC = b"PFGRID1\n"
+GRID_FILE_HEADER = struct.Struct("<8sIIB3x")
+CELLS = 0
+BITMAP = 1
+
+# Characters of a text map that are free spaces, any other character is an obstacle. These
+# cover 0 and 1 maps as well as the passable terrain of Moving AI benchmark maps.
+FREE_SPACE_CHARACTERS = ".GS0 "
+
+# Byte translations between cells and the "0" and "1" digits of a binary number
+_CELLS_TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+_DIGITS_TO_CELLS = bytes.maketrans(b"01", b"\x00\x01")
+_TEXT_TO_CELLS = bytes(0 if chr(code) in FREE_SPACE_CHARACTERS else 1 for code in range(256))
+
+
+class Grid:
+    """
+    Grid is a 2D grid of cells stored row-major in a single bytearray, one byte per cell.
+
+    A free cell is 0 and an obstacle is 1, as in the list of lists it replaces.
+    Indexing by row returns a memoryview over that row, so grid[row][column] reads and
+    writes the shared buffer directly. Searches can work on the flat cells buffer using
+    row * width + column indices instead.
+    """
+
+    def __init__(self, width: int, height: int, cells=None) -> None:
+        """
+        It creates a grid of the given width and height, filled with zeros unless an existing
+        row-major buffer of cells is given
+
+        :param width: The width of the grid
+        :type width: int
+        :param height: The height of the grid
+        :type height: int
+        :param cells: A writable buffer of width * height cells, defaults to a new zeroed bytearray
+        """
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height) if cells is None else cells
+        self._view = memoryview(self.cells)
+
+    def index(self, row: int, column: int) -> int:
+        """
+        It returns the row-major index of the cell at the given row and column
+        """
+        return row * self.width + column
+
+    def to_list(self) -> list[list[int]]:
+        """
+        It returns a copy of the grid as a list of lists of integers
+        """
+        return [list(row) for row in self]
+
+    def __len__(self) -> int:
+        return self.height
+
+    def __getitem__(self, row: int) -> memoryview:
+        if row < 0:
+            row += self.height
+        if not 0 <= row < self.height:
+            raise IndexError("grid row out of range")
+        return self._view[row * self.width:(row + 1) * self.width]
+
+    def __iter__(self):
+        for row in range(self.height):
+            yield self._view[row * self.width:(row + 1) * self.width]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Grid):
+            return (self.width, self.height) == (other.width, other.height) and self.cells == other.cells
+        return self.to_list() == other
+
+    def __repr__(self) -> str:
+        return f"Grid(width={self.width}, height={self.height})"
+
+    def save(self, path: str, packed: bool = False) -> None:
+        """
+        It writes the grid to a binary grid file
+
+        :param path: The file to write
+        :type path: str
+        :param packed: Whether to store one bit per cell instead of one byte
+        :type packed: bool
+        """
+        cell_count = self.width * self.height
+        with open(path, "wb") as grid_file:
+            grid_file.write(GRID_FILE_HEADER.pack(
+                GRID_FILE_MAGIC, self.width, self.height, BITMAP if packed else CELLS))
+            if not packed:
+                grid_file.write(self.cells)
+            elif cell_count:
+                # Read as a binary number the cells pack themselves eight to a byte
+                padding = -cell_count % 8
+                digits = bytes(self.cells).translate(_CELLS_TO_DIGITS) + b"0" * padding
+                grid_file.write(int(digits, 2).to_bytes((cell_count + padding) // 8, "big"))
+
+    @classmethod
+    def load(cls, path: str) -> "Grid":
+        """
+        It opens a binary grid file. Files of one byte per cell are memory mapped copy on
+        write, so opening them takes the same time however large they are, processes
+        loading the same file share its pages, and changes to the grid are not written
+        back to the file.
+
+        :param path: The grid file to open
+        :type path: str
+        :return: The grid stored in the file
+        """
+        with open(path, "rb") as grid_file:
+            header = grid_file.read(GRID_FILE_HEADER.size)
+            if len(header) < GRID_FILE_HEADER.size or not header.startswith(GRID_FILE_MAGIC):
+                raise ValueError(f"{path} is not a grid file")
+            _, width, height, encoding = GRID_FILE_HEADER.unpack(header)
+            cell_count = width * height
+
+            if encoding == CELLS:
+                if grid_file.seek(0, 2) != GRID_FILE_HEADER.size + cell_count:
+                    raise ValueError(f"{path} does not hold the {cell_count} cells of a {width}x{height} grid")
+                if not cell_count:
+                    return cls(width, height)
+                cells_map = mmap.mmap(grid_file.fileno(), 0, access=mmap.ACCESS_COPY)
+                return cls(width, height, memoryview(cells_map)[GRID_FILE_HEADER.size:])
+
+            if encoding == BITMAP:
+                bitmap = grid_file.read()
+                if len(bitmap) != (cell_count + 7) // 8:
+                    raise ValueError(f"{path} does not hold the {cell_count} cells of a {width}x{height} grid")
+                digits = format(int.from_bytes(bitmap, "big"), f"0{len(bitmap) * 8}b").encode()
+                return cls(width, height, bytearray(digits[:cell_count].translate(_DIGITS_TO_CELLS)))
+
+            raise ValueError(f"{path} has an unknown grid encoding {encoding}")
+
+    @classmethod
+    def from_obstacles(cls, width: int, height: int, obstacles: list[tuple]) -> "Grid":
+        """
+        It creates a grid of the given width and height with obstacles at the given points
+
+        :param width: The width of the grid
+        :type width: int
+        :param height: The height of the grid
+        :type height: int
+        :param obstacles: The (row, column) points of the obstacles
+        :type obstacles: list[tuple]
+        :return: The grid
+        """
+        grid = cls(width, height)
+        for row, column in obstacles:
+            grid.cells[row * width + column] = 1
+        return grid
+
+    @classmethod
+    def from_text(cls, text: str) -> "Grid":
+        """
+        It creates a grid from a text map with one line per row and one character per cell,
+        where the characters in FREE_SPACE_CHARACTERS are free spaces and any other is an
+        obstacle. The header of a Moving AI benchmark map, up to its "map" line, is skipped.
+
+        :param text: The text map
+        :type text: str
+        :return: The grid
+        """
+        lines = text.splitlines()
+        if lines and lines[0].startswith("type"):
+            lines = lines[[line.strip() for line in lines].index("map") + 1:]
+        # Only empty lines are skipped, as a row of spaces is a row of free spaces
+        rows = [line for line in lines if line]
+
+        width = len(rows[0]) if rows else 0
+        if any(len(row) != width for row in rows):
+            raise ValueError("The rows of a text map must all be the same length")
+
+        # Characters outside latin-1 become "?", an obstacle
+        cells = "".join(rows).encode("latin-1", errors="replace")
+        return cls(width, len(rows), bytearray(cells.translate(_TEXT_TO_CELLS)))
@@ -0,0 +1,420 @@
+"""
+Hierarchical pathfinding (HPA*) over a PathFinder grid.
+"""
+import sys
+import time
+from collections import deque
+from heapq import heappop, heappush
+
+from pathfinder import ADJACENT_OFFSETS, PathFinder
+
+
+class HierarchicalPathFinder:
+    """
+    HierarchicalPathFinder splits a PathFinder grid into square clusters and searches a
+    small abstract graph of cluster entrances before refining the route space by space.
+
+    Wherever free spaces on either side of a border between two clusters touch, the border
+    holds an entrance. For each pair of free runs of border spaces that touch, one
+    transition links a space in each run, so every way across a border stays reachable.
+    Within a cluster the least steps between its transition spaces are precomputed. A
+    query links the starting and delivery points into the abstract graph, searches it with
+    A*, then fills in each leg with a search confined to a single cluster.
+
+    Paths only move around obstacles and are close to, but not always exactly, the least
+    steps. When obstacles change on the PathFinder grid, only the clusters they fall in are
+    rebuilt, along with the entrance distances of their neighbouring clusters.
+    """
+
+    def __init__(self, pathfinder: PathFinder, cluster_size: int = 16) -> None:
+        """
+        It builds the abstract graph over the pathfinder's grid and listens for obstacle
+        changes
+
+        :param pathfinder: The pathfinder holding the grid
+        :type pathfinder: PathFinder
+        :param cluster_size: The width and height of each cluster in spaces
+        :type cluster_size: int
+        """
+        try:
+            assert cluster_size >= 2
+        except AssertionError:
+            print("Clusters must be at least 2 spaces wide")
+            raise
+
+        self.pathfinder = pathfinder
+        self.cluster_size = cluster_size
+        self.grid = pathfinder.grid
+        self.cluster_rows = -(-self.grid.height // cluster_size)
+        self.cluster_columns = -(-self.grid.width // cluster_size)
+
+        # Transitions per pair of neighbouring clusters, as (space in the first cluster,
+        # space in the second cluster) flat indices
+        self._transitions = {}
+        # Transition spaces of each cluster, mapped to [(other space, steps)] within it
+        self._intra_edges = [{} for _ in range(self.cluster_rows * self.cluster_columns)]
+        # Transition spaces mapped to the set of spaces they cross a border to
+        self._inter_edges = {}
+
+        self.build_stats = {}
+        self.query_stats = {}
+
+        start_time = time.perf_counter()
+        for cluster in range(self.cluster_rows * self.cluster_columns):
+            for neighbour in self._neighbouring_clusters(cluster):
+                if neighbour > cluster:
+                    self._build_transitions(cluster, neighbour)
+        for cluster in range(self.cluster_rows * self.cluster_columns):
+            self._build_intra_edges(cluster)
+        self.build_stats = self._graph_stats(time.perf_counter() - start_time)
+
+        pathfinder.grid_listeners.append(self._obstacles_changed)
+
+    def shortest_path(self, starting_point: tuple, delivery_point: tuple) -> tuple:
+        """
+        The function finds a path from the starting point to the delivery point around
+        obstacles using the abstract graph, and records the time taken in query_stats
+
+        :param starting_point: The point to start from
+        :type starting_point: tuple
+        :param delivery_point: The point to reach
+        :type delivery_point: tuple
+        :return: A tuple of the steps taken, the obstacles eliminated and the path steps, or an
+        empty tuple when the delivery point cannot be reached
+        """
+        try:
+            assert self.pathfinder.grid is self.grid
+        except AssertionError:
+            print("The pathfinder grid was replaced, build a new hierarchy for it")
+            raise
+
+        start_time = time.perf_counter()
+        source = self.grid.index(*starting_point)
+        target = self.grid.index(*delivery_point)
+
+        abstract_path, expanded = self._abstract_search(source, target)
+        search_time = time.perf_counter()
+
+        selected_path = ()
+        if abstract_path is not None:
+            path_spaces = [divmod(source, self.grid.width)]
+            for index, next_index in zip(abstract_path, abstract_path[1:]):
+                if self._cluster_of(index) == self._cluster_of(next_index):
+                    path_spaces.extend(self._cluster_path(index, next_index)[1:])
+                else:
+                    path_spaces.append(divmod(next_index, self.grid.width))
+            selected_path = self.pathfinder._build_path_summary(path_spaces)
+
+        end_time = time.perf_counter()
+        self.query_stats = {
+            "query_time": end_time - start_time,
+            "abstract_search_time": search_time - start_time,
+            "refine_time": end_time - search_time,
+            "abstract_expanded": expanded,
+        }
+        return selected_path
+
+    def compare_with_flat(self, queries: list[tuple]) -> dict:
+        """
+        It runs each (starting point, delivery point) query through the hierarchy and through
+        the flat dijkstra search, and reports the build cost of the hierarchy next to the
+        total query times and how many extra steps the hierarchical paths took
+
+        :param queries: The (starting point, delivery point) pairs to compare on
+        :type queries: list[tuple]
+        :return: A dictionary of build, memory and query measurements
+        """
+        hierarchical_time = 0.0
+        flat_time = 0.0
+        extra_steps = 0
+        for starting_point, delivery_point in queries:
+            selected_path = self.shortest_path(starting_point, delivery_point)
+            hierarchical_time += self.query_stats["query_time"]
+
+            start_time = time.perf_counter()
+            target = self.grid.index(*delivery_point)
+            costs, _ = self.pathfinder._search_tree(
+                self.grid.index(*starting_point), False, target=target)
+            flat_time += time.perf_counter() - start_time
+
+            if selected_path:
+                extra_steps += selected_path[0] - costs[target]
+
+        return {
+            **self.build_stats,
+            "queries": len(queries),
+            "hierarchical_query_time": hierarchical_time,
+            "flat_query_time": flat_time,
+            "extra_steps": extra_steps,
+        }
+
+    def _obstacles_changed(self, changed_points: list[tuple]) -> None:
+        """
+        It rebuilds the transitions of every cluster holding a changed point, then the
+        entrance distances of those clusters and their neighbours
+        """
+        if self.pathfinder.grid is not self.grid:
+            return
+
+        start_time = time.perf_counter()
+        changed_clusters = {
+            self._cluster_of(self.grid.index(*point)) for point in changed_points
+        }
+        refreshed_clusters = set(changed_clusters)
+        for cluster in changed_clusters:
+            for neighbour in self._neighbouring_clusters(cluster):
+                self._build_transitions(min(cluster, neighbour), max(cluster, neighbour))
+                refreshed_clusters.add(neighbour)
+        for cluster in refreshed_clusters:
+            self._build_intra_edges(cluster)
+
+        self.build_stats["last_rebuild_time"] = time.perf_counter() - start_time
+        self.build_stats["last_rebuild_clusters"] = len(refreshed_clusters)
+
+    def _build_transitions(self, cluster: int, neighbour: int) -> None:
+        """
+        It finds the transitions across the border between two neighbouring clusters,
+        replacing any found before
+        """
+        for index, neighbour_index in self._transitions.pop((cluster, neighbour), []):
+            for space, other_space in ((index, neighbour_index), (neighbour_index, index)):
+                self._inter_edges[space].discard(other_space)
+                if not self._inter_edges[space]:
+                    del self._inter_edges[space]
+
+        width = self.grid.width
+        top, left, bottom, right = self._cluster_bounds(cluster)
+        neighbour_top, neighbour_left, neighbour_bottom, neighbour_right = self._cluster_bounds(neighbour)
+
+        # The border spaces of each cluster, in order along the border
+        if top == neighbour_top:
+            rows = range(top, bottom)
+            border = [row * width + right - 1 for row in rows]
+            neighbour_border = [row * width + neighbour_left for row in rows]
+        elif left == neighbour_left:
+            columns = range(left, right)
+            border = [(bottom - 1) * width + column for column in columns]
+            neighbour_border = [neighbour_top * width + column for column in columns]
+        elif neighbour_left > left:
+            border = [(bottom - 1) * width + right - 1]
+            neighbour_border = [neighbour_top * width + neighbour_left]
+        else:
+            border = [(bottom - 1) * width + left]
+            neighbour_border = [neighbour_top * width + neighbour_right - 1]
+
+        runs = self._free_runs(border)
+        neighbour_runs = self._free_runs(neighbour_border)
+
+        crossings = {}
+        for position, index in enumerate(border):
+            if runs[position] < 0:
+                continue
+            for neighbour_position in range(max(position - 1, 0), min(position + 2, len(neighbour_border))):
+                if neighbour_runs[neighbour_position] >= 0:
+                    crossings.setdefault((runs[position], neighbour_runs[neighbour_position]), []).append(
+                        (index, neighbour_border[neighbour_position]))
+
+        transitions = [pairs[len(pairs) // 2] for pairs in crossings.values()]
+        for index, neighbour_index in transitions:
+            self._inter_edges.setdefault(index, set()).add(neighbour_index)
+            self._inter_edges.setdefault(neighbour_index, set()).add(index)
+        if transitions:
+            self._transitions[(cluster, neighbour)] = transitions
+
+    def _free_runs(self, border: list[int]) -> list[int]:
+        """
+        It numbers the runs of consecutive free spaces along a border, -1 for obstacles
+        """
+        cells = self.grid.cells
+        runs = []
+        run = 0
+        for position, index in enumerate(border):
+            if cells[index]:
+                runs.append(-1)
+                continue
+            if position and runs[-1] < 0:
+                run += 1
+            runs.append(run)
+        return runs
+
+    def _build_intra_edges(self, cluster: int) -> None:
+        """
+        It finds the least steps within a cluster between each pair of its transition spaces
+        """
+        transition_spaces = set()
+        for neighbour in self._neighbouring_clusters(cluster):
+            first, second = min(cluster, neighbour), max(cluster, neighbour)
+            for index, neighbour_index in self._transitions.get((first, second), []):
+                transition_spaces.add(index if first == cluster else neighbour_index)
+
+        edges = {}
+        for index in transition_spaces:
+            distances = self._cluster_distances(index)
+            edges[index] = [
+                (other_index, distances[other_index]) for other_index in transition_spaces
+                if other_index != index and other_index in distances
+            ]
+        self._intra_edges[cluster] = edges
+
+    def _abstract_search(self, source: int, target: int) -> tuple:
+        """
+        A* over the abstract graph, with the source and target linked in through searches of
+        their own clusters
+
+        :return: The list of abstract spaces from source to target, or None, and the number of
+        abstract spaces expanded
+        """
+        width = self.grid.width
+        source_cluster = self._cluster_of(source)
+        target_cluster = self._cluster_of(target)
+
+        source_distances = self._cluster_distances(source)
+        source_edges = [
+            (index, source_distances[index]) for index in self._intra_edges[source_cluster]
+            if index in source_distances
+        ]
+        if target in source_distances:
+            source_edges.append((target, source_distances[target]))
+
+        target_distances = self._cluster_distances(target)
+        target_edges = {
+            index: target_distances[index] for index in self._intra_edges[target_cluster]
+            if index in target_distances
+        }
+
+        target_row, target_column = divmod(target, width)
+
+        def heuristic(index):
+            row, column = divmod(index, width)
+            return max(abs(row - target_row), abs(column - target_column))
+
+        costs = {source: 0}
+        parents = {source: None}
+        closed = set()
+        open_set = [(heuristic(source), 0, source)]
+        while open_set:
+            _, cost, index = heappop(open_set)
+            if index in closed:
+                continue
+            closed.add(index)
+            if index == target:
+                abstract_path = []
+                while index is not None:
+                    abstract_path.append(index)
+                    index = parents[index]
+                abstract_path.reverse()
+                return abstract_path, len(closed)
+
+            if index == source:
+                edges = list(source_edges)
+            else:
+                edges = list(self._intra_edges[self._cluster_of(index)].get(index, []))
+            edges.extend((neighbour_index, 1) for neighbour_index in self._inter_edges.get(index, ()))
+            if index in target_edges:
+                edges.append((target, target_edges[index]))
+
+            for next_index, steps in edges:
+                next_cost = cost + steps
+                if next_index not in closed and next_cost < costs.get(next_index, next_cost + 1):
+                    costs[next_index] = next_cost
+                    parents[next_index] = index
+                    heappush(open_set, (next_cost + heuristic(next_index), next_cost, next_index))
+
+        return None, len(closed)
+
+    def _cluster_distances(self, source: int) -> dict:
+        """
+        Breadth first search from a space around obstacles without leaving its cluster
+
+        :return: The least steps to each reachable space of the cluster, by flat index
+        """
+        return self._cluster_search(source)[0]
+
+    def _cluster_path(self, source: int, target: int) -> list[tuple]:
+        """
+        It returns the spaces of a least steps path between two spaces of the same cluster
+        """
+        _, parents = self._cluster_search(source, target)
+        width = self.grid.width
+        path_spaces = []
+        index = target
+        while index is not None:
+            path_spaces.append(divmod(index, width))
+            index = parents[index]
+        path_spaces.reverse()
+        return path_spaces
+
+    def _cluster_search(self, source: int, target: int = None) -> tuple:
+        """
+        Breadth first search confined to the source's cluster, stopping at the target if given
+
+        :return: The steps and the parent of each space reached, as dictionaries by flat index
+        """
+        cells = self.grid.cells
+        width = self.grid.width
+        top, left, bottom, right = self._cluster_bounds(self._cluster_of(source))
+
+        distances = {source: 0}
+        parents = {source: None}
+        frontier = deque([source])
+        while frontier:
+            index = frontier.popleft()
+            if index == target:
+                break
+            row, column = divmod(index, width)
+            for row_offset, col_offset in ADJACENT_OFFSETS:
+                next_row = row + row_offset
+                next_column = column + col_offset
+                if top <= next_row < bottom and left <= next_column < right:
+                    next_index = next_row * width + next_column
+                    if next_index not in distances and not cells[next_index]:
+                        distances[next_index] = distances[index] + 1
+                        parents[next_index] = index
+                        frontier.append(next_index)
+        return distances, parents
+
+    def _cluster_of(self, index: int) -> int:
+        row, column = divmod(index, self.grid.width)
+        return (row // self.cluster_size) * self.cluster_columns + column // self.cluster_size
+
+    def _cluster_bounds(self, cluster: int) -> tuple:
+        """
+        It returns the top, left, bottom and right of a cluster, bottom and right exclusive
+        """
+        cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+        top = cluster_row * self.cluster_size
+        left = cluster_column * self.cluster_size
+        return (top, left,
+                min(top + self.cluster_size, self.grid.height),
+                min(left + self.cluster_size, self.grid.width))
+
+    def _neighbouring_clusters(self, cluster: int) -> list[int]:
+        cluster_row, cluster_column = divmod(cluster, self.cluster_columns)
+        return [
+            (cluster_row + row_offset) * self.cluster_columns + cluster_column + col_offset
+            for row_offset, col_offset in ADJACENT_OFFSETS
+            if 0 <= cluster_row + row_offset < self.cluster_rows and
+            0 <= cluster_column + col_offset < self.cluster_columns
+        ]
+
+    def _graph_stats(self, build_time: float) -> dict:
+        """
+        It measures the size of the abstract graph and the memory it takes up
+        """
+        memory_bytes = sys.getsizeof(self._transitions) + sys.getsizeof(self._inter_edges)
+        memory_bytes += sum(sys.getsizeof(pairs) for pairs in self._transitions.values())
+        memory_bytes += sum(sys.getsizeof(neighbours) for neighbours in self._inter_edges.values())
+        abstract_edges = 0
+        for edges in self._intra_edges:
+            memory_bytes += sys.getsizeof(edges)
+            for other_edges in edges.values():
+                memory_bytes += sys.getsizeof(other_edges)
+                abstract_edges += len(other_edges)
+
+        return {
+            "build_time": build_time,
+            "memory_bytes": memory_bytes,
+            "clusters": len(self._intra_edges),
+            "abstract_nodes": len(self._inter_edges),
+            "abstract_edges": abstract_edges + sum(map(len, self._inter_edges.values())),
+        }
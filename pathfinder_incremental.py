@@ -0,0 +1,245 @@
+"""
+Incremental replanning for the PathFinder class using D* Lite.
+"""
+from array import array
+from heapq import heappop, heappush
+
+from pathfinder import ADJACENT_OFFSETS, UNREACHED, PathFinder
+
+
+class IncrementalPathFinder:
+    """
+    IncrementalPathFinder keeps a D* Lite search over a PathFinder grid between calls, so
+    that the path can be repaired when obstacles change or the vehicle moves.
+
+    The search grows backwards from the delivery point, keeping for every space the cost of
+    reaching the delivery point (g) and a one step lookahead of it (rhs). When obstacles
+    change only the spaces next to them are updated, and only spaces whose cost actually
+    changes are expanded again. Costs are packed the same way as in PathFinder, so the path
+    has the least obstacles eliminated and then the least steps taken.
+
+    Obstacles are changed through the PathFinder's add_obstacles and remove_obstacles, so its
+    grid and obstacle list stay in step with the planner.
+    """
+
+    def __init__(self, pathfinder: PathFinder, allow_obstacle_elimination: bool = False) -> None:
+        """
+        It sets up the search from the pathfinder's delivery point back to its starting point
+
+        :param pathfinder: The pathfinder holding the grid, starting point and delivery point
+        :type pathfinder: PathFinder
+        :param allow_obstacle_elimination: Whether the path may pass through obstacles
+        :type allow_obstacle_elimination: bool
+        """
+        self.pathfinder = pathfinder
+        self.allow_obstacle_elimination = allow_obstacle_elimination
+        self.nodes_expanded = 0
+
+        grid = pathfinder.grid
+        self._width = grid.width
+        self._height = grid.height
+        self._cell_count = grid.width * grid.height
+        self._start = pathfinder._cell_index(pathfinder.starting_point)
+        self._last_start = self._start
+        self._goal = pathfinder._cell_index(pathfinder.delivery_point)
+        self._key_modifier = 0
+
+        self._g = array("q", [UNREACHED]) * self._cell_count
+        self._rhs = array("q", [UNREACHED]) * self._cell_count
+        self._queued_keys = {}
+        self._open_set = []
+
+        self._rhs[self._goal] = 0
+        self._queue(self._goal)
+
+    def plan(self) -> tuple:
+        """
+        It brings the search up to date and returns the current path
+
+        :return: A tuple of the steps taken, the obstacles eliminated and the path steps, or an
+        empty tuple when the delivery point cannot be reached
+        """
+        self.nodes_expanded = 0
+        self._compute_shortest_path()
+        return self._extract_path()
+
+    def update_obstacles(self, added: list[tuple] = (), removed: list[tuple] = ()) -> tuple:
+        """
+        It adds and removes obstacles on the pathfinder's grid, repairs the search around
+        them and returns the new path
+
+        :param added: The points to place obstacles at
+        :type added: list[tuple]
+        :param removed: The points to clear obstacles from
+        :type removed: list[tuple]
+        :return: A tuple of the steps taken, the obstacles eliminated and the path steps
+        """
+        pathfinder = self.pathfinder
+        cells = pathfinder.grid.cells
+
+        added = [point for point in added if cells[pathfinder._cell_index(point)] == 0]
+        removed = [point for point in removed if cells[pathfinder._cell_index(point)] == 1]
+        if added:
+            pathfinder.add_obstacles(added)
+        if removed:
+            pathfinder.remove_obstacles(removed)
+
+        changed = [
+            pathfinder._cell_index(point) for point in added
+            if cells[pathfinder._cell_index(point)] == 1
+        ] + [
+            pathfinder._cell_index(point) for point in removed
+            if cells[pathfinder._cell_index(point)] == 0
+        ]
+
+        # The moves onto a changed space changed cost, so the spaces next to it need their
+        # lookahead recomputed
+        for index in changed:
+            for neighbour in self._neighbours(index):
+                self._update_vertex(neighbour)
+
+        return self.plan()
+
+    def move_start(self, new_position: tuple) -> tuple:
+        """
+        It moves the starting point, for example as the vehicle drives along the path, and
+        returns the path from the new position
+
+        :param new_position: The new starting point
+        :type new_position: tuple
+        :return: A tuple of the steps taken, the obstacles eliminated and the path steps
+        """
+        self.pathfinder.set_starting_point(new_position)
+        self._start = self.pathfinder._cell_index(self.pathfinder.starting_point)
+
+        # Queued keys were computed with the heuristic from the old starting point, which
+        # can overestimate by at most the steps moved, so every later key is raised by that
+        self._key_modifier += self._heuristic(self._last_start)
+        self._last_start = self._start
+        return self.plan()
+
+    def _compute_shortest_path(self) -> None:
+        """
+        It expands spaces in key order until the starting point's cost is settled
+        """
+        g = self._g
+        rhs = self._rhs
+        start = self._start
+        while self._open_set:
+            top_key = self._top_key()
+            if top_key is None:
+                break
+            if top_key >= self._key(start) and rhs[start] == g[start]:
+                break
+
+            _, _, index = heappop(self._open_set)
+            del self._queued_keys[index]
+            self.nodes_expanded += 1
+
+            new_key = self._key(index)
+            if top_key < new_key:
+                self._queue(index)
+            elif g[index] > rhs[index]:
+                g[index] = rhs[index]
+                for neighbour in self._neighbours(index):
+                    self._update_vertex(neighbour)
+            else:
+                g[index] = UNREACHED
+                self._update_vertex(index)
+                for neighbour in self._neighbours(index):
+                    self._update_vertex(neighbour)
+
+    def _update_vertex(self, index: int) -> None:
+        """
+        It recomputes the lookahead cost of a space and queues it when it is inconsistent
+        """
+        if index != self._goal:
+            least_cost = UNREACHED
+            g = self._g
+            for neighbour in self._neighbours(index):
+                if g[neighbour] == UNREACHED:
+                    continue
+                move_cost = self._move_cost(neighbour)
+                if move_cost is not None and g[neighbour] + move_cost < least_cost:
+                    least_cost = g[neighbour] + move_cost
+            self._rhs[index] = least_cost
+
+        self._queued_keys.pop(index, None)
+        if self._g[index] != self._rhs[index]:
+            self._queue(index)
+
+    def _extract_path(self) -> tuple:
+        """
+        It follows the cheapest moves from the starting point to the delivery point
+        """
+        g = self._g
+        index = self._start
+        if g[index] == UNREACHED and index != self._goal:
+            return ()
+
+        path_spaces = [divmod(index, self._width)]
+        while index != self._goal and len(path_spaces) <= self._cell_count:
+            best_cost, best_neighbour = UNREACHED, None
+            for neighbour in self._neighbours(index):
+                move_cost = self._move_cost(neighbour)
+                if move_cost is None or g[neighbour] == UNREACHED:
+                    continue
+                if g[neighbour] + move_cost < best_cost:
+                    best_cost, best_neighbour = g[neighbour] + move_cost, neighbour
+            if best_neighbour is None:
+                return ()
+            index = best_neighbour
+            path_spaces.append(divmod(index, self._width))
+
+        return self.pathfinder._build_path_summary(path_spaces)
+
+    def _move_cost(self, index: int) -> int:
+        """
+        It returns the packed cost of moving onto a space, or None when it cannot be entered
+        """
+        if self.pathfinder.grid.cells[index]:
+            if not self.allow_obstacle_elimination:
+                return None
+            return self._cell_count + 1
+        return 1
+
+    def _neighbours(self, index: int):
+        """
+        It yields the flat indices of the spaces adjacent to a space
+        """
+        row, column = divmod(index, self._width)
+        for row_offset, col_offset in ADJACENT_OFFSETS:
+            next_row = row + row_offset
+            next_column = column + col_offset
+            if 0 <= next_row < self._height and 0 <= next_column < self._width:
+                yield next_row * self._width + next_column
+
+    def _heuristic(self, index: int) -> int:
+        """
+        It returns the least steps between the starting point and a space
+        """
+        row, column = divmod(index, self._width)
+        start_row, start_column = divmod(self._start, self._width)
+        return max(abs(row - start_row), abs(column - start_column))
+
+    def _key(self, index: int) -> tuple:
+        cost = min(self._g[index], self._rhs[index])
+        return (cost + self._heuristic(index) + self._key_modifier, cost)
+
+    def _queue(self, index: int) -> None:
+        key = self._key(index)
+        self._queued_keys[index] = key
+        heappush(self._open_set, (key[0], key[1], index))
+
+    def _top_key(self) -> tuple:
+        """
+        It drops queue entries that were since removed or requeued and returns the key of
+        the first live entry, or None when the queue is empty
+        """
+        open_set = self._open_set
+        while open_set:
+            first_key, second_key, index = open_set[0]
+            if self._queued_keys.get(index) == (first_key, second_key):
+                return (first_key, second_key)
+            heappop(open_set)
+        return None
@@ -0,0 +1,329 @@
+"""
+Long-lived query service answering routes on grids kept in memory.
+
+Clients connect over a Unix or TCP socket and send one JSON object per line. Each request
+may carry an "id", which is copied to its response, and an "op":
+
+    {"id": 1, "op": "route", "grid": "default", "start": [0, 0], "end": [9, 9],
+     "obstacles_unremovable": false, "engine": "dijkstra"}
+    {"id": 2, "op": "update", "grid": "default", "add": [[1, 1]], "remove": [[2, 2]]}
+    {"id": 3, "op": "grids"}
+    {"id": 4, "op": "metrics"}
+
+Route responses hold the same fields as batch results. Every response holds the request's
+"latency" in seconds, from the line being read to the response being written, or an
+"error". Requests on one connection are answered as they finish, not in order.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pathfinder import PathFinder
+from pathfinder_batch import path_result
+
+# Obstacle updates kept for workers to replay before the grid is saved again
+COMPACT_AFTER = 256
+
+# Latencies kept per operation for the metrics
+LATENCY_WINDOW = 1000
+
+# The grids workers have loaded, by name, as (grid file, updates replayed, pathfinder)
+_worker_grids = {}
+
+
+def apply_update(pathfinder: PathFinder, added: list[tuple], removed: list[tuple]) -> bool:
+    """
+    It removes and then adds obstacles, changing nothing unless both succeed. Routes set
+    their own starting and delivery points, so the pathfinder's are cleared first rather
+    than keeping obstacles off them.
+
+    :param pathfinder: The pathfinder holding the grid
+    :type pathfinder: PathFinder
+    :param added: The obstacles to add
+    :type added: list[tuple]
+    :param removed: The obstacles to remove
+    :type removed: list[tuple]
+    :return: Whether the obstacles were changed
+    """
+    pathfinder.starting_point = pathfinder.delivery_point = None
+    before = len(pathfinder.obstacles)
+    pathfinder.remove_obstacles(removed)
+    if len(pathfinder.obstacles) != before - len(removed):
+        return False
+    pathfinder.add_obstacles(added)
+    if len(pathfinder.obstacles) != before - len(removed) + len(added):
+        pathfinder.add_obstacles(removed)
+        return False
+    return True
+
+
+def solve_route(name: str, grid_path: str, updates: list[tuple], request: dict) -> dict:
+    """
+    It finds a route on a named grid in a worker. The worker keeps each grid loaded between
+    requests and only replays the obstacle updates it has not seen yet, loading the grid
+    file again when it has been replaced.
+
+    :param name: The name of the grid
+    :type name: str
+    :param grid_path: The grid file the updates apply to
+    :type grid_path: str
+    :param updates: The (added, removed) obstacle updates since the grid file was saved
+    :type updates: list[tuple]
+    :param request: The route request
+    :type request: dict
+    :return: A dictionary with the path, steps taken, obstacles to remove and solve time
+    """
+    loaded_path, replayed, pathfinder = _worker_grids.get(name, (None, 0, None))
+    if loaded_path != grid_path:
+        pathfinder = PathFinder(verbose=False)
+        pathfinder.load_grid(grid_path)
+        replayed = 0
+    for added, removed in updates[replayed:]:
+        apply_update(pathfinder, added, removed)
+    _worker_grids[name] = (grid_path, len(updates), pathfinder)
+
+    start_time = time.perf_counter()
+    start = tuple(request["start"])
+    end = tuple(request["end"])
+    # The points are cleared first, as a point outside the grid would leave the last route's
+    pathfinder.starting_point = pathfinder.delivery_point = None
+    pathfinder.set_starting_point(start)
+    pathfinder.set_delivery_point(end)
+    if pathfinder.starting_point != start or pathfinder.delivery_point != end:
+        raise ValueError(f"The start {list(start)} and end {list(end)} must be within the "
+                         f"{pathfinder.grid.height}x{pathfinder.grid.width} grid")
+    selected_path = pathfinder.shortest_path(
+        allow_obstacle_elimination=not request.get("obstacles_unremovable", False),
+        engine=request.get("engine", "dijkstra")
+    )
+    result = path_result(selected_path)
+    result["solve_time"] = time.perf_counter() - start_time
+    return result
+
+
+class PathFinderService:
+    """
+    PathFinderService keeps named grids in memory and answers requests for them over a
+    socket with asyncio, handing each route search to a pool of worker processes.
+
+    Each grid is held as a grid file plus the obstacle updates made since it was saved.
+    Workers memory map the file and replay the updates, so every route sees the grid as it
+    was when the route arrived while later updates wait their turn. Updates to a grid are
+    applied one at a time under its lock, and after COMPACT_AFTER of them the grid is saved
+    to a new file and the updates dropped.
+    """
+
+    def __init__(self, pathfinders: dict, workers: int = None) -> None:
+        """
+        It saves each grid to a file for the workers to load
+
+        :param pathfinders: The pathfinders holding the grids, by name
+        :type pathfinders: dict
+        :param workers: The number of worker processes, defaults to the number of CPUs.
+        With 1 routes are found on a single thread of this process
+        :type workers: int
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.pathfinders = pathfinders
+        self._directory = tempfile.mkdtemp(prefix="pathfinder_service_")
+        self._grid_files = {}
+        # Grid files saved so far, numbering each new one
+        self._saved_files = 0
+        self._updates = {}
+        self._versions = {}
+        self._locks = {}
+        for name in pathfinders:
+            self._save_grid(name)
+            self._versions[name] = 0
+
+        self._executor = None
+        self._server = None
+        self.metrics = {}
+
+    async def start(self, socket_path: str = None, host: str = "127.0.0.1", port: int = 0):
+        """
+        It starts the worker pool and listens on a Unix socket if a path is given, or else on
+        a TCP port
+
+        :param socket_path: The Unix socket to listen on
+        :type socket_path: str
+        :param host: The host to listen on over TCP
+        :type host: str
+        :param port: The TCP port to listen on, 0 for any free port
+        :type port: int
+        :return: The asyncio server
+        """
+        if self.workers == 1:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._locks = {name: asyncio.Lock() for name in self.pathfinders}
+
+        if socket_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self, socket_path: str = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        """
+        It starts the service and answers requests until it is cancelled
+        """
+        server = await self.start(socket_path, host, port)
+        for listening_socket in server.sockets:
+            print(f"Serving on {listening_socket.getsockname()}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """
+        It stops listening, shuts the worker pool down and deletes the saved grid files
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    async def handle_request(self, request: dict) -> dict:
+        """
+        It answers one request
+
+        :param request: The request, with its "op" and settings
+        :type request: dict
+        :return: The response, without the id and latency
+        """
+        operation = request.get("op", "route")
+        if operation == "route":
+            name = request.get("grid", "default")
+            self._check_grid(name)
+            # Routes are solved on the grid as it is now, even if an update comes in meanwhile
+            version = self._versions[name]
+            arguments = (name, self._grid_files[name], list(self._updates[name]), request)
+            response = await asyncio.get_running_loop().run_in_executor(self._executor, solve_route, *arguments)
+            response["version"] = version
+            return response
+        if operation == "update":
+            return await self._update(request)
+        if operation == "grids":
+            return {"grids": {
+                name: {"width": pathfinder.grid.width, "height": pathfinder.grid.height,
+                       "obstacles": len(pathfinder.obstacles), "version": self._versions[name]}
+                for name, pathfinder in self.pathfinders.items()
+            }}
+        if operation == "metrics":
+            return {"metrics": self.latency_metrics()}
+        raise ValueError(f"Unknown op {operation}, choose one of: route, update, grids, metrics")
+
+    def latency_metrics(self) -> dict:
+        """
+        It summarises the latency of the recent requests of each operation
+
+        :return: For each operation, the number of requests and errors, and the mean,
+        median, 95th percentile and slowest latency of the last LATENCY_WINDOW requests
+        """
+        summary = {}
+        for operation, (count, errors, latencies) in self.metrics.items():
+            ordered = sorted(latencies)
+            summary[operation] = {
+                "count": count,
+                "errors": errors,
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+            }
+        return summary
+
+    async def _handle_connection(self, reader, writer) -> None:
+        """
+        It reads request lines from a connection and answers each one as a separate task
+        """
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def _answer(self, line: bytes, writer) -> None:
+        """
+        It answers one request line and records its latency
+        """
+        start_time = time.perf_counter()
+        response = {}
+        operation = "invalid"
+        try:
+            request = json.loads(line)
+            operation = str(request.get("op", "route"))
+            if "id" in request:
+                response["id"] = request["id"]
+            response.update(await self.handle_request(request))
+        except Exception as error:
+            response["error"] = f"{type(error).__name__}: {error}"
+
+        latency = time.perf_counter() - start_time
+        response["latency"] = latency
+        operation_metrics = self.metrics.setdefault(operation, [0, 0, deque(maxlen=LATENCY_WINDOW)])
+        operation_metrics[0] += 1
+        operation_metrics[1] += "error" in response
+        operation_metrics[2].append(latency)
+
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    async def _update(self, request: dict) -> dict:
+        """
+        It adds and removes obstacles on a grid under its lock, saving the grid to a new
+        file once enough updates have built up
+        """
+        name = request.get("grid", "default")
+        self._check_grid(name)
+        added = [tuple(obstacle) for obstacle in request.get("add", [])]
+        removed = [tuple(obstacle) for obstacle in request.get("remove", [])]
+
+        async with self._locks[name]:
+            pathfinder = self.pathfinders[name]
+            if not apply_update(pathfinder, added, removed):
+                raise ValueError("Obstacles not changed, each removed one must be a different obstacle "
+                                 "and each added one a different free space within the grid")
+
+            self._versions[name] += 1
+            self._updates[name].append((added, removed))
+            if len(self._updates[name]) >= COMPACT_AFTER:
+                self._save_grid(name)
+            return {"version": self._versions[name], "obstacles": len(pathfinder.obstacles)}
+
+    def _save_grid(self, name: str) -> None:
+        """
+        It saves a grid to a new file in the service's directory and drops its updates.
+        Older files are kept, as routes in flight may still be loading them.
+        """
+        grid_path = os.path.join(self._directory, f"{self._saved_files}.grid")
+        self._saved_files += 1
+        self.pathfinders[name].save_grid(grid_path)
+        self._grid_files[name] = grid_path
+        self._updates[name] = []
+
+    def _check_grid(self, name: str) -> None:
+        """
+        It raises KeyError for grids the service does not hold
+        """
+        if name not in self.pathfinders:
+            raise KeyError(f"No grid named {name}, choose one of: {', '.join(self.pathfinders)}")
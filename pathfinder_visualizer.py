@@ -1,25 +1,56 @@
 """
 Visualizer for the PathFinder class using pygame.
 """
+import os
 import sys
+import time
+
+# Keep pygame's import banner out of standard output, which may carry batch results
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 import pygame
-from tkinter import messagebox, Tk
 
 window_size = (window_width, window_height) = 640, 480
 
 
 # This class is a visualizer for the PathFinder class
 class PathFinderVisualizer:
-    """Visualizer for the PathFinder class"""
+    """
+    Visualizer for the PathFinder class
+
+    Drawing goes to the window's surface straight away, but the screen is only updated for
+    the areas drawn since the last update, and at most max_fps times a second. Headless
+    visualizers draw offscreen with SDL's dummy video driver, and with record_dir set every
+    frame shown is also saved there as a numbered PNG image.
+    """
 
-    def __init__(self):
+    def __init__(self, headless=False, record_dir=None, max_fps=60):
         """
         It initializes the pygame window and sets the window size, caption, and clock
+
+        :param headless: Whether to draw offscreen instead of opening a window
+        :param record_dir: A directory to save every frame shown to, defaults to None
+        :param max_fps: The most times a second the screen is updated
         """
         self.grid_width = 0
         self.grid_height = 0
         self.box_width = 0
         self.box_height = 0
+        self.headless = headless
+        self.record_dir = record_dir
+        self.max_fps = max_fps
+        self.frames_recorded = 0
+
+        self._dirty_rects = []
+        self._last_update = 0.0
+        self._cell_x = []
+        self._cell_y = []
+        self._labels = {}
+        self._drawn_segments = set()
+
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
 
         self.visualizer = pygame
         self.visualizer.init()
@@ -41,9 +72,20 @@ class PathFinderVisualizer:
         self.box_width = window_width // self.grid_width
         self.box_height = window_height // self.grid_height
 
+        # The position of every box and the text labels only depend on the box size
+        self._cell_x = [row * self.box_width for row in range(max(grid_width, grid_height))]
+        self._cell_y = [column * self.box_height for column in range(max(grid_width, grid_height))]
+        font = self.visualizer.font.SysFont(
+            self.visualizer.font.get_default_font(), int(0.2*self.box_width))
+        self._labels = {
+            text: font.render(text, True, (0, 0, 0)) for text in ('START', 'END')
+        }
+        self._drawn_segments = set()
+
         for row in range(self.grid_height):
             for column in range(self.grid_width):
                 self.show(row, column, (44, 62, 80))
+        self.flush(force=True)
 
     def show(self, row, column, colour, border=0):
         """
@@ -53,16 +95,16 @@ class PathFinderVisualizer:
         :param column: The column of the grid to show
         :param colour: The colour of the box
         """
-        self.visualizer.draw.rect(
+        self._dirty_rects.append(self.visualizer.draw.rect(
             self.window,
             colour,
-            (row * self.box_width,
-             column * self.box_height,
+            (self._cell_x[row],
+             self._cell_y[column],
              self.box_width - 1,
              self.box_height - 1),
             border
-        )
-        self.visualizer.display.update()
+        ))
+        self.flush()
 
     def show_start_point(self, row, column):
         """
@@ -73,14 +115,8 @@ class PathFinderVisualizer:
         """
 
         self.show(row, column, (0, 255, 200), int(0.05*self.box_width))
-
-        font = self.visualizer.font.SysFont(
-            self.visualizer.font.get_default_font(), int(0.2*self.box_width))
-        self.window.blit(
-            font.render('START', True, (0, 0, 0)), (
-                (row*self.box_width+(2*row+self.box_width)//2 - self.box_width//5), (column*self.box_height+(2*column+self.box_height)//2 - self.box_height//10))
-        )
-        self.visualizer.display.update()
+        self._show_label('START', row, column)
+        self.flush(force=True)
 
     def show_end_point(self, row, column):
         """
@@ -91,14 +127,8 @@ class PathFinderVisualizer:
         """
 
         self.show(row, column, (0, 120, 255), int(0.05*self.box_width))
-
-        font = self.visualizer.font.SysFont(
-            self.visualizer.font.get_default_font(), int(0.2*self.box_width))
-        self.window.blit(
-            font.render('END', True, (0, 0, 0)), (
-                (row*self.box_width+(2*row+self.box_width)//2 - self.box_width//5), (column*self.box_height+(2*column+self.box_height)//2 - self.box_height//10))
-        )
-        self.visualizer.display.update()
+        self._show_label('END', row, column)
+        self.flush(force=True)
 
     def show_obstacle_point(self, row, column):
         """
@@ -114,54 +144,69 @@ class PathFinderVisualizer:
         It takes a path and a boolean value, and if the boolean value is true, it will show the path in
         green for the final selected path, otherwise it will show the path in blue for detected paths
 
-        :param path: The path to show
+        :param path: The path steps, or (row, column) spaces, to show
         :param selected_path: If True, the path will be shown in green. If False, the path will be shown
         in blue, defaults to False (optional)
         """
         colour = (0, 255, 0) if selected_path else (0, 0, 255)
+        drawn = selected_path
+        previous = None
         for step in path:
+            space = (step[0], step[1])
             if selected_path:
-                self.show(step.row, step.column, colour)
-            else:
-                if path.index(step) > 0:
-                    current = step
-                    previous = path[path.index(step) - 1]
-                    self.visualizer.draw.aaline(
-                        self.window,
-                        colour,
-                        (current.row * self.box_width + (2*current.row+self.box_width)//2,
-                         current.column * self.box_height + (2*current.column+self.box_height)//2),
-                        (previous.row * self.box_width + (2*previous.row+self.box_width)//2,
-                         previous.column * self.box_height + (2*previous.column+self.box_height)//2),
-                        blend=1
-                    )
-                    self.visualizer.display.update()
-
-            if path.index(step) == 0:
-                font = self.visualizer.font.SysFont(
-                    self.visualizer.font.get_default_font(), int(0.2*self.box_width)
-                )
-                self.window.blit(
-                    font.render('START', True, (0, 0, 0)), (
-                        (step.row*self.box_width+(2*step.row+self.box_width)//2 - self.box_width//5), (step.column*self.box_height+(2*step.column+self.box_height)//2 - self.box_height//10))
-                )
-            if path.index(step) == len(path)-1:
-                font = self.visualizer.font.SysFont(
-                    self.visualizer.font.get_default_font(), int(0.2*self.box_width)
-                )
-                self.window.blit(
-                    font.render('END', True, (0, 0, 0)), (
-                        (step.row*self.box_width+(2*step.row+self.box_width)//2 - self.box_width//5), (step.column*self.box_height+(2*step.column+self.box_height)//2 - self.box_height//10))
-                )
-            self.visualizer.display.update()
+                self.show(space[0], space[1], colour)
+            elif previous is not None and (previous, space) not in self._drawn_segments:
+                # Detected paths share most of their segments, and drawing one again would
+                # not change the screen
+                self._drawn_segments.add((previous, space))
+                self._drawn_segments.add((space, previous))
+                self._dirty_rects.append(self.visualizer.draw.aaline(
+                    self.window,
+                    colour,
+                    self._cell_centre(*space),
+                    self._cell_centre(*previous),
+                    blend=1
+                ))
+                drawn = True
+            previous = space
+
+        if path and drawn:
+            self._show_label('START', path[0][0], path[0][1])
+            self._show_label('END', path[-1][0], path[-1][1])
+        self.flush(force=selected_path)
+
+    def flush(self, force=False):
+        """
+        It updates the screen where it was drawn on since the last update, unless the last
+        update was less than a frame ago
+
+        :param force: Whether to update the screen however recently it was last updated
+        """
+        if not self._dirty_rects:
+            return
+        if not force and time.perf_counter() - self._last_update < 1 / self.max_fps:
+            return
+
+        self.visualizer.display.update(self._dirty_rects)
+        self._dirty_rects = []
+
+        if self.record_dir:
+            self.visualizer.image.save(
+                self.window, os.path.join(self.record_dir, f"frame_{self.frames_recorded:06d}.png"))
+            self.frames_recorded += 1
+        # The next frame is due a frame after this one finished, so slow frames are not
+        # followed straight away by another
+        self._last_update = time.perf_counter()
 
     def check_exit_clicked(self):
         """
         It checks if the user has clicked the exit button on the window
         """
+        self.flush(force=True)
         for event in self.visualizer.event.get():
             if event.type == self.visualizer.QUIT:
                 self.exit()
+        self.clock.tick(self.max_fps)
 
     def exit(self):
         """
@@ -169,5 +214,22 @@ class PathFinderVisualizer:
         quit() function on the visualizer object, which is an instance of the class Visualizer, and then
         exits the program
         """
+        self.flush(force=True)
         self.visualizer.quit()
         sys.exit()
+
+    def _show_label(self, text, row, column):
+        """
+        It draws the START or END label over a box
+        """
+        self._dirty_rects.append(self.window.blit(
+            self._labels[text], (
+                (self._cell_x[row]+(2*row+self.box_width)//2 - self.box_width//5), (self._cell_y[column]+(2*column+self.box_height)//2 - self.box_height//10))
+        ))
+
+    def _cell_centre(self, row, column):
+        """
+        It returns the screen position that paths are drawn through in a box
+        """
+        return (self._cell_x[row] + (2*row+self.box_width)//2,
+                self._cell_y[column] + (2*column+self.box_height)//2)
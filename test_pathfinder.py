@@ -1,3 +1,6 @@
+import itertools
+import random
+
 from pathfinder import PathFinder
 
 
@@ -97,6 +100,553 @@ def test_phase_bonus():
     amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)
 
 
+def test_dijkstra_matches_exhaustive():
+    """
+    It creates the 3x3 grid from the README with the start walled in and checks that
+    the dijkstra engine picks a path with the same obstacles and steps as the
+    exhaustive engine, with and without obstacle elimination
+    """
+    for allow_obstacle_elimination in (True, False):
+        results = []
+        for engine in ("exhaustive", "dijkstra"):
+            amazon_pathfinder = PathFinder([])
+            amazon_pathfinder.create_grid(3, 3)
+            amazon_pathfinder.set_starting_point((0, 0))
+            amazon_pathfinder.set_delivery_point((2, 2))
+            amazon_pathfinder.add_obstacles([(0, 1), (1, 0), (1, 1)])
+            selected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination, engine=engine)
+            results.append(selected_path[:2])
+
+        assert results[0] == results[1]
+    assert results[0] == ()
+
+
+def test_dijkstra_large_grid():
+    """
+    It creates a 60x60 grid split by a wall with a single gap far from the straight line
+    and checks that the dijkstra engine walks round through the gap, and that once the
+    gap is closed it knocks a single obstacle out of the wall when elimination is allowed
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(60, 60)
+    amazon_pathfinder.set_starting_point((0, 0))
+    amazon_pathfinder.set_delivery_point((59, 0))
+    amazon_pathfinder.add_obstacles([(30, column) for column in range(59)])
+
+    selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)
+    assert selected_path[:2] == (118, 0)
+    assert (selected_path[2][0].row, selected_path[2][0].column) == (0, 0)
+    assert (selected_path[2][-1].row, selected_path[2][-1].column) == (59, 0)
+
+    selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)
+    assert selected_path[:2] == (118, 0)
+
+    amazon_pathfinder.add_obstacles([(30, 59)])
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=False) == ()
+
+    selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)
+    assert selected_path[:2] == (59, 1)
+    assert len(selected_path[2][-1].obstacles_eliminated) == 1
+
+
+def test_astar_matches_dijkstra():
+    """
+    It creates seeded 30x30 grids with random obstacles and checks that the astar engine
+    finds paths with the same obstacles and steps as the dijkstra engine
+    """
+    for seed in range(10):
+        random.seed(seed)
+        amazon_pathfinder = PathFinder([])
+        amazon_pathfinder.create_grid(30, 30)
+        amazon_pathfinder.set_starting_point((0, 0))
+        amazon_pathfinder.set_delivery_point((29, 17))
+        amazon_pathfinder.add_random_obstacles(300)
+
+        for allow_obstacle_elimination in (True, False):
+            expected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination)
+            selected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination, engine="astar")
+            assert selected_path[:2] == expected_path[:2]
+
+
+def test_shortest_paths_from_many_starts():
+    """
+    It creates a seeded 25x25 grid with random obstacles and checks that the paths found
+    from many starting points by one search back from the delivery point match separate
+    shortest_path calls from each starting point
+    """
+    random.seed(4)
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(25, 25)
+    amazon_pathfinder.set_starting_point((0, 0))
+    amazon_pathfinder.set_delivery_point((12, 20))
+    amazon_pathfinder.add_random_obstacles(200)
+    starts = [(row, column) for row in range(0, 25, 6) for column in range(0, 25, 6)
+              if amazon_pathfinder.grid[row][column] == 0]
+
+    for allow_obstacle_elimination in (True, False):
+        paths = list(amazon_pathfinder.shortest_paths(
+            starts, (12, 20), allow_obstacle_elimination=allow_obstacle_elimination))
+        assert len(paths) == len(starts)
+
+        for start, selected_path in zip(starts, paths):
+            amazon_pathfinder.set_starting_point(start)
+            expected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination)
+            assert selected_path[:2] == expected_path[:2]
+            if selected_path:
+                assert (selected_path[2][0].row, selected_path[2][0].column) == start
+                assert (selected_path[2][-1].row, selected_path[2][-1].column) == (12, 20)
+
+
+def test_landmarks():
+    """
+    It creates a seeded 30x30 grid with random obstacles, builds landmarks at two corners
+    and checks the landmark distances and the landmark-guided astar engine against the
+    dijkstra engine, and that adding obstacles marks the landmarks stale
+    """
+    random.seed(7)
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(30, 30)
+    amazon_pathfinder.set_starting_point((0, 0))
+    amazon_pathfinder.set_delivery_point((29, 29))
+    amazon_pathfinder.add_random_obstacles(250)
+    amazon_pathfinder.build_landmarks([(0, 0), (29, 29)])
+
+    for delivery_point in [(29, 29), (15, 3), (2, 27)]:
+        if amazon_pathfinder.grid[delivery_point[0]][delivery_point[1]] == 1:
+            continue
+        amazon_pathfinder.set_delivery_point(delivery_point)
+        expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)
+        selected_path = amazon_pathfinder.shortest_path(
+            allow_obstacle_elimination=False, engine="astar")
+        assert selected_path[:2] == expected_path[:2]
+
+        steps = amazon_pathfinder.landmark_distance((0, 0), delivery_point)
+        assert steps == (expected_path[0] if expected_path else None)
+
+    free_point = next((row, 10) for row in range(1, 29) if amazon_pathfinder.grid[row][10] == 0)
+    amazon_pathfinder.add_obstacles([free_point])
+    assert amazon_pathfinder.landmarks_stale
+    try:
+        amazon_pathfinder.landmark_distance((0, 0), (29, 29))
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("Stale landmarks should not give distances")
+
+    amazon_pathfinder.build_landmarks()
+    assert not amazon_pathfinder.landmarks_stale
+
+
+def test_jps_matches_dijkstra():
+    """
+    It creates seeded grids of varying size and obstacle density and checks that the jps
+    engine finds paths with the same steps as the dijkstra engine, filled in space by space
+    with single moves between free spaces
+    """
+    for seed in range(40):
+        random.seed(seed)
+        size = 10 + seed
+        amazon_pathfinder = PathFinder([])
+        amazon_pathfinder.create_grid(size, size)
+        amazon_pathfinder.set_starting_point((0, 0))
+        amazon_pathfinder.set_delivery_point((size - 1, size // 2))
+        amazon_pathfinder.add_random_obstacles(size * size * (seed % 4) // 10)
+
+        expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)
+        selected_path = amazon_pathfinder.shortest_path(
+            allow_obstacle_elimination=False, engine="jps")
+        assert selected_path[:2] == expected_path[:2]
+
+        if selected_path:
+            spaces = [(path_step.row, path_step.column) for path_step in selected_path[2]]
+            assert spaces[0] == (0, 0)
+            assert spaces[-1] == (size - 1, size // 2)
+            for (row, column), (next_row, next_column) in zip(spaces, spaces[1:]):
+                assert max(abs(next_row - row), abs(next_column - column)) == 1
+                assert amazon_pathfinder.grid[next_row][next_column] == 0
+
+    try:
+        amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, engine="jps")
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("The jps engine should refuse to eliminate obstacles")
+
+
+def test_bidirectional_matches_dijkstra():
+    """
+    It creates seeded 40x40 grids with random obstacles and checks that the bidirectional
+    engine finds paths with the same obstacles and steps as the dijkstra engine, and reports
+    where the two searches met and how much each side expanded
+    """
+    for seed in range(10):
+        random.seed(seed)
+        amazon_pathfinder = PathFinder([])
+        amazon_pathfinder.create_grid(40, 40)
+        amazon_pathfinder.set_starting_point((0, 0))
+        amazon_pathfinder.set_delivery_point((39, 33))
+        amazon_pathfinder.add_random_obstacles(400 + 40 * seed)
+
+        for allow_obstacle_elimination in (True, False):
+            expected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination)
+            selected_path = amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination, engine="bidirectional")
+            assert selected_path[:2] == expected_path[:2]
+
+            if selected_path:
+                search_stats = amazon_pathfinder.search_stats
+                assert search_stats["forward_expanded"] > 0
+                assert search_stats["backward_expanded"] > 0
+                spaces = [(path_step.row, path_step.column) for path_step in selected_path[2]]
+                assert search_stats["meeting_point"] in spaces
+
+
+def test_connected_components():
+    """
+    It creates a 20x20 grid split by a wall and checks that points on either side are in
+    different components, so shortest_path reports no path without searching, until an
+    obstacle is removed from the wall and the components join again
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(20, 20)
+    amazon_pathfinder.set_starting_point((0, 0))
+    amazon_pathfinder.set_delivery_point((19, 19))
+    assert amazon_pathfinder.is_reachable((0, 0), (19, 19))
+
+    amazon_pathfinder.add_obstacles([(10, column) for column in range(20)])
+    assert not amazon_pathfinder.is_reachable((0, 0), (19, 19))
+    assert amazon_pathfinder.component_of((10, 3)) is None
+    assert amazon_pathfinder.component_of((0, 0)) == amazon_pathfinder.component_of((9, 19))
+    assert amazon_pathfinder.component_of((0, 0)) != amazon_pathfinder.component_of((11, 0))
+
+    amazon_pathfinder.search_stats = {"stale": True}
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=False) == ()
+    assert "stale" not in amazon_pathfinder.search_stats
+    assert amazon_pathfinder.search_stats["nodes_expanded"] == 0
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)[:2] == (19, 1)
+
+    amazon_pathfinder.remove_obstacles([(10, 7)])
+    assert amazon_pathfinder.is_reachable((0, 0), (19, 19))
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)[:2] == (22, 0)
+
+    amazon_pathfinder.add_obstacles([(10, 7)])
+    assert not amazon_pathfinder.is_reachable((0, 0), (19, 19))
+
+    # Negative coordinates would otherwise wrap round to the far side of the grid
+    amazon_pathfinder.remove_obstacles([(-10, 0)])
+    assert amazon_pathfinder.grid[10][0] == 1 and (10, 0) in amazon_pathfinder.obstacles
+    assert not amazon_pathfinder.is_reachable((0, 0), (19, 19))
+
+
+def test_search_statistics():
+    """
+    It finds a path on a 30x30 grid with every engine and checks that the result carries
+    the search statistics, that the expansion hook sees every expanded space and that the
+    opt-in profile is returned
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(30, 30)
+    amazon_pathfinder.add_random_obstacles(200, seed=4)
+
+    for engine in ("dijkstra", "astar", "jps", "bidirectional"):
+        expanded_points = []
+        selected_path = amazon_pathfinder.shortest_path(
+            allow_obstacle_elimination=False, engine=engine, on_expand=expanded_points.append)
+        stats = selected_path.stats
+        assert selected_path.found
+        assert selected_path.spaces[0] == (0, 0) and selected_path.spaces[-1] == (29, 29)
+        assert stats is amazon_pathfinder.search_stats
+        assert stats["engine"] == engine
+        assert stats["nodes_expanded"] == len(expanded_points) > 0
+        assert stats["nodes_generated"] >= stats["peak_open_set"] > 0
+        for phase in ("setup_time", "search_time", "reconstruction_time"):
+            assert 0 <= stats[phase] <= stats["total_time"]
+        assert selected_path.profile is None
+
+    selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, profile=True)
+    assert selected_path.profile.total_calls > 0
+
+
+def test_iter_paths():
+    """
+    It creates a 12x12 grid with seeded random obstacles and checks that iter_paths yields
+    distinct simple paths in order of obstacles then steps, starting with the shortest
+    path, and that on an empty 3x3 grid it yields all 235 paths between opposite corners
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(12, 12)
+    amazon_pathfinder.add_random_obstacles(30, seed=2)
+
+    for allow_obstacle_elimination in (True, False):
+        expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=allow_obstacle_elimination)
+        paths = list(amazon_pathfinder.iter_paths(8, allow_obstacle_elimination))
+        assert len(paths) == 8
+        assert paths[0][:2] == expected_path[:2]
+        assert [(path[1], path[0]) for path in paths] == sorted((path[1], path[0]) for path in paths)
+
+        spaces = [tuple((path_step.row, path_step.column) for path_step in path[2]) for path in paths]
+        assert len(set(spaces)) == len(spaces)
+        for path_spaces in spaces:
+            assert len(set(path_spaces)) == len(path_spaces)
+            assert path_spaces[0] == (0, 0) and path_spaces[-1] == (11, 11)
+            if not allow_obstacle_elimination:
+                assert all(amazon_pathfinder.grid[row][column] == 0 for row, column in path_spaces)
+
+    amazon_pathfinder.create_grid(3, 3)
+    assert len(list(amazon_pathfinder.iter_paths())) == 235
+
+    amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, engine="exhaustive")
+    viable_paths = len(amazon_pathfinder.all_paths)
+    amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, engine="exhaustive")
+    assert len(amazon_pathfinder.all_paths) == viable_paths
+
+
+def test_long_serpentine_maze():
+    """
+    It builds a serpentine maze of 30 corridors ending in a long straight tail, whose only
+    path is over 1200 steps, and checks that every engine follows it without reaching
+    Python's recursion limit
+    """
+    width, corridors, tail = 40, 30, 50
+    last_row = 2 * (corridors - 1)
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(width, last_row + tail + 1)
+
+    # The corridors turn through single gaps at alternate ends, entered and left diagonally
+    # so that there is only one path
+    free_spaces = set()
+    for row in range(0, last_row + 1, 2):
+        free_spaces.update((row, column) for column in range(1, width - 1))
+        gap_column = width - 1 if row // 2 % 2 == 0 else 0
+        if row < last_row:
+            free_spaces.add((row + 1, gap_column))
+    free_spaces.update((row, gap_column) for row in range(last_row + 1, last_row + tail + 1))
+
+    amazon_pathfinder.set_starting_point((0, 1))
+    amazon_pathfinder.set_delivery_point((last_row + tail, gap_column))
+    amazon_pathfinder.add_obstacles([
+        (row, column) for row in range(last_row + tail + 1) for column in range(width)
+        if (row, column) not in free_spaces
+    ])
+
+    expected_steps = len(free_spaces) - 1
+    for engine in PathFinder.ENGINES:
+        selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False, engine=engine)
+        assert selected_path[:2] == (expected_steps, 0)
+        assert set(selected_path.spaces) == free_spaces
+
+    assert next(amazon_pathfinder.iter_paths(1, allow_obstacle_elimination=False))[:2] == (expected_steps, 0)
+
+
+def test_max_removals():
+    """
+    It walls off the delivery point of a 7x7 grid except for a gap at the bottom and checks
+    that the removal budget picks between the detour and going through the wall, that the
+    trade-offs list both, and that on a seeded grid a large budget gives the fewest steps
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(7, 7)
+    amazon_pathfinder.set_delivery_point((0, 6))
+    amazon_pathfinder.add_obstacles([(row, 3) for row in range(6)])
+
+    detour = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, max_removals=0)
+    assert detour[:2] == (12, 0)
+    assert detour.stats["engine"] == "layered" and detour.stats["max_removals"] == 0
+    assert detour[:2] == amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)[:2]
+
+    through_wall = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, max_removals=1)
+    assert through_wall[:2] == (6, 1)
+    assert len(through_wall.spaces) == 7
+    assert [path[:2] for path in amazon_pathfinder.removal_tradeoffs(3)] == [(12, 0), (6, 1)]
+
+    amazon_pathfinder.create_grid(20, 15)
+    amazon_pathfinder.add_random_obstacles(120, seed=6)
+    least_obstacles = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)
+    bounded = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, max_removals=least_obstacles[1])
+    assert bounded[1] <= least_obstacles[1] and bounded[0] <= least_obstacles[0]
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, max_removals=300)[0] == 19
+
+    tradeoffs = amazon_pathfinder.removal_tradeoffs(300)
+    assert tradeoffs[0][:2] == least_obstacles[:2] and tradeoffs[-1][0] == 19
+    assert all(earlier[0] > later[0] and earlier[1] < later[1] for earlier, later in zip(tradeoffs, tradeoffs[1:]))
+
+    # Budgets beyond the obstacles on the grid cost no more than eliminating all of them
+    assert amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, max_removals=10 ** 9)[0] == 19
+    try:
+        amazon_pathfinder.shortest_path(allow_obstacle_elimination=True, engine="astar", max_removals=1)
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("Engines other than dijkstra should be rejected with max_removals")
+
+
+def test_bulk_obstacles():
+    """
+    It adds a wall and a rack as rectangles, a density fill and random obstacles to a
+    40x30 grid, checking the cells and obstacle list agree, that seeded placements repeat,
+    and that bad points leave the grid unchanged
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(40, 30)
+    amazon_pathfinder.add_obstacle_rectangles([((5, 0), (5, 38)), ((10, 10), (14, 12)), ((5, 30), (6, 30))])
+    assert len(amazon_pathfinder.obstacles) == 39 + 15 + 1
+    assert amazon_pathfinder.grid[5][38] == 1 and amazon_pathfinder.grid[5][39] == 0
+
+    amazon_pathfinder.fill_obstacles(0.3, seed=8)
+    assert len(amazon_pathfinder.obstacles) == 360
+    assert amazon_pathfinder.grid.cells.count(1) == 360
+    assert amazon_pathfinder.grid[0][0] == 0 and amazon_pathfinder.grid[29][39] == 0
+    first_fill = list(amazon_pathfinder.obstacles)
+
+    amazon_pathfinder.create_grid(40, 30)
+    amazon_pathfinder.add_obstacle_rectangles([((5, 0), (5, 38)), ((10, 10), (14, 12)), ((5, 30), (6, 30))])
+    amazon_pathfinder.fill_obstacles(0.3, seed=8)
+    assert amazon_pathfinder.obstacles == first_fill
+
+    # Nearly full grids are sampled from the listed free spaces
+    amazon_pathfinder.add_random_obstacles(1198 - 360, seed=1)
+    assert amazon_pathfinder.grid.cells.count(0) == 2
+    assert len(set(amazon_pathfinder.obstacles)) == len(amazon_pathfinder.obstacles) == 1198
+
+    amazon_pathfinder.create_grid(10, 10)
+    amazon_pathfinder.add_obstacles(point for point in [(1, 2), (3, 4)])
+    for bad_points in ([(5, 5), (10, 0)], [(5, 5), (5, 5)], [(5, 5), (1, 2)], [(5, 5), (0, 0)]):
+        amazon_pathfinder.add_obstacles(bad_points)
+    amazon_pathfinder.add_obstacle_rectangles([((2, 2), (4, 4)), ((8, 8), (9, 9))])
+    amazon_pathfinder.add_obstacle_rectangles([((2, 2), (4, 4)), ((6, 6), (6, 10))])
+    assert amazon_pathfinder.obstacles == [(1, 2), (3, 4)]
+
+
+def test_plan_route():
+    """
+    It plans trips through 6 stops on a seeded 15x12 grid and checks the steps against
+    trying every order, that repeated trips reuse the cached searches until obstacles
+    change, that long trips still pass every stop and that unreachable stops give no route
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(15, 12)
+    amazon_pathfinder.add_random_obstacles(40, seed=3)
+    free_spaces = [
+        (row, column) for row in range(12) for column in range(15)
+        if amazon_pathfinder.grid[row][column] == 0
+    ]
+    start, *stops = random.Random(3).sample(free_spaces, 7)
+
+    steps_between = {}
+
+    def leg_steps(point, next_point):
+        if (point, next_point) not in steps_between:
+            amazon_pathfinder.set_starting_point(point)
+            amazon_pathfinder.set_delivery_point(next_point)
+            steps_between[point, next_point] = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)[0]
+        return steps_between[point, next_point]
+
+    for return_to in (None, start):
+        route = amazon_pathfinder.plan_route(start, stops, return_to=return_to)
+        least_steps = min(
+            sum(leg_steps(point, next_point) for point, next_point in zip(trip, trip[1:]))
+            for order in itertools.permutations(stops)
+            for trip in [[start, *order] + ([return_to] if return_to else [])]
+        )
+        assert route.stats["ordering"] == "held_karp"
+        assert route[:2] == (least_steps, 0)
+        assert route.spaces[0] == start and route.spaces[-1] == (return_to or route.stats["order"][-1])
+        assert sorted(route.stats["order"]) == sorted(stops)
+        # Steps between free spaces are the same both ways, so the last point needs no search
+        assert route.stats["searches"] == (6 if return_to is None else 0)
+
+    amazon_pathfinder.add_obstacles([next(point for point in free_spaces if point not in [start, *stops])])
+    assert amazon_pathfinder.plan_route(start, stops).stats["searches"] == 6
+
+    # Every stop can be reached around obstacles, so none needs the whole grid searched
+    elimination_route = amazon_pathfinder.plan_route(start, stops, allow_obstacle_elimination=True)
+    assert elimination_route.stats["searches"] == 0
+    assert elimination_route[:2] == amazon_pathfinder.plan_route(start, stops)[:2]
+
+    amazon_pathfinder.create_grid(60, 60)
+    amazon_pathfinder.add_random_obstacles(600, seed=4)
+    free_spaces = [divmod(index, 60) for index, cell in enumerate(amazon_pathfinder.grid.cells) if not cell]
+    start, *stops = random.Random(4).sample(free_spaces, 16)
+    route = amazon_pathfinder.plan_route(start, stops, return_to=start)
+    assert route.stats["ordering"] == "local_search"
+    assert route.found and set(stops) <= set(route.spaces)
+    assert all(max(abs(row - next_row), abs(column - next_column)) == 1
+               for (row, column), (next_row, next_column) in zip(route.spaces, route.spaces[1:]))
+    amazon_pathfinder.build_landmarks([start, *stops])
+    assert route[0] == sum(
+        amazon_pathfinder.landmark_distance(point, next_point) for point, next_point in zip(
+            [start, *route.stats["order"]], [*route.stats["order"], start])
+    )
+
+    amazon_pathfinder.create_grid(10, 10)
+    amazon_pathfinder.add_obstacles([(8, 9), (9, 8), (8, 8)])
+    assert not amazon_pathfinder.plan_route((0, 0), [(5, 5), (9, 9)])
+    assert amazon_pathfinder.plan_route((0, 0), [(5, 5), (9, 9)], allow_obstacle_elimination=True)[1] == 1
+
+
+
+def test_dial_terrain():
+    """
+    It checks the dial engine finds the same steps and obstacles as dijkstra on unweighted
+    grids, goes round costly terrain and diagonals, and trades removing obstacles against
+    a removal cost
+    """
+    amazon_pathfinder = PathFinder([])
+    for seed in range(20):
+        amazon_pathfinder.create_grid(15, 12)
+        amazon_pathfinder.set_starting_point((0, 0))
+        amazon_pathfinder.set_delivery_point((11, 14))
+        amazon_pathfinder.add_random_obstacles(60, seed=seed)
+        for allow_obstacle_elimination in (False, True):
+            expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination)
+            dial_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination, engine="dial")
+            assert dial_path[:2] == expected_path[:2]
+            if dial_path:
+                assert dial_path.stats["path_cost"] == dial_path[0]
+
+    # A slow column with one cheap gap, crossed diagonally at a higher cost
+    amazon_pathfinder.create_grid(7, 5)
+    amazon_pathfinder.set_starting_point((2, 0))
+    amazon_pathfinder.set_delivery_point((2, 6))
+    amazon_pathfinder.add_obstacles([(row, 3) for row in range(5) if row != 4], cost=9)
+    amazon_pathfinder.add_obstacles([(4, 3)], cost=1, diagonal_cost=3)
+    weighted_path = amazon_pathfinder.shortest_path(False, engine="dial")
+    gap = weighted_path.spaces.index((4, 3))
+    assert weighted_path.spaces[gap - 1] == (4, 2)
+    assert weighted_path.stats["path_cost"] == 6
+    amazon_pathfinder.add_obstacles([(4, 3)], cost=9)
+    assert amazon_pathfinder.shortest_path(False, engine="dial").stats["path_cost"] == 5 + 9
+
+    # A wall costing a removal or a long way round
+    amazon_pathfinder.create_grid(9, 9, terrain_cost=2, diagonal_cost=3)
+    amazon_pathfinder.set_starting_point((4, 0))
+    amazon_pathfinder.set_delivery_point((4, 8))
+    amazon_pathfinder.add_obstacles([(row, 4) for row in range(8)])
+    detour = amazon_pathfinder.shortest_path(True, engine="dial")
+    assert detour[1] == 0 and (8, 4) in detour.spaces
+    assert detour.stats["path_cost"] == 8 * 3
+    amazon_pathfinder.removal_cost = 100
+    assert amazon_pathfinder.shortest_path(True, engine="dial").stats["path_cost"] == 8 * 3
+    amazon_pathfinder.removal_cost = 5
+    assert amazon_pathfinder.shortest_path(True, engine="dial").stats["path_cost"] == 3 * 2 + 5 + 4 * 2
+    # Removals costing far more than any terrain wait outside the ring of buckets
+    amazon_pathfinder.add_obstacles([(8, 4)])
+    amazon_pathfinder.removal_cost = 10 ** 12
+    removal_path = amazon_pathfinder.shortest_path(True, engine="dial")
+    assert removal_path[1] == 1 and removal_path.stats["path_cost"] == 10 ** 12 + 7 * 2
+
+    try:
+        amazon_pathfinder.set_terrain_costs([(0, 0)], 0)
+    except AssertionError:
+        pass
+    else:
+        raise AssertionError("Terrain costs below 1 should be rejected")
+
 # if __name__ == "__main__":
     # test_phase_one()
     # test_phase_two()
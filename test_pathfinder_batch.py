@@ -0,0 +1,72 @@
+import json
+
+from pathfinder_batch import run_batch
+
+
+def test_batch_results_in_input_order(tmp_path):
+    """
+    It writes seeded scenarios and a broken line to a JSON lines file, solves them in a
+    single process and across a worker pool, and checks both write the same results in
+    input order with the broken line reported as an error
+    """
+    scenarios_path = tmp_path / "scenarios.jsonl"
+    with open(scenarios_path, "w") as scenarios_file:
+        for number in range(40):
+            scenarios_file.write(json.dumps({
+                "id": number,
+                "grid_width": 12,
+                "grid_height": 12,
+                "start": [0, 0],
+                "end": [11, number % 12],
+                "obstacles": [[5, 5]],
+                "random_obstacles": 30,
+                "seed": number,
+                "obstacles_unremovable": number % 2 == 0,
+            }) + "\n")
+        scenarios_file.write("\n{not json\n")
+
+    results = []
+    for workers in (1, 2):
+        results_path = tmp_path / f"results_{workers}.jsonl"
+        assert run_batch(str(scenarios_path), str(results_path), workers=workers, chunk_size=7) == 41
+        with open(results_path) as results_file:
+            results.append([json.loads(line) for line in results_file])
+
+    for result in results[0] + results[1]:
+        result.pop("solve_time", None)
+    assert results[0] == results[1]
+
+    assert [result.get("id") for result in results[0][:40]] == list(range(40))
+    assert "error" in results[0][40] and results[0][40]["line"] == 42
+    for result in results[0][:40]:
+        if result["found"]:
+            assert result["path"][0] == [0, 0]
+            assert result["steps"] == len(result["path"]) - 1
+
+
+def test_batch_rejected_settings(tmp_path):
+    """
+    It solves scenarios whose start, end, obstacles or rectangles the pathfinder rejects,
+    and checks each is reported as an error rather than solved on the default settings
+    """
+    scenarios_path = tmp_path / "rejected.jsonl"
+    base = {"grid_width": 6, "grid_height": 6, "start": [0, 0], "end": [5, 5]}
+    rejected = [
+        {"start": [9, 9]},
+        {"end": [-1, 2]},
+        {"obstacles": [[1, 1], [1, 1]]},
+        {"obstacles": [[1, 1], [6, 0]]},
+        {"obstacles": [[5, 5]]},
+        {"rectangles": [[[0, 0], [2, 2]]]},
+        {"rectangles": [[[2, 2], [2, 8]]]},
+    ]
+    with open(scenarios_path, "w") as scenarios_file:
+        for settings in rejected + [{"rectangles": [[[2, 0], [2, 4]]], "obstacles": [[3, 3]]}]:
+            scenarios_file.write(json.dumps({**base, **settings}) + "\n")
+
+    results_path = tmp_path / "rejected_results.jsonl"
+    run_batch(str(scenarios_path), str(results_path), workers=1)
+    with open(results_path) as results_file:
+        results = [json.loads(line) for line in results_file]
+    assert all("error" in result and "found" not in result for result in results[:-1])
+    assert results[-1]["found"] is True and "error" not in results[-1]
@@ -0,0 +1,51 @@
+import copy
+import subprocess
+import sys
+
+from pathfinder_benchmark import compare, measure_import_time, run_suite
+
+
+def test_benchmark_suite_and_compare():
+    """
+    It runs a small seeded sweep twice and checks the node counts repeat exactly, that a
+    result shows no regressions against itself, and that slower times and extra nodes
+    against a baseline are flagged
+    """
+    suite = run_suite(sizes=(16,), densities=(0.2,), engines=("dijkstra", "jps"), repeats=3)
+    assert len(suite["results"]) == 3
+    for case in suite["results"]:
+        assert case["median_time"] <= case["p95_time"]
+        assert case["nodes_expanded"] > 0 or case["paths_found"] == 0
+        assert case["peak_memory_bytes"] > 0
+
+    repeated_suite = run_suite(sizes=(16,), densities=(0.2,), engines=("dijkstra", "jps"), repeats=3)
+    assert ([case["nodes_expanded"] for case in suite["results"]] ==
+            [case["nodes_expanded"] for case in repeated_suite["results"]])
+
+    assert compare(suite, copy.deepcopy(suite)) == []
+
+    regressed_suite = copy.deepcopy(suite)
+    regressed_suite["results"][0]["median_time"] *= 2
+    regressed_suite["results"][0]["nodes_expanded"] += 1
+    regressions = compare(suite, regressed_suite)
+    assert len(regressions) == 2
+    assert "median_time" in regressions[0] and "nodes_expanded" in regressions[1]
+
+
+def test_import_time_budget():
+    """
+    It measures the time to import pathfinder, which must not load pygame, and checks that
+    a slower import or one over the budget is flagged
+    """
+    import_time = measure_import_time(repeats=1)
+    assert 0 < import_time < 1
+
+    completed = subprocess.run(
+        [sys.executable, "-c", "import sys, pathfinder; print('pygame' in sys.modules)"],
+        capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "False"
+
+    baseline = {"import_time": 0.01, "results": []}
+    assert compare(baseline, {"import_time": 0.011, "results": []}) == []
+    assert "import_time" in compare(baseline, {"import_time": 0.02, "results": []})[0]
+    assert "budget" in compare(baseline, {"import_time": 0.02, "results": []}, import_time_budget=0.015)[1]
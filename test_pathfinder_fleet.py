@@ -0,0 +1,114 @@
+import random
+
+from pathfinder import PathFinder
+from pathfinder_fleet import FleetPlanner
+
+
+def test_fleet_planning():
+    """
+    It plans 40 vehicles across a seeded 40x40 grid, all at once and in windows, and checks
+    that every path moves one space at a time around obstacles from its start to its
+    delivery point without any vertex or swap conflicts
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(40, 40)
+    amazon_pathfinder.add_random_obstacles(250, seed=1)
+
+    rng = random.Random(1)
+    free_spaces = [divmod(index, 40) for index, cell in enumerate(amazon_pathfinder.grid.cells) if not cell]
+    points = rng.sample(free_spaces, 80)
+    vehicles = list(zip(points[:40], points[40:]))
+
+    for window in (None, 8):
+        planner = FleetPlanner(amazon_pathfinder, window=window)
+        paths = planner.plan(vehicles)
+        assert FleetPlanner.find_conflicts(paths) == []
+        assert planner.plan_stats["planned"] == sum(
+            1 for (_, goal), path in zip(vehicles, paths) if path[-1] == goal) >= 38
+        assert planner.plan_stats["reservations"] > 0
+
+        for (start, goal), path in zip(vehicles, paths):
+            assert path[0] == start and (path[-1] == goal or window is not None or path == [start])
+            assert len(path) - 1 >= max(abs(start[0] - goal[0]), abs(start[1] - goal[1]))
+            for (row, column), (next_row, next_column) in zip(path, path[1:]):
+                assert max(abs(row - next_row), abs(column - next_column)) <= 1
+                assert amazon_pathfinder.grid[next_row][next_column] == 0
+
+
+def test_head_on_vehicles():
+    """
+    It sends two vehicles head on along a corridor with one passing place, and checks
+    that the straight paths conflict while the planned ones do not
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(9, 3)
+    amazon_pathfinder.add_obstacles([(0, column) for column in range(9) if column != 4] +
+                                    [(2, column) for column in range(9)])
+    vehicles = [((1, 0), (1, 8)), ((1, 8), (1, 0))]
+
+    straight_paths = [[(1, column) for column in range(9)], [(1, column) for column in range(8, -1, -1)]]
+    assert [conflict[:2] for conflict in FleetPlanner.find_conflicts(straight_paths)] == [(4, "vertex")]
+    straight_paths[1] = straight_paths[1][1:]
+    assert [conflict[1] for conflict in FleetPlanner.find_conflicts(straight_paths)] == ["swap"]
+
+    for window in (None, 3):
+        paths = FleetPlanner(amazon_pathfinder, window=window).plan(vehicles)
+        assert all(paths) and FleetPlanner.find_conflicts(paths) == []
+        assert (0, 4) in paths[0] + paths[1]
+
+
+def test_crowded_corridor():
+    """
+    It plans three vehicles along a one space wide corridor, where some must back out of
+    the way and a vehicle boxed in cannot simply wait, and checks over seeded small grids
+    that windowed plans never conflict, keeping the spaces of vehicles that do not arrive
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(6, 1)
+    vehicles = [((0, 5), (0, 1)), ((0, 3), (0, 4)), ((0, 0), (0, 2))]
+    for window in (1, 2, 3, 8):
+        planner = FleetPlanner(amazon_pathfinder, window=window, max_steps=40)
+        paths = planner.plan(vehicles)
+        assert FleetPlanner.find_conflicts(paths) == []
+        assert [path[0] for path in paths] == [start for start, _ in vehicles]
+        assert planner.plan_stats["planned"] + planner.plan_stats["failed"] == 3
+
+    for seed in range(60):
+        rng = random.Random(seed)
+        width, height = rng.randint(2, 6), rng.randint(1, 4)
+        amazon_pathfinder.create_grid(width, height)
+        amazon_pathfinder.add_random_obstacles(width * height // 4, seed=seed)
+        free_spaces = [divmod(index, width) for index, cell in enumerate(amazon_pathfinder.grid.cells) if not cell]
+        count = min(len(free_spaces) // 2, 4)
+        points = rng.sample(free_spaces, 2 * count)
+        for window in (1, 3):
+            paths = FleetPlanner(amazon_pathfinder, window=window, max_steps=30).plan(
+                list(zip(points[:count], points[count:])))
+            assert FleetPlanner.find_conflicts(paths) == []
+
+
+def test_failed_vehicles_stay_put():
+    """
+    It plans seeded small crowded grids all at once, and checks that every vehicle's path
+    starts where it does and that no vehicle drives through one that found no path and
+    stays on its starting point
+    """
+    amazon_pathfinder = PathFinder([])
+    stuck = 0
+    for seed in range(120):
+        rng = random.Random(seed)
+        width, height = rng.randint(2, 7), rng.randint(1, 5)
+        amazon_pathfinder.create_grid(width, height)
+        amazon_pathfinder.add_random_obstacles(width * height // 4, seed=seed)
+        free_spaces = [divmod(index, width) for index, cell in enumerate(amazon_pathfinder.grid.cells) if not cell]
+        count = min(len(free_spaces) // 2, 6)
+        points = rng.sample(free_spaces, 2 * count)
+        vehicles = list(zip(points[:count], points[count:]))
+
+        planner = FleetPlanner(amazon_pathfinder, max_steps=40)
+        paths = planner.plan(vehicles)
+        assert FleetPlanner.find_conflicts(paths) == []
+        for (start, goal), path in zip(vehicles, paths):
+            assert path[0] == start and (path[-1] == goal or path == [start])
+        stuck += planner.plan_stats["failed"]
+    assert stuck > 0
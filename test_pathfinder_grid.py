@@ -0,0 +1,71 @@
+from pathfinder import PathFinder
+from pathfinder_grid import Grid
+
+
+def test_grid_indexing():
+    """
+    It creates a 4x3 grid, sets cells through grid[row][column] and checks they land in
+    the row-major cells buffer and compare equal to the matching list of lists
+    """
+    grid = Grid(4, 3)
+    assert len(grid) == 3
+    assert len(grid[0]) == 4
+    assert grid == [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+
+    grid[1][2] = 1
+    grid[-1][0] = 1
+    assert grid.cells[grid.index(1, 2)] == 1
+    assert grid.cells[grid.index(2, 0)] == 1
+    assert grid[1][2] == 1
+    assert grid.to_list() == [[0, 0, 0, 0], [0, 0, 1, 0], [1, 0, 0, 0]]
+
+    try:
+        grid[3]
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("Rows outside the grid should raise IndexError")
+
+
+def test_grid_files(tmp_path):
+    """
+    It saves a seeded 37x23 grid in both encodings and checks that each loads back equal,
+    that the byte per cell file is memory mapped copy on write, that a text map converts to
+    the same cells, and that other files are rejected
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(37, 23)
+    amazon_pathfinder.add_random_obstacles(200, seed=5)
+    expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)
+
+    for packed in (False, True):
+        grid_path = str(tmp_path / f"packed_{packed}.grid")
+        amazon_pathfinder.save_grid(grid_path, packed=packed)
+        loaded_grid = Grid.load(grid_path)
+        assert loaded_grid == amazon_pathfinder.grid
+        assert isinstance(loaded_grid.cells, memoryview) != packed
+
+    loaded_pathfinder = PathFinder([])
+    loaded_pathfinder.load_grid(str(tmp_path / "packed_False.grid"))
+    assert sorted(loaded_pathfinder.obstacles) == sorted(amazon_pathfinder.obstacles)
+    assert loaded_pathfinder.delivery_point == (22, 36)
+    assert loaded_pathfinder.shortest_path(allow_obstacle_elimination=False)[:2] == expected_path[:2]
+
+    # Changes to a mapped grid stay in memory
+    loaded_pathfinder.remove_obstacles(loaded_pathfinder.obstacles[:5])
+    assert Grid.load(str(tmp_path / "packed_False.grid")) == amazon_pathfinder.grid
+
+    text_path = tmp_path / "grid.map"
+    text_path.write_text("type octile\nheight 23\nwidth 37\nmap\n" + "\n".join(
+        "".join("@" if cell else "." for cell in row) for row in amazon_pathfinder.grid))
+    loaded_pathfinder.load_grid(str(text_path))
+    assert loaded_pathfinder.grid == amazon_pathfinder.grid
+    assert Grid.from_obstacles(37, 23, amazon_pathfinder.obstacles) == amazon_pathfinder.grid
+    assert Grid.from_text("@ @\n   \n\n.@.\n") == [[1, 0, 1], [0, 0, 0], [0, 1, 0]]
+
+    try:
+        Grid.load(str(text_path))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Files without the grid file header should raise ValueError")
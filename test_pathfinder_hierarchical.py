@@ -0,0 +1,49 @@
+import random
+
+from pathfinder import PathFinder
+from pathfinder_hierarchical import HierarchicalPathFinder
+
+
+def test_hierarchical_paths():
+    """
+    It creates a seeded 60x60 grid with random obstacles and checks that the hierarchy
+    finds a valid path exactly when the flat search does, close to the least steps, both
+    before and after obstacles are added that it has to rebuild around
+    """
+    random.seed(3)
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(60, 60)
+    amazon_pathfinder.add_random_obstacles(900)
+    hierarchy = HierarchicalPathFinder(amazon_pathfinder, cluster_size=10)
+    assert hierarchy.build_stats["clusters"] == 36
+
+    rng = random.Random(8)
+    for update in range(3):
+        free_points = [(row, column) for row in range(60) for column in range(60)
+                       if amazon_pathfinder.grid[row][column] == 0]
+        queries = [tuple(rng.sample(free_points, 2)) for _ in range(15)]
+
+        report = hierarchy.compare_with_flat(queries)
+        assert report["queries"] == 15
+        assert 0 <= report["extra_steps"] <= 15 * 10
+
+        for starting_point, delivery_point in queries:
+            amazon_pathfinder.set_starting_point(starting_point)
+            amazon_pathfinder.set_delivery_point(delivery_point)
+            expected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False)
+            selected_path = hierarchy.shortest_path(starting_point, delivery_point)
+            assert bool(selected_path) == bool(expected_path)
+            if selected_path:
+                spaces = [(path_step.row, path_step.column) for path_step in selected_path[2]]
+                assert spaces[0] == starting_point and spaces[-1] == delivery_point
+                for (row, column), (next_row, next_column) in zip(spaces, spaces[1:]):
+                    assert max(abs(next_row - row), abs(next_column - column)) == 1
+                    assert amazon_pathfinder.grid[next_row][next_column] == 0
+
+        # A wall inside one cluster only rebuilds that cluster and its neighbours
+        wall = [(25, column) for column in range(20, 30)
+                if amazon_pathfinder.grid[25][column] == 0 and
+                (25, column) not in (amazon_pathfinder.starting_point, amazon_pathfinder.delivery_point)]
+        amazon_pathfinder.add_obstacles(wall)
+        assert hierarchy.build_stats["last_rebuild_clusters"] <= 9
+        amazon_pathfinder.remove_obstacles(wall[:update + 1])
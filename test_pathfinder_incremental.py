@@ -0,0 +1,47 @@
+import random
+
+from pathfinder import PathFinder
+from pathfinder_incremental import IncrementalPathFinder
+
+
+def test_incremental_replanning():
+    """
+    It creates a seeded 30x30 grid, plans with the incremental planner and then adds and
+    removes obstacles and moves the starting point, checking every replanned path against a
+    fresh dijkstra search on the same grid
+    """
+    for allow_obstacle_elimination in (False, True):
+        random.seed(11)
+        amazon_pathfinder = PathFinder([])
+        amazon_pathfinder.create_grid(30, 30)
+        amazon_pathfinder.set_starting_point((0, 0))
+        amazon_pathfinder.set_delivery_point((29, 25))
+        amazon_pathfinder.add_random_obstacles(200)
+
+        planner = IncrementalPathFinder(
+            amazon_pathfinder, allow_obstacle_elimination=allow_obstacle_elimination)
+        selected_path = planner.plan()
+        full_search_expansions = planner.nodes_expanded
+        assert selected_path[:2] == amazon_pathfinder.shortest_path(
+            allow_obstacle_elimination=allow_obstacle_elimination)[:2]
+
+        rng = random.Random(5)
+        for update in range(30):
+            free_points = [(rng.randrange(30), rng.randrange(30)) for _ in range(3)]
+            added = [point for point in free_points
+                     if amazon_pathfinder.grid[point[0]][point[1]] == 0 and
+                     point not in (amazon_pathfinder.starting_point, amazon_pathfinder.delivery_point)]
+            removed = rng.sample(amazon_pathfinder.obstacles, 2)
+            selected_path = planner.update_obstacles(added=list(set(added)), removed=removed)
+            assert selected_path[:2] == amazon_pathfinder.shortest_path(
+                allow_obstacle_elimination=allow_obstacle_elimination)[:2]
+
+            if update % 5 == 4 and selected_path and len(selected_path[2]) > 2:
+                next_step = selected_path[2][1]
+                selected_path = planner.move_start((next_step.row, next_step.column))
+                assert selected_path[:2] == amazon_pathfinder.shortest_path(
+                    allow_obstacle_elimination=allow_obstacle_elimination)[:2]
+
+        # Removing a single obstacle only repairs the search around it
+        planner.update_obstacles(removed=[amazon_pathfinder.obstacles[0]])
+        assert planner.nodes_expanded < full_search_expansions
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from pathfinder import PathFinder
+from pathfinder_service import PathFinderService
+
+
+async def _send(socket_path, requests):
+    """
+    It sends request lines on one connection and returns the responses by id
+    """
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    for request in requests:
+        writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+    responses = {}
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        responses[response.get("id")] = response
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def test_service_routes_and_updates(tmp_path):
+    """
+    It serves a seeded 30x30 grid over a Unix socket, from a thread and from a worker pool,
+    and checks that concurrent routes match the pathfinder's own, that an update is seen by
+    later routes, that bad requests get errors and that latencies are reported
+    """
+    amazon_pathfinder = PathFinder([])
+    amazon_pathfinder.create_grid(30, 30)
+    amazon_pathfinder.add_random_obstacles(150, seed=5)
+    ends = [(29, column) for column in range(0, 30, 3)]
+    expected_steps = {}
+    for end in ends:
+        amazon_pathfinder.set_delivery_point(end)
+        expected_steps[end] = amazon_pathfinder.shortest_path(allow_obstacle_elimination=True)[0]
+
+    async def scenario(workers):
+        service = PathFinderService({"default": amazon_pathfinder}, workers=workers)
+        socket_path = str(tmp_path / f"service_{workers}.sock")
+        await service.start(socket_path=socket_path)
+        try:
+            routes = await _send(socket_path, [
+                {"id": number, "op": "route", "start": [0, 0], "end": list(end)}
+                for number, end in enumerate(ends)
+            ])
+            for number, end in enumerate(ends):
+                assert routes[number]["steps"] == expected_steps[end]
+                assert routes[number]["latency"] >= routes[number]["solve_time"]
+
+            wall = [[row, 1] for row in range(30) if amazon_pathfinder.grid[row][1] == 0]
+            responses = await _send(socket_path, [
+                {"id": "wall", "op": "update", "add": wall},
+                {"id": "twice", "op": "update", "add": wall},
+                {"id": "unknown", "op": "route", "grid": "other", "start": [0, 0], "end": [1, 1]},
+                {"id": "broken", "op": "fly"},
+                {"id": "outside", "op": "route", "start": [50, -3], "end": [1, 1]},
+            ])
+            assert responses["wall"]["version"] == 1
+            assert "error" in responses["twice"] and "error" in responses["unknown"] and "error" in responses["broken"]
+            assert "error" in responses["outside"] and "found" not in responses["outside"]
+
+            responses = await _send(socket_path, [
+                {"id": "blocked", "op": "route", "start": [0, 0], "end": [29, 29], "obstacles_unremovable": True},
+                {"id": "through", "op": "route", "start": [0, 0], "end": [29, 29]},
+                {"id": "grids", "op": "grids"},
+                {"id": "metrics", "op": "metrics"},
+            ])
+            assert responses["blocked"]["found"] is False
+            assert responses["through"]["found"] is True
+            assert responses["grids"]["grids"]["default"]["version"] == 1
+
+            responses = await _send(socket_path, [{"id": "undo", "op": "update", "remove": wall}])
+            assert responses["undo"]["version"] == 2
+            metrics = service.latency_metrics()
+            assert metrics["route"]["count"] == len(ends) + 4 and metrics["route"]["errors"] == 2
+            assert metrics["update"]["count"] == 3
+            assert 0 < metrics["route"]["p50"] <= metrics["route"]["p95"] <= metrics["route"]["max"]
+        finally:
+            await service.close()
+
+    for workers in (1, 2):
+        asyncio.run(scenario(workers))
+    assert len(amazon_pathfinder.obstacles) == 150
+
+
+def test_service_compacts_grids_separately(tmp_path, monkeypatch):
+    """
+    It compacts two grids after the same number of updates, and checks each keeps its own
+    grid file so routes on one never see the other's obstacles
+    """
+    monkeypatch.setattr("pathfinder_service.COMPACT_AFTER", 2)
+    pathfinders = {name: PathFinder([]) for name in ("open", "walled")}
+    for pathfinder in pathfinders.values():
+        pathfinder.create_grid(5, 5)
+
+    async def scenario():
+        service = PathFinderService(pathfinders, workers=1)
+        await service.start(socket_path=str(tmp_path / "compact.sock"))
+        try:
+            for name in pathfinders:
+                for row in range(2):
+                    await service.handle_request({"op": "update", "grid": name, "add": [[row, 4]]})
+            await service.handle_request(
+                {"op": "update", "grid": "walled", "add": [[row, 2] for row in range(5)]})
+            assert len(set(service._grid_files.values())) == 2
+            route = await service.handle_request(
+                {"op": "route", "grid": "open", "start": [0, 0], "end": [4, 4], "obstacles_unremovable": True})
+            assert route["found"] is True and route["steps"] == 4
+        finally:
+            await service.close()
+
+    asyncio.run(scenario())
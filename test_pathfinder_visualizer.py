@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("pygame")
+
+from pathfinder import PathFinder
+from pathfinder_visualizer import PathFinderVisualizer
+
+
+def test_headless_recording(tmp_path):
+    """
+    It visualizes the exhaustive search on a 4x4 grid offscreen and checks that frames
+    were recorded, far fewer than the paths drawn, and that the last frame shows the
+    selected path
+    """
+    visualizer = PathFinderVisualizer(headless=True, record_dir=str(tmp_path), max_fps=30)
+    amazon_pathfinder = PathFinder(visualizer=visualizer)
+    amazon_pathfinder.create_grid(4, 4)
+    amazon_pathfinder.add_obstacles([(1, 1)])
+
+    selected_path = amazon_pathfinder.shortest_path(allow_obstacle_elimination=False, engine="exhaustive")
+    frames = sorted(tmp_path.iterdir())
+    assert selected_path
+    assert 0 < len(frames) == visualizer.frames_recorded < len(amazon_pathfinder.all_paths)
+
+    last_frame = visualizer.visualizer.image.load(str(frames[-1]))
+    row, column = selected_path.spaces[1]
+    assert last_frame.get_at(visualizer._cell_centre(row, column))[:3] == (0, 255, 0)